@@ -44,7 +44,7 @@ def main():
     with model:
         logger.info("Performing predictions")
         predictions = voxc.Predictions()
-        for img, frame_number in voxc.read_images():
+        for img, frame_number in voxc.read_images(prefetch=8):
             image_labels = process_image(model, img)
             predictions.add(frame_number, image_labels)
 
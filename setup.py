@@ -27,6 +27,9 @@ setup(
     install_requires=[
         "requests>=2.18.4",
     ],
+    extras_require={
+        "aio": ["aiohttp>=3.3"],
+    },
     scripts=[
         "tests/platform/test-platform",
         "tests/image2video/test-i2v",
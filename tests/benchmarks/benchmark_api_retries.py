@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+'''
+Exercises the retry, backoff, timeout, and circuit breaking behavior of
+``voxel51.platform.api.API`` against a local fault-injecting stand-in for the
+Platform API, and reports the resulting request statistics.
+
+Usage:
+    python benchmark_api_retries.py
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import voxel51.platform.api as voxa
+import voxel51.platform.auth as voxauth
+import voxel51.platform.config as voxc
+
+from server import StandInServer
+
+
+_JOB_ID = "job-1"
+
+
+def _make_api(server, args):
+    os.environ[voxc.API_BASE_URL_ENV_VAR] = server.base_url + "/v1"
+    retry_policy = voxa.RetryPolicy(
+        max_attempts=args.max_attempts, backoff=args.backoff,
+        max_backoff=10 * args.backoff, timeout=(1.0, args.timeout),
+        deadline=args.deadline)
+    circuit_breaker = voxa.CircuitBreaker(
+        failure_threshold=args.failure_threshold,
+        reset_timeout=args.reset_timeout)
+    return voxa.API(
+        voxauth.Token("private-key"), keep_alive=True, cache_urls=False,
+        retry_policy=retry_policy, circuit_breaker=circuit_breaker)
+
+
+def _run_scenario(name, fcn):
+    start = time.time()
+    try:
+        fcn()
+        outcome = "success"
+    except Exception as e:
+        outcome = "%s: %s" % (type(e).__name__, e)
+
+    return {"scenario": name, "outcome": outcome,
+            "seconds": time.time() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--max-attempts", type=int, default=4)
+    parser.add_argument("--backoff", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=0.5)
+    parser.add_argument("--deadline", type=float, default=10.0)
+    parser.add_argument("--failure-threshold", type=int, default=3)
+    parser.add_argument("--reset-timeout", type=float, default=1.0)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    results = []
+    try:
+        with StandInServer(tmp_dir) as server, _make_api(server, args) as api:
+            update_state = lambda: api.update_job_state(_JOB_ID, "RUNNING")
+
+            server.inject_faults(2, status=503)
+            results.append(_run_scenario("transient 503s", update_state))
+
+            server.inject_faults(1, status=429, retry_after="1")
+            results.append(_run_scenario("429 with Retry-After", update_state))
+
+            server.inject_faults(1, status=None, delay=2 * args.timeout)
+            results.append(_run_scenario("slow response", update_state))
+
+            server.inject_faults(100, status=503)
+            results.append(_run_scenario("persistent 503s", update_state))
+            results.append(_run_scenario("open circuit", update_state))
+            server.clear_faults()
+
+            time.sleep(args.reset_timeout)
+            results.append(_run_scenario("half-open recovery", update_state))
+
+            server.inject_faults(1, status=503, path_prefix="/v1/jobs")
+            results.append(_run_scenario(
+                "non-idempotent upload",
+                lambda: api.upload_job_output_as_data(_JOB_ID, __file__)))
+
+            server.inject_faults(args.max_attempts, status=503)
+            results.append(_run_scenario(
+                "signed URL fallback",
+                lambda: api.get_job_status_url(
+                    type("TaskConfig", (), {
+                        "job_id": _JOB_ID, "status": None}))))
+
+            stats = api.get_request_stats()
+            num_server_requests = server.num_requests
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    print(json.dumps({
+        "scenarios": results,
+        "request_stats": stats,
+        "num_server_requests": num_server_requests,
+    }, indent=4))
+
+
+if __name__ == "__main__":
+    main()
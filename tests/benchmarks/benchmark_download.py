@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+'''
+Benchmarks single-request vs ranged downloads via ``voxel51.platform.utils``
+against a local range-capable stand-in server.
+
+Usage:
+    python benchmark_download.py --size-mb 256 --bandwidth-mb 32 --workers 8
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+import argparse
+import filecmp
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import voxel51.platform.utils as voxu
+
+from server import StandInServer
+
+
+_MB = 1024 * 1024
+
+
+def _make_file(path, size):
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            chunk = os.urandom(min(remaining, 4 * _MB))
+            f.write(chunk)
+            remaining -= len(chunk)
+
+
+def _time_download(path_config, output_dir, num_range_workers=None):
+    start = time.time()
+    local_path = voxu.download(
+        path_config, output_dir, num_range_workers=num_range_workers)
+    return local_path, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--size-mb", type=float, default=64, help="size of the test file")
+    parser.add_argument(
+        "--bandwidth-mb", type=float, default=None,
+        help="per-connection bandwidth limit, in MB/s")
+    parser.add_argument(
+        "--workers", type=int, default=8, help="number of range workers")
+    parser.add_argument(
+        "--no-ranges", action="store_true",
+        help="disable Range support on the server to test the fallback path")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        serve_dir = os.path.join(tmp_dir, "serve")
+        os.makedirs(serve_dir)
+        size = int(args.size_mb * _MB)
+        src_path = os.path.join(serve_dir, "input.bin")
+        _make_file(src_path, size)
+
+        bandwidth = args.bandwidth_mb * _MB if args.bandwidth_mb else None
+        with StandInServer(
+                serve_dir, bandwidth=bandwidth,
+                accept_ranges=not args.no_ranges) as server:
+            path_config = voxu.RemotePathConfig.from_signed_url(
+                server.get_url("input.bin"))
+
+            single_path, single_time = _time_download(
+                path_config, os.path.join(tmp_dir, "single"))
+            ranged_path, ranged_time = _time_download(
+                path_config, os.path.join(tmp_dir, "ranged"),
+                num_range_workers=args.workers)
+
+        results = {
+            "size_bytes": size,
+            "range_workers": args.workers,
+            "accept_ranges": not args.no_ranges,
+            "single_seconds": single_time,
+            "ranged_seconds": ranged_time,
+            "speedup": single_time / ranged_time,
+            "ranged_matches_source": filecmp.cmp(
+                src_path, ranged_path, shallow=False),
+            "single_matches_source": filecmp.cmp(
+                src_path, single_path, shallow=False),
+        }
+        print(json.dumps(results, indent=4))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+'''
+Benchmarks the cold-start cost of the Platform SDK: the time for a fresh
+interpreter to import ``voxel51.platform.task`` and, optionally, to report a
+task as ``RUNNING`` to a local stand-in for the Platform API.
+
+The benchmark also checks that heavy modules that the SDK imports lazily
+(e.g., OpenCV) are not loaded on these paths. Pass ``--budget`` to exit with
+a nonzero status if the median import time exceeds a budget or a heavy module
+was loaded, e.g., to guard against regressions.
+
+Usage:
+    python benchmark_import.py --runs 10
+    python benchmark_import.py --start-task --budget 0.5
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import voxel51.platform.config as voxc
+
+from server import StandInServer
+
+
+_HEAVY_MODULES = ["cv2", "eta.core.image", "eta.core.video"]
+
+_CHILD_CODE = '''
+import json, sys, time
+start = time.time()
+import voxel51.platform.task as voxt
+result = {"import_seconds": time.time() - start}
+if len(sys.argv) > 1:
+    task_manager = voxt.TaskManager.from_url(sys.argv[1])
+    task_manager.start()
+    result["running_seconds"] = time.time() - start
+result["heavy_modules"] = [m for m in %s if m in sys.modules]
+print(json.dumps(result))
+''' % json.dumps(_HEAVY_MODULES)
+
+
+def _run_child(task_config_url=None):
+    cmd = [sys.executable, "-c", _CHILD_CODE]
+    if task_config_url:
+        cmd.append(task_config_url)
+
+    start = time.time()
+    out = subprocess.check_output(cmd)
+    result = json.loads(out.decode("utf-8").strip().splitlines()[-1])
+    result["process_seconds"] = time.time() - start
+    return result
+
+
+def _write_task_config(server, serve_dir):
+    task_config = {
+        "job_id": "job-1",
+        "analytic": "benchmark",
+        "version": "0.1.0",
+        "inputs": {},
+        "parameters": {},
+        "status": {"signed_url": server.get_url("job-1-status")},
+        "logfile": {"signed_url": server.get_url("job-1-log")},
+    }
+    with open(os.path.join(serve_dir, "task.json"), "w") as f:
+        json.dump(task_config, f)
+
+    return server.get_url("task.json")
+
+
+def _summarize(results, key):
+    values = sorted(r[key] for r in results)
+    return {
+        "median_seconds": values[len(values) // 2],
+        "min_seconds": values[0],
+        "max_seconds": values[-1],
+    }
+
+
+def _run(args, task_config_url=None):
+    _run_child(task_config_url)  # warm up, e.g., compile bytecode
+    results = [_run_child(task_config_url) for _ in range(args.runs)]
+
+    keys = ["import_seconds", "process_seconds"]
+    if task_config_url:
+        keys.append("running_seconds")
+
+    summary = {key: _summarize(results, key) for key in keys}
+    summary["heavy_modules"] = sorted(
+        set(m for r in results for m in r["heavy_modules"]))
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--runs", type=int, default=10, help="number of fresh interpreters")
+    parser.add_argument(
+        "--start-task", action="store_true",
+        help="also measure the time to report a task as RUNNING")
+    parser.add_argument(
+        "--budget", type=float, default=None,
+        help="maximum allowed median import time, in seconds")
+    args = parser.parse_args()
+
+    if args.start_task:
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            with StandInServer(tmp_dir) as server:
+                os.environ[voxc.API_BASE_URL_ENV_VAR] = (
+                    server.base_url + "/v1")
+                os.environ.setdefault(voxc.API_TOKEN_ENV_VAR, "private-key")
+                results = _run(args, _write_task_config(server, tmp_dir))
+        finally:
+            shutil.rmtree(tmp_dir)
+    else:
+        results = _run(args)
+
+    failures = []
+    if args.budget is not None:
+        import_seconds = results["import_seconds"]["median_seconds"]
+        if import_seconds > args.budget:
+            failures.append(
+                "Median import time %.3fs exceeds the budget of %.3fs" % (
+                    import_seconds, args.budget))
+
+        if results["heavy_modules"]:
+            failures.append(
+                "Heavy modules were imported: %s" %
+                ", ".join(results["heavy_modules"]))
+
+    results["failures"] = failures
+    print(json.dumps(results, indent=4))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+'''
+Benchmarks the full ``voxel51.platform.task.TaskManager`` lifecycle against a
+local stand-in for the Platform API and signed URL storage.
+
+For each input size, the benchmark runs a task that downloads its TaskConfig,
+starts, downloads its input and a data parameter, uploads an output of the
+same size as its input, and completes, and reports the latency of each
+operation and the download/upload throughput. It then reports the cost of
+publishing a task status as the number of status messages grows.
+
+The results are written as JSON so that they can be compared across runs.
+
+Usage:
+    python benchmark_lifecycle.py --sizes 1KB,1MB,64MB,1GB --latency 0.02
+    python benchmark_lifecycle.py --bandwidth-mb 32 --output results.json
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+import argparse
+import json
+import logging
+import os
+import platform
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import voxel51.platform.config as voxc
+import voxel51.platform.task as voxt
+
+from server import StandInServer
+
+
+_MB = 1024 * 1024
+
+_SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": _MB, "GB": 1024 * _MB}
+
+_SIZE_REGEX = re.compile(r"^(\d+(?:\.\d+)?)\s*([KMG]?B)?$", re.IGNORECASE)
+
+_PARAMETER_SIZE = 256 * 1024
+
+
+def _parse_size(size_str):
+    match = _SIZE_REGEX.match(size_str.strip())
+    if match is None:
+        raise ValueError("Invalid size '%s'" % size_str)
+
+    num, unit = match.groups()
+    return int(float(num) * _SIZE_UNITS[(unit or "").upper()])
+
+
+def _make_file(path, size):
+    # Sparse files make multi-GB inputs cheap to create
+    with open(path, "wb") as f:
+        f.truncate(size)
+
+
+def _write_task_config(server, serve_dir, job_id):
+    task_config = {
+        "job_id": job_id,
+        "analytic": "benchmark",
+        "version": "0.1.0",
+        "inputs": {},
+        "parameters": {
+            "weights": {"signed_url": server.get_url("weights.bin")},
+            "threshold": 0.5,
+        },
+        "status": {"signed_url": server.get_url(job_id + "-status")},
+        "logfile": {"signed_url": server.get_url(job_id + "-log")},
+        "output": {"signed_url": server.get_url(job_id + "-output")},
+    }
+    filename = job_id + "-task.json"
+    with open(os.path.join(serve_dir, filename), "w") as f:
+        json.dump(task_config, f)
+
+    return server.get_url(filename), task_config
+
+
+def _median(values):
+    return sorted(values)[len(values) // 2]
+
+
+def _timed(timings, name, fcn, *args, **kwargs):
+    start = time.time()
+    result = fcn(*args, **kwargs)
+    timings[name] = time.time() - start
+    return result
+
+
+def _run_lifecycle(server, serve_dir, work_dir, job_id, size, args):
+    input_filename = job_id + "-input.bin"
+    _make_file(os.path.join(serve_dir, input_filename), size)
+    server.set_job_inputs(job_id, {"video": input_filename})
+    task_config_url, _ = _write_task_config(server, serve_dir, job_id)
+
+    job_dir = os.path.join(work_dir, job_id)
+    logfile_path = os.path.join(job_dir, "task.log")
+    os.makedirs(job_dir)
+    with open(logfile_path, "w") as f:
+        f.write("benchmark\n")
+
+    timings = {}
+    start = time.time()
+    task_manager = _timed(
+        timings, "from_url", voxt.TaskManager.from_url, task_config_url,
+        background_publish=args.background_publish)
+    _timed(timings, "start", task_manager.start)
+    inputs = _timed(
+        timings, "download_inputs", task_manager.download_inputs,
+        os.path.join(job_dir, "inputs"))
+    _timed(
+        timings, "parse_parameters", task_manager.parse_parameters,
+        os.path.join(job_dir, "params"))
+    _timed(timings, "upload_output", task_manager.upload_output,
+           inputs["video"])
+    _timed(timings, "complete", task_manager.complete,
+           logfile_path=logfile_path)
+    timings["total"] = time.time() - start
+
+    os.remove(os.path.join(serve_dir, input_filename))
+    shutil.rmtree(job_dir)
+    return timings
+
+
+def _summarize_lifecycle(size, runs):
+    operations = {}
+    for name in runs[0]:
+        values = [run[name] for run in runs]
+        operations[name] = {
+            "median_seconds": _median(values),
+            "min_seconds": min(values),
+        }
+
+    def _throughput(name):
+        seconds = operations[name]["median_seconds"]
+        return size / _MB / seconds if seconds > 0 else None
+
+    return {
+        "input_bytes": size,
+        "repeats": len(runs),
+        "operations": operations,
+        "download_mb_per_second": _throughput("download_inputs"),
+        "upload_mb_per_second": _throughput("upload_output"),
+    }
+
+
+def _run_status_publish(server, serve_dir, num_messages, args):
+    job_id = "status-%d" % num_messages
+    _, d = _write_task_config(server, serve_dir, job_id)
+    task_status = voxt.TaskStatus.build_for(voxt.TaskConfig.from_dict(d))
+    task_status.start()
+    for idx in range(num_messages):
+        task_status.add_message("Processed chunk %d" % idx)
+
+    serialize_times = []
+    publish_times = []
+    for _ in range(args.repeat):
+        start = time.time()
+        status_str = task_status.to_str()
+        serialize_times.append(time.time() - start)
+
+        start = time.time()
+        task_status.publish()
+        task_status.flush()
+        publish_times.append(time.time() - start)
+
+    return {
+        "messages": num_messages,
+        "payload_bytes": len(status_str.encode("utf-8")),
+        "serialize_seconds": _median(serialize_times),
+        "publish_seconds": _median(publish_times),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes", default="1KB,1MB,64MB",
+        help="comma-separated input sizes, e.g., 1KB,1MB,1GB")
+    parser.add_argument(
+        "--messages", default="10,100,1000,10000",
+        help="comma-separated status message counts")
+    parser.add_argument(
+        "--repeat", type=int, default=3,
+        help="number of times to run each measurement")
+    parser.add_argument(
+        "--latency", type=float, default=0.0,
+        help="latency, in seconds, to add to each request")
+    parser.add_argument(
+        "--bandwidth-mb", type=float, default=None,
+        help="per-connection bandwidth limit, in MB/s")
+    parser.add_argument(
+        "--background-publish", action="store_true",
+        help="publish task statuses in a background thread")
+    parser.add_argument(
+        "--output", default=None, help="optional path to write the results")
+    parser.add_argument(
+        "--verbose", action="store_true", help="log the SDK's messages")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger("voxel51").setLevel(logging.WARNING)
+
+    sizes = [_parse_size(s) for s in args.sizes.split(",")]
+    message_counts = [int(n) for n in args.messages.split(",")]
+    bandwidth = args.bandwidth_mb * _MB if args.bandwidth_mb else None
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        serve_dir = os.path.join(tmp_dir, "serve")
+        work_dir = os.path.join(tmp_dir, "work")
+        os.makedirs(serve_dir)
+        os.makedirs(work_dir)
+        _make_file(os.path.join(serve_dir, "weights.bin"), _PARAMETER_SIZE)
+
+        with StandInServer(
+                serve_dir, latency=args.latency,
+                bandwidth=bandwidth) as server:
+            os.environ[voxc.API_BASE_URL_ENV_VAR] = server.base_url + "/v1"
+            os.environ.setdefault(voxc.API_TOKEN_ENV_VAR, "private-key")
+
+            lifecycle = []
+            for size in sizes:
+                runs = [
+                    _run_lifecycle(
+                        server, serve_dir, work_dir,
+                        "job-%d-%d" % (size, idx), size, args)
+                    for idx in range(args.repeat)]
+                lifecycle.append(_summarize_lifecycle(size, runs))
+
+            status_publish = [
+                _run_status_publish(server, serve_dir, n, args)
+                for n in message_counts]
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    results = {
+        "environment": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "config": vars(args),
+        "lifecycle": lifecycle,
+        "status_publish": status_publish,
+    }
+    results_str = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(results_str + "\n")
+
+    print(results_str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+'''
+Compares reading image and video metadata from file headers via
+``voxel51.platform.utils.read_video_header`` and ``read_image_header`` with
+the ``eta.core.video.VideoMetadata.build_for`` (``ffprobe``) and
+``eta.core.image.ImageMetadata.build_for`` (decoding) paths, and verifies that
+both paths report the same fields.
+
+By default, the benchmark generates an MP4 video and PNG/JPEG images with
+OpenCV. Pass paths to benchmark your own media instead.
+
+Usage:
+    python benchmark_metadata.py --frames 300 --repeat 10
+    python benchmark_metadata.py /path/to/video.mp4 /path/to/image.jpg
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+import eta.core.image as etai
+import eta.core.video as etav
+
+import voxel51.platform.utils as voxu
+
+
+_IMAGE_EXTS = {".bmp", ".jpeg", ".jpg", ".png"}
+
+#
+# Relative tolerance when comparing the floating point fields reported by the
+# two paths, since ``ffprobe`` rounds the durations that it reports
+#
+_TOLERANCE = 1e-3
+
+
+def _make_media(tmp_dir, args):
+    width, height = args.frame_size
+    rng = np.random.RandomState(0)
+
+    video_path = os.path.join(tmp_dir, "video.mp4")
+    writer = cv2.VideoWriter(
+        video_path, cv2.VideoWriter_fourcc(*"mp4v"), 30, (width, height))
+    for _ in range(args.frames):
+        writer.write(rng.randint(0, 256, (height, width, 3), dtype=np.uint8))
+    writer.release()
+
+    paths = [video_path]
+    img = rng.randint(0, 256, (height, width, 3), dtype=np.uint8)
+    for ext in (".png", ".jpg"):
+        image_path = os.path.join(tmp_dir, "image" + ext)
+        cv2.imwrite(image_path, img)
+        paths.append(image_path)
+
+    return paths
+
+
+def _time(fcn, path, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.time()
+        result = fcn(path)
+        times.append(time.time() - start)
+
+    return result, sorted(times)[len(times) // 2]
+
+
+def _get_mismatches(header, reference):
+    mismatches = []
+    for key, value in reference.serialize().items():
+        header_value = header.serialize().get(key)
+        if isinstance(value, float) and isinstance(header_value, float):
+            ok = abs(value - header_value) <= _TOLERANCE * max(abs(value), 1)
+        else:
+            ok = value == header_value
+
+        if not ok:
+            mismatches.append(
+                {"field": key, "header": header_value, "reference": value})
+
+    return mismatches
+
+
+def _run(path, args):
+    if os.path.splitext(path)[1].lower() in _IMAGE_EXTS:
+        header_fcn = voxu.read_image_header
+        reference_fcn = etai.ImageMetadata.build_for
+    else:
+        header_fcn = voxu.read_video_header
+        reference_fcn = etav.VideoMetadata.build_for
+
+    result = {"path": path, "size_bytes": os.path.getsize(path)}
+
+    header, result["header_seconds"] = _time(header_fcn, path, args.repeat)
+    result["header_supported"] = header is not None
+
+    try:
+        reference, result["reference_seconds"] = _time(
+            reference_fcn, path, args.repeat)
+    except Exception as e:  # pylint: disable=broad-except
+        # e.g., ffprobe is not installed
+        result["reference_error"] = str(e)
+        return result
+
+    if header is not None:
+        result["speedup"] = (
+            result["reference_seconds"] / result["header_seconds"]
+            if result["header_seconds"] > 0 else None)
+        result["mismatches"] = _get_mismatches(header, reference)
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "paths", nargs="*", help="media to benchmark. By default, sample "
+        "media are generated")
+    parser.add_argument(
+        "--frames", type=int, default=300,
+        help="number of frames in the generated video")
+    parser.add_argument(
+        "--frame-size", type=int, nargs=2, default=[1280, 720],
+        metavar=("WIDTH", "HEIGHT"), help="size of the generated media")
+    parser.add_argument(
+        "--repeat", type=int, default=10,
+        help="number of times to read the metadata of each file")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        paths = args.paths or _make_media(tmp_dir, args)
+        results = [_run(path, args) for path in paths]
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
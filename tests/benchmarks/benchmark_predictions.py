@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+'''
+Benchmarks the memory footprint and serialization time of object detections
+stored in ``voxel51.image2video.core.Predictions`` as ``DetectedObject``
+instances vs in the compact array-backed storage.
+
+Usage:
+    python benchmark_predictions.py --frames 2000 --boxes 100
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import eta.core.geometry as etag
+import eta.core.image as etai
+import eta.core.objects as etao
+import eta.core.video as etav
+
+import voxel51.image2video.core as voxc
+
+
+_LABELS = ["person", "car", "truck", "bicycle", "dog"]
+
+
+def _make_detections(num_frames, num_boxes, seed=0):
+    rng = np.random.RandomState(seed)
+    for frame_number in range(1, num_frames + 1):
+        tl = rng.uniform(0, 0.5, size=(num_boxes, 2))
+        br = tl + rng.uniform(0, 0.5, size=(num_boxes, 2))
+        boxes = np.hstack([tl, br]).astype(np.float32)
+        label_ids = rng.randint(len(_LABELS), size=num_boxes)
+        labels = [_LABELS[i] for i in label_ids]
+        confidences = rng.uniform(size=num_boxes).astype(np.float32)
+        yield frame_number, boxes, labels, confidences
+
+
+def _add_objects(predictions, frame_number, boxes, labels, confidences):
+    image_labels = etai.ImageLabels()
+    for box, label, confidence in zip(boxes.tolist(), labels, confidences):
+        image_labels.add_object(
+            etao.DetectedObject(
+                label, etag.BoundingBox.from_coords(*box),
+                confidence=float(confidence)))
+
+    predictions.add(frame_number, image_labels)
+
+
+def _add_arrays(predictions, frame_number, boxes, labels, confidences):
+    predictions.add_detections(frame_number, boxes, labels, confidences)
+
+
+def _run(add_fcn, args, path):
+    tracemalloc.start()
+    start = time.time()
+    predictions = voxc.Predictions()
+    for detections in _make_detections(args.frames, args.boxes):
+        add_fcn(predictions, *detections)
+
+    add_time = time.time() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.time()
+    predictions.write_json(path)
+    write_time = time.time() - start
+    return {
+        "memory_mb": memory / 1024 ** 2,
+        "add_seconds": add_time,
+        "write_seconds": write_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--frames", type=int, default=2000, help="number of frames")
+    parser.add_argument(
+        "--boxes", type=int, default=100, help="number of boxes per frame")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        objects_path = os.path.join(tmp_dir, "objects.json")
+        arrays_path = os.path.join(tmp_dir, "arrays.json")
+        results = {
+            "frames": args.frames,
+            "boxes_per_frame": args.boxes,
+            "objects": _run(_add_objects, args, objects_path),
+            "arrays": _run(_add_arrays, args, arrays_path),
+        }
+
+        results["memory_ratio"] = (
+            results["objects"]["memory_mb"] / results["arrays"]["memory_mb"])
+        results["write_speedup"] = (
+            results["objects"]["write_seconds"] /
+            results["arrays"]["write_seconds"])
+        results["outputs_match"] = (
+            etav.VideoLabels.from_json(objects_path).serialize() ==
+            etav.VideoLabels.from_json(arrays_path).serialize())
+        print(json.dumps(results, indent=4))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+'''
+Benchmarks incremental ``TaskStatus.to_str()`` serialization against full
+re-serialization via ``eta.core.serial.Serializable.to_str()`` for a task
+that logs many status messages and publishes its status periodically.
+
+Usage:
+    python benchmark_status.py --messages 10000 --publish-every 100
+    python benchmark_status.py --messages 10000 --max-tail 1000
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+import argparse
+import json
+import time
+
+from eta.core.serial import Serializable
+
+import voxel51.platform.task as voxt
+
+
+def _make_task_status(max_tail):
+    task_status = voxt.TaskStatus(analytic="benchmark", version="0.1.0")
+    if max_tail is not None:
+        task_status.set_message_retention(
+            voxt.MessageRetentionPolicy(max_tail=max_tail))
+
+    task_status.record_input_metadata(
+        "video", {"frame_size": [1920, 1080], "frame_rate": 30.0})
+    task_status.start()
+    return task_status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--messages", type=int, default=10000,
+        help="number of status messages to log")
+    parser.add_argument(
+        "--publish-every", type=int, default=100,
+        help="number of messages between status publishes")
+    parser.add_argument(
+        "--max-tail", type=int, default=None,
+        help="retain only the last MAX_TAIL messages (and the first 100)")
+    args = parser.parse_args()
+
+    task_status = _make_task_status(args.max_tail)
+    full_time = 0.0
+    incremental_time = 0.0
+    num_publishes = 0
+    identical = True
+    for idx in range(1, args.messages + 1):
+        task_status.add_message("Processed chunk %d ✓" % idx)
+        if idx % args.publish_every and idx != args.messages:
+            continue
+
+        if idx == args.messages:
+            task_status.record_posted_data("labels", "data-id")
+            task_status.complete()
+
+        for pretty_print in (True, False):
+            start = time.time()
+            full_str = Serializable.to_str(
+                task_status, pretty_print=pretty_print)
+            full_time += time.time() - start
+
+            start = time.time()
+            incremental_str = task_status.to_str(pretty_print=pretty_print)
+            incremental_time += time.time() - start
+
+            identical &= full_str == incremental_str
+
+        num_publishes += 1
+
+    results = {
+        "messages": len(task_status.messages),
+        "payload_bytes": len(task_status.to_str().encode("utf-8")),
+        "publishes": num_publishes,
+        "full_seconds": full_time,
+        "incremental_seconds": incremental_time,
+        "speedup": full_time / incremental_time,
+        "identical": identical,
+    }
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,483 @@
+'''
+In-process HTTP stand-in for the signed URLs used by the Voxel51 Platform SDK.
+
+The server serves files from a local directory in the way that cloud storage
+serves signed URLs: ``GET`` and ``HEAD`` requests read files (honoring single
+``Range`` and ``If-Range`` headers), ``PUT`` requests write them, and ``POST``
+requests with an ``x-goog-resumable: start`` header begin resumable upload
+sessions. Latency and per-connection bandwidth can be injected to emulate
+real-world transfers, and faults can be injected to emulate failing services.
+
+The server also emulates the job endpoints of the Platform API that are used
+by ``voxel51.platform.api.API``, so it can serve as the ``API_BASE_URL`` of
+the SDK.
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+import http.server
+import json
+import os
+import re
+import socket
+import socketserver
+import sys
+import threading
+import time
+import uuid
+
+try:
+    import urllib.parse as urlparse  # Python 3
+except ImportError:
+    import urlparse  # Python 2
+
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class StandInServer(object):
+    '''An in-process HTTP server that stands in for signed URL storage.
+
+    Attributes:
+        root_dir (str): the directory from which files are served
+        latency (float): the latency, in seconds, added to each request
+        bandwidth (float): the maximum bandwidth, in bytes per second, of each
+            connection, or None for unlimited
+        accept_ranges (bool): whether the server honors ``Range`` requests
+        resumable (bool): whether the server supports resumable uploads
+        jobs (dict): a dictionary mapping job IDs to dictionaries describing
+            the requests that the emulated Platform API received for them
+        job_inputs (dict): a dictionary mapping job IDs to dictionaries
+            mapping input names to the names of the files in ``root_dir``
+            that the emulated Platform API returns as their signed URLs
+        num_requests (int): the number of requests received by the server
+    '''
+
+    def __init__(
+            self, root_dir, port=0, latency=0.0, bandwidth=None,
+            accept_ranges=True, resumable=True):
+        '''Creates a StandInServer instance.
+
+        Args:
+            root_dir (str): the directory from which to serve files
+            port (int, optional): the port on which to listen. By default, an
+                unused port is chosen
+            latency (float, optional): the latency, in seconds, to add to each
+                request. The default is 0
+            bandwidth (float, optional): the maximum bandwidth, in bytes per
+                second, of each connection. By default, bandwidth is unlimited
+            accept_ranges (bool, optional): whether to honor ``Range``
+                requests. The default is True
+            resumable (bool, optional): whether to support resumable uploads.
+                The default is True
+        '''
+        self.root_dir = root_dir
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.accept_ranges = accept_ranges
+        self.resumable = resumable
+
+        self.jobs = {}
+        self.job_inputs = {}
+        self.num_requests = 0
+
+        self._upload_sessions = {}
+        self._faults = []
+        self._lock = threading.Lock()
+
+        self._httpd = _ThreadingHTTPServer(("localhost", port), _Handler)
+        self._httpd.standin = self
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def base_url(self):
+        '''The base URL of the server.'''
+        return "http://localhost:%d" % self._httpd.server_address[1]
+
+    def get_url(self, filename):
+        '''Returns the URL for the file with the given name.
+
+        Args:
+            filename (str): the name of a file in ``root_dir``
+
+        Returns:
+            the URL of the file
+        '''
+        return self.base_url + "/" + filename
+
+    def set_job_inputs(self, job_id, inputs):
+        '''Sets the inputs that the emulated Platform API returns for the
+        given job.
+
+        Args:
+            job_id (str): the job ID
+            inputs (dict): a dictionary mapping input names to the names of
+                files in ``root_dir``
+        '''
+        with self._lock:
+            self.job_inputs[job_id] = dict(inputs)
+
+    def inject_faults(
+            self, num_faults, status=503, retry_after=None, delay=0.0,
+            path_prefix=None):
+        '''Injects faults into the next requests received by the server.
+
+        Args:
+            num_faults (int): the number of requests to fail
+            status (int, optional): the HTTP status to respond with, or None
+                to respond normally after the ``delay``. The default is 503
+            retry_after (str, optional): an optional ``Retry-After`` header
+                to include in the responses
+            delay (float, optional): a delay, in seconds, before responding,
+                e.g., to trigger client timeouts. The default is 0
+            path_prefix (str, optional): only inject faults into requests
+                whose path starts with this prefix. By default, all requests
+                are affected
+        '''
+        with self._lock:
+            self._faults.append({
+                "remaining": num_faults,
+                "status": status,
+                "retry_after": retry_after,
+                "delay": delay,
+                "path_prefix": path_prefix or "",
+            })
+
+    def clear_faults(self):
+        '''Removes all pending injected faults.'''
+        with self._lock:
+            del self._faults[:]
+
+    def start(self):
+        '''Starts serving requests in a background thread.
+
+        Returns:
+            the StandInServer
+        '''
+        self._thread = threading.Thread(target=self._httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        '''Stops the server.'''
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _pop_fault(self, path):
+        with self._lock:
+            self.num_requests += 1
+            for fault in self._faults:
+                if path.startswith(fault["path_prefix"]):
+                    fault["remaining"] -= 1
+                    if fault["remaining"] <= 0:
+                        self._faults.remove(fault)
+
+                    return fault
+
+        return None
+
+
+_JOBS_PATH_REGEX = re.compile(r"^(?:/v\d+)?/jobs/([^/]+)/(.+)$")
+
+
+class _ThreadingHTTPServer(
+        socketserver.ThreadingMixIn, http.server.HTTPServer):
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that time out close their connections mid-response
+        if isinstance(sys.exc_info()[1], socket.error):
+            return
+
+        http.server.HTTPServer.handle_error(self, request, client_address)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    # Headers and bodies are written separately, so Nagle's algorithm would
+    # otherwise delay small responses until the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    @property
+    def standin(self):
+        return self.server.standin
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        if self._begin_request():
+            self._serve_file(include_body=False)
+
+    def do_GET(self):
+        if self._begin_request():
+            self._serve_file(include_body=True)
+
+    def do_POST(self):
+        if not self._begin_request():
+            return
+
+        if (not self.standin.resumable or
+                self.headers.get("x-goog-resumable") != "start"):
+            self._discard_body()
+            self._send_empty(405)
+            return
+
+        session_id = uuid.uuid4().hex
+        with self.standin._lock:
+            self.standin._upload_sessions[session_id] = (
+                self._get_local_path(), 0)
+
+        self._discard_body()
+        self.send_response(201)
+        self.send_header(
+            "Location", self.standin.base_url + "/upload/" + session_id)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_PUT(self):
+        if not self._begin_request():
+            return
+
+        path = urlparse.urlparse(self.path).path
+        if path.startswith("/upload/"):
+            self._put_upload_part(os.path.basename(path))
+            return
+
+        num_bytes = int(self.headers.get("Content-Length", 0))
+        with open(self._get_local_path(), "wb") as f:
+            self._copy(self.rfile, f, num_bytes)
+
+        self._send_empty(200)
+
+    def _put_upload_part(self, session_id):
+        num_bytes = int(self.headers.get("Content-Length", 0))
+        with self.standin._lock:
+            session = self.standin._upload_sessions.get(session_id)
+
+        if session is None:
+            self._discard_body()
+            self._send_empty(404)
+            return
+
+        local_path, committed = session
+        match = re.match(
+            r"bytes (?:(\d+)-(\d+)|\*)/(\d+)$",
+            self.headers.get("Content-Range", ""))
+        if match is None:
+            self._discard_body()
+            self._send_empty(400)
+            return
+
+        total_size = int(match.group(3))
+        if match.group(1) is not None:
+            start = int(match.group(1))
+            if start != committed:
+                self._discard_body()
+                self._send_empty(400)
+                return
+
+            mode = "r+b" if start > 0 else "wb"
+            with open(local_path, mode) as f:
+                f.seek(start)
+                self._copy(self.rfile, f, num_bytes)
+
+            committed = start + num_bytes
+            with self.standin._lock:
+                self.standin._upload_sessions[session_id] = (
+                    local_path, committed)
+        elif total_size == 0:
+            open(local_path, "wb").close()
+        else:
+            self._discard_body()
+
+        if committed >= total_size:
+            self._send_empty(200)
+            return
+
+        self.send_response(308)
+        if committed > 0:
+            self.send_header("Range", "bytes=0-%d" % (committed - 1))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _begin_request(self):
+        # Returns True if the request should be handled normally
+        if self.standin.latency:
+            time.sleep(self.standin.latency)
+
+        path = urlparse.urlparse(self.path).path
+        fault = self.standin._pop_fault(path)
+        if fault is not None:
+            if fault["delay"]:
+                time.sleep(fault["delay"])
+
+            if fault["status"] is not None:
+                self._discard_body()
+                headers = {}
+                if fault["retry_after"] is not None:
+                    headers["Retry-After"] = fault["retry_after"]
+
+                self._send_json(
+                    fault["status"],
+                    {"error": {
+                        "code": fault["status"],
+                        "message": "Injected fault"}},
+                    headers=headers)
+                return False
+
+        match = _JOBS_PATH_REGEX.match(path)
+        if match is not None:
+            self._handle_jobs_request(*match.groups())
+            return False
+
+        return True
+
+    def _handle_jobs_request(self, job_id, resource):
+        num_bytes = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(num_bytes) if num_bytes else b""
+        with self.standin._lock:
+            job = self.standin.jobs.setdefault(
+                job_id, {"states": [], "metadata": [], "data": []})
+
+        method = self.command
+        if method == "GET" and resource == "url/data":
+            with self.standin._lock:
+                inputs = dict(self.standin.job_inputs.get(job_id, {}))
+
+            self._send_json(200, {
+                name: {"signed_url": self.standin.get_url(filename)}
+                for name, filename in inputs.items()})
+        elif method == "GET" and resource.startswith("url/"):
+            url_type = resource[len("url/"):]
+            self._send_json(200, {
+                "signed_url": self.standin.get_url(
+                    "%s-%s" % (job_id, url_type))})
+        elif method == "PUT" and resource == "state":
+            job["states"].append(json.loads(body.decode("utf-8")))
+            self._send_json(200, {})
+        elif method == "POST" and resource == "metadata":
+            job["metadata"].append(json.loads(body.decode("utf-8")))
+            self._send_json(200, {})
+        elif method == "POST" and resource == "data":
+            data_id = uuid.uuid4().hex
+            job["data"].append({"data_id": data_id, "num_bytes": len(body)})
+            self._send_json(200, {"data": {"data_id": data_id}})
+        else:
+            self._send_json(
+                404, {"error": {"code": 404, "message": "Not found"}})
+
+    def _serve_file(self, include_body):
+        path = self._get_local_path()
+        if not os.path.isfile(path):
+            self._send_empty(404)
+            return
+
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        status = 200
+        byte_range = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if if_range and if_range != _get_etag(path):
+            byte_range = None  # the file changed, so send all of it
+        if byte_range and self.standin.accept_ranges:
+            match = re.match(r"bytes=(\d+)-(\d*)$", byte_range)
+            if match is None or int(match.group(1)) >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", "bytes */%d" % size)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(int(match.group(2)), size - 1)
+            status = 206
+
+        self.send_response(status)
+        if self.standin.accept_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header(
+                "Content-Range", "bytes %d-%d/%d" % (start, end, size))
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("ETag", _get_etag(path))
+        self.end_headers()
+
+        if include_body:
+            with open(path, "rb") as f:
+                f.seek(start)
+                self._copy(f, self.wfile, end - start + 1)
+
+    def _copy(self, src, dst, num_bytes):
+        bandwidth = self.standin.bandwidth
+        start_time = time.time()
+        copied = 0
+        while copied < num_bytes:
+            chunk = src.read(min(_CHUNK_SIZE, num_bytes - copied))
+            if not chunk:
+                break
+
+            dst.write(chunk)
+            copied += len(chunk)
+            if bandwidth:
+                delay = start_time + copied / bandwidth - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+
+    def _discard_body(self):
+        num_bytes = int(self.headers.get("Content-Length", 0))
+        if num_bytes:
+            self.rfile.read(num_bytes)
+
+    def _get_local_path(self):
+        path = urlparse.urlparse(self.path).path
+        return os.path.join(self.standin.root_dir, os.path.basename(path))
+
+    def _send_json(self, code, d, headers=None):
+        body = json.dumps(d).encode("utf-8")
+        self.send_response(code)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_empty(self, code):
+        self.send_response(code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+def _get_etag(path):
+    st = os.stat(path)
+    return "\"%x-%x\"" % (int(st.st_mtime * 1e6), st.st_size)
@@ -0,0 +1,141 @@
+'''
+Tests for committing and restoring
+``voxel51.platform.checkpoint.FrameCheckpoint`` instances.
+
+Usage:
+    python -m unittest discover tests/unit
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import voxel51.platform.checkpoint as voxk
+
+
+class FrameCheckpointTests(unittest.TestCase):
+
+    def setUp(self):
+        self.checkpoint_dir = tempfile.mkdtemp()
+        self.log_path = os.path.join(self.checkpoint_dir, "frames.jsonl")
+
+        # Cleanups run in reverse order, so checkpoints are closed first
+        self.addCleanup(shutil.rmtree, self.checkpoint_dir)
+
+    def open(self, checkpoint_id="job"):
+        checkpoint = voxk.FrameCheckpoint(
+            self.checkpoint_dir, checkpoint_id=checkpoint_id,
+            every_seconds=None, handle_sigterm=False)
+        self.addCleanup(checkpoint.close)
+        return checkpoint
+
+    def test_restore_after_commit(self):
+        checkpoint = self.open()
+        checkpoint.add(1, {"label": "a"})
+        checkpoint.add(2, lambda: {"label": "b"})
+        self.assertTrue(checkpoint.save(timeout=10))
+        checkpoint.close()
+
+        checkpoint = self.open()
+        self.assertEqual(
+            checkpoint.restored_frames(),
+            [(1, {"label": "a"}), (2, {"label": "b"})])
+        self.assertEqual(checkpoint.num_processed, 2)
+        self.assertTrue(checkpoint.is_processed(2))
+        self.assertEqual(checkpoint.get_remaining([1, 2, 3, 4]), [3, 4])
+
+    def test_restore_keeps_last_result_of_frame(self):
+        checkpoint = self.open()
+        checkpoint.add(1, "first")
+        checkpoint.add(2, "other")
+        checkpoint.add(1, "second")
+        checkpoint.close()
+
+        checkpoint = self.open()
+        self.assertEqual(
+            checkpoint.restored_frames(), [(1, "second"), (2, "other")])
+
+    def test_discard_uncommitted_results(self):
+        checkpoint = self.open()
+        checkpoint.add(1, "a")
+        checkpoint.close()
+        committed_size = os.path.getsize(self.log_path)
+
+        # Simulate results that were written but never committed
+        with open(self.log_path, "ab") as f:
+            f.write((json.dumps([2, "b"]) + "\n").encode("utf-8"))
+            f.write(b"[3, \"trunc")
+
+        checkpoint = self.open()
+        self.assertEqual(checkpoint.restored_frames(), [(1, "a")])
+        self.assertFalse(checkpoint.is_processed(2))
+        self.assertEqual(os.path.getsize(self.log_path), committed_size)
+
+        # New results are appended after the committed ones
+        checkpoint.add(2, "c")
+        checkpoint.close()
+        checkpoint = self.open()
+        self.assertEqual(checkpoint.restored_frames(), [(1, "a"), (2, "c")])
+
+    def test_ignore_checkpoint_with_different_id(self):
+        checkpoint = self.open(checkpoint_id="job-1")
+        checkpoint.add(1, "a")
+        checkpoint.close()
+
+        checkpoint = self.open(checkpoint_id="job-2")
+        self.assertEqual(checkpoint.restored_frames(), [])
+        self.assertEqual(checkpoint.get_remaining([1]), [1])
+        self.assertEqual(os.path.getsize(self.log_path), 0)
+
+    def test_commit_every_frames(self):
+        checkpoint = voxk.FrameCheckpoint(
+            self.checkpoint_dir, checkpoint_id="job", every_frames=2,
+            every_seconds=None, handle_sigterm=False)
+        self.addCleanup(checkpoint.close)
+        checkpoint.add(1, "a")
+        checkpoint.add(2, "b")
+
+        # The checkpoint is committed without an explicit save
+        state_path = os.path.join(self.checkpoint_dir, "checkpoint.json")
+        deadline = time.time() + 10
+        while not os.path.isfile(state_path) and time.time() < deadline:
+            time.sleep(0.01)
+
+        with open(state_path, "r") as f:
+            self.assertEqual(json.load(f)["num_frames"], 2)
+
+    def test_clear(self):
+        checkpoint = self.open()
+        checkpoint.add(1, "a")
+        checkpoint.clear()
+
+        self.assertEqual(os.listdir(self.checkpoint_dir), [])
+        self.assertEqual(self.open().restored_frames(), [])
+
+    def test_add_after_close(self):
+        checkpoint = self.open()
+        checkpoint.close()
+        with self.assertRaises(ValueError):
+            checkpoint.add(1, "a")
+
+
+if __name__ == "__main__":
+    unittest.main()
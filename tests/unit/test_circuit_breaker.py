@@ -0,0 +1,189 @@
+'''
+Tests for the circuit breaking of ``voxel51.platform.api.API`` requests.
+
+Usage:
+    python -m unittest discover tests/unit
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+import os
+import time
+import unittest
+
+import requests
+
+import voxel51.platform.api as voxa
+import voxel51.platform.config as voxc
+
+
+_RESET_TIMEOUT = 0.05
+
+
+class _Token(object):
+
+    def get_header(self):
+        return {"Authorization": "Bearer token"}
+
+
+class _Response(object):
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.headers = {}
+        self.content = b""
+        if not self.ok:
+            self.content = b"{\"error\": {\"message\": \"Unavailable\"}}"
+
+
+class _Session(object):
+    '''A stand-in for a ``requests.Session`` that replies to each request
+    with the next of the given outcomes, i.e., a status code or an exception
+    to raise.
+    '''
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.requests = []
+
+    def request(self, method, url, **kwargs):
+        self.requests.append(kwargs.get("json"))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+
+        return _Response(outcome)
+
+
+class CircuitBreakerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.breaker = voxa.CircuitBreaker(
+            failure_threshold=2, reset_timeout=_RESET_TIMEOUT)
+
+    def open_circuit(self, key="m"):
+        self.breaker.record_failure(key)
+        self.breaker.record_failure(key)
+        self.assertEqual(self.breaker.get_state(key), voxa.CircuitBreaker.OPEN)
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure("m")
+        self.breaker.record_success("m")
+        self.breaker.record_failure("m")
+        self.assertEqual(
+            self.breaker.get_state("m"), voxa.CircuitBreaker.CLOSED)
+
+        self.breaker.record_failure("m")
+        self.assertEqual(self.breaker.get_state("m"), voxa.CircuitBreaker.OPEN)
+        with self.assertRaises(voxa.CircuitOpenError):
+            self.breaker.before_call("m")
+
+        # Circuits are independent
+        self.breaker.before_call("other")
+
+    def test_half_open_trial_success_closes(self):
+        self.open_circuit()
+        time.sleep(_RESET_TIMEOUT * 2)
+
+        # Only a single trial request is allowed through
+        self.breaker.before_call("m")
+        self.assertEqual(
+            self.breaker.get_state("m"), voxa.CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(voxa.CircuitOpenError):
+            self.breaker.before_call("m")
+
+        self.breaker.record_success("m")
+        self.assertEqual(
+            self.breaker.get_state("m"), voxa.CircuitBreaker.CLOSED)
+        self.breaker.before_call("m")
+
+    def test_half_open_trial_failure_reopens(self):
+        self.open_circuit()
+        time.sleep(_RESET_TIMEOUT * 2)
+        self.breaker.before_call("m")
+
+        self.breaker.record_failure("m")
+        self.assertEqual(self.breaker.get_state("m"), voxa.CircuitBreaker.OPEN)
+        with self.assertRaises(voxa.CircuitOpenError):
+            self.breaker.before_call("m")
+
+        time.sleep(_RESET_TIMEOUT * 2)
+        self.breaker.before_call("m")
+        self.assertEqual(
+            self.breaker.get_state("m"), voxa.CircuitBreaker.HALF_OPEN)
+
+
+class APICircuitBreakingTests(unittest.TestCase):
+
+    def setUp(self):
+        os.environ.setdefault(
+            voxc.API_BASE_URL_ENV_VAR, "https://api.example.com/v1")
+        self.breaker = voxa.CircuitBreaker(
+            failure_threshold=2, reset_timeout=_RESET_TIMEOUT)
+
+    def make_api(self, outcomes, max_attempts=1):
+        session = _Session(outcomes)
+        api = voxa.API(
+            _Token(), session=session, cache_urls=False,
+            retry_policy=voxa.RetryPolicy(
+                max_attempts=max_attempts, backoff=0),
+            circuit_breaker=self.breaker)
+        return api, session
+
+    def test_failed_trial_request_is_cleared(self):
+        api, session = self.make_api([
+            requests.exceptions.ConnectionError(),
+            requests.exceptions.ConnectionError(),
+            requests.exceptions.ChunkedEncodingError(),
+            204,
+        ])
+        for _ in range(2):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                api.update_job_state("job", "RUNNING")
+
+        with self.assertRaises(voxa.CircuitOpenError):
+            api.update_job_state("job", "RUNNING")
+
+        # The unexpected error of the trial request reopens the circuit
+        time.sleep(_RESET_TIMEOUT * 2)
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            api.update_job_state("job", "RUNNING")
+
+        time.sleep(_RESET_TIMEOUT * 2)
+        api.update_job_state("job", "RUNNING")
+        self.assertEqual(
+            self.breaker.get_state("update_job_state"),
+            voxa.CircuitBreaker.CLOSED)
+        self.assertEqual(len(session.requests), 4)
+
+    def test_terminal_states_bypass_open_circuit(self):
+        api, session = self.make_api([503, 503, 204, 204], max_attempts=2)
+        with self.assertRaises(voxa.APIError):
+            api.update_job_state("job", "RUNNING")
+
+        with self.assertRaises(voxa.CircuitOpenError):
+            api.update_job_state("job", "RUNNING")
+
+        api.update_job_state("job", "COMPLETE")
+        api.update_job_state("job", "FAILED", failure_type="ANALYTIC")
+        self.assertEqual(
+            [r["state"] for r in session.requests],
+            ["RUNNING", "RUNNING", "COMPLETE", "FAILED"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,244 @@
+'''
+Tests for reading image and video metadata from file headers via
+``voxel51.platform.utils.read_image_header`` and ``read_video_header``.
+
+The media are synthetic headers built in memory, so no real media, OpenCV, or
+``ffprobe`` are required.
+
+Usage:
+    python -m unittest discover tests/unit
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import zlib
+
+import voxel51.platform.utils as voxu
+
+
+_IDENTITY_MATRIX = (0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+_ROTATE_90_MATRIX = (0, 0x10000, 0, -0x10000, 0, 0, 0, 0, 0x40000000)
+
+
+def _atom(atom_type, *payloads):
+    payload = b"".join(payloads)
+    return struct.pack(">I4s", 8 + len(payload), atom_type) + payload
+
+
+def _make_mp4(
+        width=1280, height=720, frame_count=300, timescale=30000,
+        duration=300300, codec=b"avc1", matrix=_IDENTITY_MATRIX,
+        mdhd_version=0, sample_size_atom=b"stsz", fragmented=False,
+        moov_first=False):
+    tkhd = _atom(
+        b"tkhd", struct.pack(">I5I8x4H", 0, 0, 0, 1, 0, duration, 0, 0, 0, 0),
+        struct.pack(">9i", *matrix), struct.pack(">II", width << 16,
+                                                 height << 16))
+    if mdhd_version == 1:
+        mdhd = _atom(
+            b"mdhd", struct.pack(
+                ">IQQIQ4x", 1 << 24, 0, 0, timescale, duration))
+    else:
+        mdhd = _atom(
+            b"mdhd", struct.pack(">IIIII4x", 0, 0, 0, timescale, duration))
+
+    hdlr = _atom(b"hdlr", struct.pack(">II4s12x", 0, 0, b"vide"), b"\x00")
+    sample_entry = struct.pack(
+        ">I4s6xH16xHH", 86, codec, 1, width, height) + b"\x00" * 50
+    stsd = _atom(b"stsd", struct.pack(">II", 0, 1), sample_entry)
+    if sample_size_atom is not None:
+        stsz = _atom(
+            sample_size_atom, struct.pack(">III", 0, 0, frame_count),
+            b"\x00\x00\x00\x10" * frame_count)
+    else:
+        stsz = b""
+
+    stbl = _atom(b"stbl", stsd, stsz)
+    mdia = _atom(b"mdia", mdhd, hdlr, _atom(b"minf", stbl))
+    trak = _atom(b"trak", tkhd, mdia)
+    mvex = _atom(b"mvex", _atom(b"trex", b"\x00" * 24)) if fragmented else b""
+    moov = _atom(b"moov", _atom(b"mvhd", b"\x00" * 100), trak, mvex)
+
+    ftyp = _atom(b"ftyp", b"isom\x00\x00\x02\x00isomiso2avc1mp41")
+    mdat = _atom(b"mdat", b"\x00" * (16 * frame_count))
+    if moov_first:
+        return ftyp + moov + mdat
+
+    return ftyp + mdat + moov
+
+
+def _png_chunk(chunk_type, data):
+    crc = zlib.crc32(chunk_type + data) & 0xFFFFFFFF
+    return struct.pack(">I4s", len(data), chunk_type) + data + struct.pack(
+        ">I", crc)
+
+
+def _make_png(width=640, height=480, color_type=2, transparency=False):
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+    chunks = [_png_chunk(b"IHDR", ihdr), _png_chunk(b"gAMA", b"\x00" * 4)]
+    if transparency:
+        chunks.append(_png_chunk(b"tRNS", b"\x00\x00"))
+
+    chunks.append(_png_chunk(b"IDAT", zlib.compress(b"\x00")))
+    chunks.append(_png_chunk(b"IEND", b""))
+    return b"\x89PNG\r\n\x1a\n" + b"".join(chunks)
+
+
+def _jpeg_segment(marker, payload):
+    return struct.pack(">BBH", 0xFF, marker, len(payload) + 2) + payload
+
+
+def _make_jpeg(
+        width=640, height=480, num_components=3, sof_marker=0xC0,
+        fill_bytes=0, scan_first=False):
+    app0 = _jpeg_segment(0xE0, b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00")
+    sof = _jpeg_segment(
+        sof_marker, struct.pack(">BHHB", 8, height, width, num_components) +
+        b"\x01\x11\x00" * num_components)
+    sos = _jpeg_segment(0xDA, b"\x01\x01\x00\x00\x3f\x00")
+    segments = [app0, b"\xff" * fill_bytes, sof, sos]
+    if scan_first:
+        segments = [app0, sos, sof]
+
+    return b"\xff\xd8" + b"".join(segments) + b"\x00\x00\xff\xd9"
+
+
+def _make_bmp(width=64, height=48, bit_count=24, core_header=False):
+    if core_header:
+        dib = struct.pack("<IHHHH", 12, width, height, 1, bit_count)
+    else:
+        dib = struct.pack(
+            "<IiiHHIIiiII", 40, width, height, 1, bit_count, 0, 0, 0, 0, 0, 0)
+
+    file_header = struct.pack("<2sIHHI", b"BM", 0, 0, 0, 14 + len(dib))
+    return file_header + dib + b"\x00" * 16
+
+
+class _HeaderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, filename, data):
+        path = os.path.join(self.tmp_dir, filename)
+        with open(path, "wb") as f:
+            f.write(data)
+
+        return path
+
+
+class ReadVideoHeaderTests(_HeaderTestCase):
+
+    def test_mp4(self):
+        path = self.write("video.mp4", _make_mp4())
+        metadata = voxu.read_video_header(path)
+        self.assertEqual(list(metadata.frame_size), [1280, 720])
+        self.assertEqual(metadata.total_frame_count, 300)
+        self.assertAlmostEqual(metadata.duration, 10.01)
+        self.assertAlmostEqual(metadata.frame_rate, 30000 / 1001)
+        self.assertEqual(metadata.encoding_str, "avc1")
+        self.assertEqual(metadata.size_bytes, os.path.getsize(path))
+
+    def test_moov_before_mdat(self):
+        path = self.write("video.mp4", _make_mp4(moov_first=True))
+        self.assertEqual(voxu.read_video_header(path).total_frame_count, 300)
+
+    def test_rotated(self):
+        path = self.write("video.mov", _make_mp4(matrix=_ROTATE_90_MATRIX))
+        metadata = voxu.read_video_header(path)
+        self.assertEqual(list(metadata.frame_size), [720, 1280])
+
+    def test_version_1_mdhd(self):
+        path = self.write("video.mp4", _make_mp4(mdhd_version=1))
+        self.assertAlmostEqual(voxu.read_video_header(path).duration, 10.01)
+
+    def test_compact_sample_sizes(self):
+        path = self.write("video.mp4", _make_mp4(sample_size_atom=b"stz2"))
+        self.assertEqual(voxu.read_video_header(path).total_frame_count, 300)
+
+    def test_missing_sample_sizes(self):
+        path = self.write("video.mp4", _make_mp4(sample_size_atom=None))
+        self.assertIsNone(voxu.read_video_header(path))
+
+    def test_fragmented(self):
+        path = self.write("video.mp4", _make_mp4(fragmented=True))
+        self.assertIsNone(voxu.read_video_header(path))
+
+    def test_truncated(self):
+        path = self.write("video.mp4", _make_mp4(moov_first=True)[:200])
+        self.assertIsNone(voxu.read_video_header(path))
+
+    def test_not_mp4(self):
+        path = self.write("video.avi", b"RIFF\x00\x00\x00\x00AVI LIST")
+        self.assertIsNone(voxu.read_video_header(path))
+
+
+class ReadImageHeaderTests(_HeaderTestCase):
+
+    def _read(self, filename, data):
+        metadata = voxu.read_image_header(self.write(filename, data))
+        if metadata is None:
+            return None
+
+        return list(metadata.frame_size), metadata.num_channels
+
+    def test_png(self):
+        self.assertEqual(self._read("a.png", _make_png()), ([640, 480], 3))
+        self.assertEqual(
+            self._read("a.png", _make_png(color_type=0)), ([640, 480], 1))
+        self.assertEqual(
+            self._read("a.png", _make_png(color_type=6)), ([640, 480], 4))
+
+    def test_png_decoder_dependent_channels(self):
+        self.assertIsNone(self._read("a.png", _make_png(color_type=3)))
+        self.assertIsNone(self._read("a.png", _make_png(transparency=True)))
+
+    def test_jpeg(self):
+        self.assertEqual(self._read("a.jpg", _make_jpeg()), ([640, 480], 3))
+        self.assertEqual(
+            self._read("a.jpg", _make_jpeg(num_components=1)),
+            ([640, 480], 1))
+        self.assertEqual(
+            self._read("a.jpg", _make_jpeg(sof_marker=0xC2, fill_bytes=3)),
+            ([640, 480], 3))
+
+    def test_jpeg_unsupported(self):
+        self.assertIsNone(self._read("a.jpg", _make_jpeg(num_components=4)))
+        self.assertIsNone(self._read("a.jpg", _make_jpeg(scan_first=True)))
+        self.assertIsNone(self._read("a.jpg", _make_jpeg()[:12]))
+
+    def test_bmp(self):
+        self.assertEqual(self._read("a.bmp", _make_bmp()), ([64, 48], 3))
+        self.assertEqual(
+            self._read("a.bmp", _make_bmp(height=-48)), ([64, 48], 3))
+        self.assertEqual(
+            self._read("a.bmp", _make_bmp(core_header=True)), ([64, 48], 3))
+        self.assertIsNone(self._read("a.bmp", _make_bmp(bit_count=32)))
+
+    def test_unknown_format(self):
+        self.assertIsNone(self._read("a.gif", b"GIF89a" + b"\x00" * 32))
+
+
+if __name__ == "__main__":
+    unittest.main()
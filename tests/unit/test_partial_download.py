@@ -0,0 +1,142 @@
+'''
+Tests for the manifest of the partial files written by
+``voxel51.platform.utils.download_resumable``.
+
+Usage:
+    python -m unittest discover tests/unit
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import voxel51.platform.utils as voxu
+
+
+_URL = "https://storage.example.com/bucket/video.mp4"
+_ETAG = "\"abc\""
+_SIZE = 1000
+
+
+class _Response(object):
+
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class PartialDownloadTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.local_path = os.path.join(tmp_dir, "video.mp4")
+
+    def make(self, url=_URL, etag=_ETAG, size=_SIZE):
+        return voxu._PartialDownload(url, self.local_path, etag, size)
+
+    def test_new_download(self):
+        partial = self.make()
+        self.assertFalse(partial.load())
+        self.assertEqual(os.path.getsize(partial.part_path), _SIZE)
+        self.assertEqual(partial.get_missing_ranges(), [(0, _SIZE)])
+        self.assertEqual(partial.bytes_downloaded, 0)
+
+    def test_merge_ranges(self):
+        partial = self.make()
+        partial.load()
+        partial.record(100, 200)
+        partial.record(300, 400)
+        partial.record(200, 250)  # adjacent
+        partial.record(350, 500)  # overlapping
+        partial.record(600, 600)  # empty
+
+        self.assertEqual(
+            partial.get_missing_ranges(),
+            [(0, 100), (250, 300), (500, _SIZE)])
+        self.assertEqual(partial.bytes_downloaded, 350)
+
+        partial.record(0, _SIZE)
+        self.assertEqual(partial.get_missing_ranges(), [])
+
+    def test_resume_from_manifest(self):
+        partial = self.make()
+        partial.load()
+        partial.record(0, 400)
+        partial.record(800, _SIZE)
+
+        # Signed URLs are refreshed across resumes
+        resumed = self.make(url=_URL + "?Signature=new")
+        self.assertTrue(resumed.load())
+        self.assertEqual(resumed.get_missing_ranges(), [(400, 800)])
+
+    def test_reset_on_validator_mismatch(self):
+        for kwargs in (
+                {"etag": "\"def\""},
+                {"size": _SIZE + 1},
+                {"url": "https://storage.example.com/bucket/other.mp4"}):
+            partial = self.make()
+            partial.load()
+            partial.record(0, 400)
+
+            changed = self.make(**kwargs)
+            self.assertFalse(changed.load())
+            self.assertEqual(
+                changed.get_missing_ranges(), [(0, changed.size)])
+            self.assertEqual(
+                os.path.getsize(changed.part_path), changed.size)
+
+    def test_reset_on_missing_part_file(self):
+        partial = self.make()
+        partial.load()
+        partial.record(0, 400)
+        os.remove(partial.part_path)
+
+        resumed = self.make()
+        self.assertFalse(resumed.load())
+        self.assertEqual(resumed.get_missing_ranges(), [(0, _SIZE)])
+
+    def test_finish(self):
+        partial = self.make()
+        partial.load()
+        partial.record(0, 500)
+        with self.assertRaises(IOError):
+            partial.finish()
+
+        partial.record(500, _SIZE)
+        partial.finish()
+        self.assertEqual(os.path.getsize(self.local_path), _SIZE)
+        self.assertFalse(os.path.exists(partial.part_path))
+        self.assertFalse(os.path.exists(partial.manifest_path))
+
+    def test_matches(self):
+        partial = self.make()
+        self.assertTrue(partial.matches(_Response(
+            {"ETag": _ETAG, "Content-Length": str(_SIZE)})))
+        self.assertFalse(partial.matches(_Response(
+            {"ETag": "\"def\"", "Content-Length": str(_SIZE)})))
+        self.assertFalse(partial.matches(_Response(
+            {"ETag": _ETAG, "Content-Length": str(_SIZE + 1)})))
+        self.assertFalse(partial.matches(_Response({"ETag": _ETAG})))
+        self.assertFalse(partial.matches(_Response(
+            {"ETag": _ETAG, "Content-Length": str(_SIZE),
+             "Content-Encoding": "gzip"})))
+
+
+if __name__ == "__main__":
+    unittest.main()
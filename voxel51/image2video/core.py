@@ -17,10 +17,32 @@ from builtins import *
 # pragma pylint: enable=unused-wildcard-import
 # pragma pylint: enable=wildcard-import
 
+from collections import deque
+import functools
+import io
+import json
 import logging
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import traceback
 
+try:
+    import queue  # Python 3
+except ImportError:
+    import Queue as queue  # Python 2
+
+import numpy as np
+
+import eta.core.geometry as etag
 import eta.core.image as etai
 import eta.core.logging as etal
+import eta.core.objects as etao
+import eta.core.serial as etas
 import eta.core.utils as etau
 import eta.core.video as etav
 
@@ -28,6 +50,10 @@ import eta.core.video as etav
 logger = logging.getLogger(__name__)
 
 
+# State of the current inference worker process; see `run_inference`
+_WORKER = {}
+
+
 # Local paths; don't change these!
 TASK_LOGFILE_PATH = "/var/log/image.log"
 IMAGE_TO_VIDEO_FRAMES_DIR = "/shared/user/inputs/frames"
@@ -39,17 +65,92 @@ class Predictions(object):
 
     Internally, the labels are stored in ``eta.core.video.VideoLabels``
     format, which is abstracted from the user of this class, for convenience.
+
+    Object detections can alternatively be added via
+    :func:`Predictions.add_detections`, which stores them in compact arrays
+    rather than as individual ``eta.core.objects.DetectedObject`` instances.
+    The detections are only converted to ``VideoLabels`` format when the
+    predictions are written, which greatly reduces the memory footprint and
+    serialization time of dense detector outputs.
+
+    In streaming mode, frames are not accumulated in memory. Instead, they are
+    buffered in a window of at most ``buffer_size`` frames that is appended
+    to a partial output file whenever it fills up, so memory usage does not
+    grow with the length of the video. The partial file is staged in the
+    directory of ``output_path`` and is moved into place by
+    :func:`Predictions.write_json`, and the resulting file is compatible
+    with the ``eta.core.video.VideoLabels`` JSON format. In this mode,
+    ``labels`` only holds the video-level labels.
+
+    If a ``voxel51.platform.checkpoint.FrameCheckpoint`` is provided, the
+    frames that it restored are added to the predictions when they are
+    created, and each frame that is added is also added to the checkpoint.
+    The frames are serialized for the checkpoint in its background thread, so
+    the labels that you add must not be modified afterwards. Pass the same
+    checkpoint to :func:`read_images` to skip the frames that were already
+    processed.
+
+    Attributes:
+        labels (eta.core.video.VideoLabels): the labels
+        stream (bool): whether the predictions are streamed to disk
+        buffer_size (int): the maximum number of frames buffered in memory in
+            streaming mode
+        output_path (str): the path to which the predictions will be written
+            in streaming mode
+        checkpoint (voxel51.platform.checkpoint.FrameCheckpoint): the
+            checkpoint of the predictions, or None
     '''
 
-    def __init__(self):
-        '''Creates a Predictions instance.'''
+    def __init__(
+            self, stream=False, buffer_size=256, checkpoint=None,
+            output_path=IMAGE_TO_VIDEO_LABELS_PATH):
+        '''Creates a Predictions instance.
+
+        Args:
+            stream (bool, optional): whether to stream the predictions to disk
+                as they are added rather than holding them all in memory. By
+                default, this is False
+            buffer_size (int, optional): the maximum number of frames to
+                buffer in memory before appending them to disk in streaming
+                mode. The default is 256
+            checkpoint (voxel51.platform.checkpoint.FrameCheckpoint,
+                optional): a checkpoint from which to restore frames and to
+                which to add new frames
+            output_path (str, optional): the path to which the predictions
+                will be written in streaming mode, next to which the partial
+                output file is staged. The default is
+                ``IMAGE_TO_VIDEO_LABELS_PATH``
+        '''
         self.labels = etav.VideoLabels()
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.checkpoint = checkpoint
+        self.output_path = output_path
+
+        self._detections = _DetectionColumns()
+        self._detection_frames = set()
+        self._num_detection_only_frames = 0
+        self._buffer = []
+        self._num_frames = 0
+        self._num_written = 0
+        self._is_written = False
+        self._partial_path = None
+        self._partial_file = None
+
+        if checkpoint is not None:
+            for frame_number, frame_dict in checkpoint.restored_frames():
+                self._add_serialized(frame_number, frame_dict)
 
     def __bool__(self):
         return len(self) > 0
 
     def __len__(self):
-        return self.labels.num_frames
+        if self.stream:
+            return self._num_frames
+
+        # Frames that received both labels and detections are only counted
+        # by `labels`
+        return self.labels.num_frames + self._num_detection_only_frames
 
     def add(self, frame_number, image_labels):
         '''Adds labels for the given frame number to the collection.
@@ -59,9 +160,332 @@ class Predictions(object):
             image_labels (ImageLabels): an ``eta.core.image.ImageLabels``
                 describing the predictions for the given frame
         '''
-        self.labels.add_frame(
-            etav.VideoFrameLabels.from_image_labels(
-                image_labels, frame_number))
+        frame_labels = etav.VideoFrameLabels.from_image_labels(
+            image_labels, frame_number)
+        if not self.stream:
+            self._add_frame_labels(frame_labels)
+            if self.checkpoint is not None:
+                self.checkpoint.add(frame_number, frame_labels.serialize)
+
+            return
+
+        frame_dict = frame_labels.serialize()
+        self._append(frame_number, frame_dict)
+        if self.checkpoint is not None:
+            self.checkpoint.add(frame_number, frame_dict)
+
+    def add_batch(self, frame_numbers, image_labels_list):
+        '''Adds labels for a batch of frames to the collection.
+
+        This method is the counterpart of :func:`read_image_batches`: the
+        ``frame_numbers`` array that it emits can be passed here along with
+        the predictions for the batch.
+
+        Args:
+            frame_numbers (list or numpy.ndarray): the frame numbers of the
+                batch
+            image_labels_list (list): a list of ``eta.core.image.ImageLabels``
+                describing the predictions for each frame in the batch
+
+        Raises:
+            ValueError: if the number of frame numbers and labels differ
+        '''
+        if len(frame_numbers) != len(image_labels_list):
+            raise ValueError(
+                "Expected labels for %d frames, but found %d" %
+                (len(frame_numbers), len(image_labels_list)))
+
+        for frame_number, image_labels in zip(
+                frame_numbers, image_labels_list):
+            self.add(int(frame_number), image_labels)
+
+    def add_detections(
+            self, frame_number, boxes, labels, confidences=None):
+        '''Adds object detections for the given frame number to the
+        collection.
+
+        The detections are stored in compact arrays and are only converted to
+        ``eta.core.objects.DetectedObject`` format when the predictions are
+        written. Each frame number should be added at most once, either via
+        this method or via :func:`Predictions.add`.
+
+        Args:
+            frame_number (int): the frame number
+            boxes (numpy.ndarray): an ``n x 4`` array of bounding boxes in
+                ``[top-left-x, top-left-y, bottom-right-x, bottom-right-y]``
+                format, in relative coordinates
+            labels (list): a length-``n`` list of labels for the detections
+            confidences (numpy.ndarray, optional): an optional length-``n``
+                array of confidences for the detections
+
+        Raises:
+            ValueError: if the numbers of boxes, labels, and confidences differ
+        '''
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        if len(labels) != len(boxes) or (
+                confidences is not None and len(confidences) != len(boxes)):
+            raise ValueError(
+                "Expected %d labels and confidences, but found %d and %s" %
+                (len(boxes), len(labels),
+                 len(confidences) if confidences is not None else None))
+
+        if not self.stream:
+            self._detections.add(frame_number, boxes, labels, confidences)
+            if frame_number not in self._detection_frames:
+                self._detection_frames.add(frame_number)
+                if not self.labels.has_frame(frame_number):
+                    self._num_detection_only_frames += 1
+
+            if self.checkpoint is not None:
+                # Copy the inputs, since they are serialized in the background
+                self.checkpoint.add(
+                    frame_number,
+                    functools.partial(
+                        _DetectionColumns.serialize_frame, frame_number,
+                        boxes.copy(), list(labels),
+                        np.array(confidences)
+                        if confidences is not None else None))
+
+            return
+
+        frame_dict = _DetectionColumns.serialize_frame(
+            frame_number, boxes, labels, confidences)
+        self._append(frame_number, frame_dict)
+        if self.checkpoint is not None:
+            self.checkpoint.add(frame_number, frame_dict)
+
+    def write_json(self, path):
+        '''Writes the predictions to disk in ``eta.core.video.VideoLabels``
+        format.
+
+        In streaming mode, this finalizes the partial output file and moves it
+        to ``path``, after which no more predictions can be added.
+
+        Args:
+            path (str): the path to write the JSON file
+        '''
+        if not self.stream:
+            self._write_json(path)
+            return
+
+        self._flush()
+        header = self.labels.serialize()
+        header.pop("frames", None)
+        header_str = etas.json_to_str(header, pretty_print=False)[1:-1]
+        self._partial_file.write("}")
+        if header_str:
+            self._partial_file.write(", " + header_str)
+        self._partial_file.write("}")
+        self._partial_file.close()
+        self._partial_file = None
+
+        etau.ensure_basedir(path)
+        shutil.move(self._partial_path, path)
+        self._is_written = True
+
+    def _write_json(self, path):
+        if not self._detections.num_frames:
+            self.labels.write_json(path)
+            return
+
+        d = self.labels.serialize()
+        frames = {str(k): v for k, v in d.get("frames", {}).items()}
+        d["frames"] = frames
+        for frame_number, frame in self._detections.iter_serialized_frames():
+            key = str(frame_number)
+            if key not in frames:
+                frames[key] = frame
+            elif "objects" in frames[key]:
+                # Concatenate rather than extend, so that the labels are
+                # never modified
+                frames[key]["objects"]["objects"] = (
+                    frames[key]["objects"]["objects"] +
+                    frame["objects"]["objects"])
+            else:
+                frames[key]["objects"] = frame["objects"]
+
+        etas.write_json(d, path)
+
+    def _add_serialized(self, frame_number, frame_dict):
+        if not self.stream:
+            self._add_frame_labels(
+                etav.VideoFrameLabels.from_dict(frame_dict))
+            return
+
+        self._append(frame_number, frame_dict)
+
+    def _add_frame_labels(self, frame_labels):
+        frame_number = frame_labels.frame_number
+        if (frame_number in self._detection_frames and
+                not self.labels.has_frame(frame_number)):
+            self._num_detection_only_frames -= 1
+
+        self.labels.add_frame(frame_labels)
+
+    def _append(self, frame_number, frame_dict):
+        self._buffer.append((frame_number, frame_dict))
+        self._num_frames += 1
+        if len(self._buffer) >= self.buffer_size:
+            self._flush()
+
+    def _flush(self):
+        if self._is_written:
+            raise ValueError(
+                "Cannot add predictions after they have been written")
+
+        if self._partial_file is None:
+            # Use a unique partial file per instance, on the same filesystem
+            # as the output so that it can be moved into place atomically
+            etau.ensure_basedir(self.output_path)
+            fd, self._partial_path = tempfile.mkstemp(
+                dir=os.path.dirname(self.output_path) or None,
+                prefix=os.path.basename(self.output_path) + ".",
+                suffix=".partial")
+            self._partial_file = io.open(fd, "w", encoding="utf-8")
+            self._partial_file.write("{\"frames\": {")
+
+        for frame_number, frame_dict in self._buffer:
+            frame_str = etas.json_to_str(frame_dict, pretty_print=False)
+            self._partial_file.write(
+                "%s\"%d\": %s" % (
+                    ", " if self._num_written else "", frame_number,
+                    frame_str))
+            self._num_written += 1
+
+        self._buffer = []
+
+
+class _DetectionColumns(object):
+    '''Columnar storage for object detections.
+
+    The detections are stored in contiguous arrays that grow geometrically.
+    The detections of frame ``frame_numbers[i]`` are the rows
+    ``offsets[i]:offsets[i + 1]`` of the detection arrays.
+    '''
+
+    _FRAME_TEMPLATE = None
+
+    def __init__(self):
+        self.num_frames = 0
+        self.num_detections = 0
+        self.label_names = []
+
+        self._label_ids = {}
+        self._frame_numbers = np.zeros(16, dtype=np.int64)
+        self._offsets = np.zeros(17, dtype=np.int64)
+        self._boxes = np.zeros((64, 4), dtype=np.float64)
+        self._confidences = np.zeros(64, dtype=np.float64)
+        self._has_confidence = np.zeros(64, dtype=bool)
+        self._ids = np.zeros(64, dtype=np.int32)
+
+    def add(self, frame_number, boxes, labels, confidences):
+        num_boxes = len(boxes)
+        if self.num_frames + 1 >= len(self._frame_numbers):
+            self._frame_numbers = _grow(self._frame_numbers)
+            self._offsets = _grow(self._offsets)
+
+        end = self.num_detections + num_boxes
+        if end > len(self._ids):
+            capacity = max(end, 2 * len(self._ids))
+            self._boxes = _grow(self._boxes, capacity)
+            self._confidences = _grow(self._confidences, capacity)
+            self._has_confidence = _grow(self._has_confidence, capacity)
+            self._ids = _grow(self._ids, capacity)
+
+        start = self.num_detections
+        self._boxes[start:end] = boxes
+        self._ids[start:end] = [self._get_label_id(l) for l in labels]
+        if confidences is not None:
+            self._confidences[start:end] = confidences
+            self._has_confidence[start:end] = True
+        else:
+            self._has_confidence[start:end] = False
+
+        self._frame_numbers[self.num_frames] = frame_number
+        self.num_frames += 1
+        self._offsets[self.num_frames] = end
+        self.num_detections = end
+
+    def iter_serialized_frames(self):
+        for i in range(self.num_frames):
+            start, end = self._offsets[i], self._offsets[i + 1]
+            frame_number = int(self._frame_numbers[i])
+            confidences = self._confidences[start:end].tolist()
+            for j, has_confidence in enumerate(
+                    self._has_confidence[start:end]):
+                if not has_confidence:
+                    confidences[j] = None
+
+            labels = [self.label_names[k] for k in self._ids[start:end]]
+            yield frame_number, self.serialize_frame(
+                frame_number, self._boxes[start:end], labels, confidences)
+
+    @classmethod
+    def serialize_frame(cls, frame_number, boxes, labels, confidences):
+        frame_template, obj_template = cls._get_templates()
+        if confidences is None:
+            confidences = [None] * len(labels)
+        elif isinstance(confidences, np.ndarray):
+            confidences = confidences.tolist()
+
+        objects = []
+        for box, label, confidence in zip(
+                boxes.tolist(), labels, confidences):
+            obj = obj_template.copy()
+            obj["label"] = label
+            if "frame_number" in obj:
+                obj["frame_number"] = frame_number
+            if confidence is not None:
+                obj["confidence"] = confidence
+            else:
+                obj.pop("confidence", None)
+
+            obj["bounding_box"] = {
+                "top_left": {"x": box[0], "y": box[1]},
+                "bottom_right": {"x": box[2], "y": box[3]},
+            }
+            objects.append(obj)
+
+        frame = frame_template.copy()
+        frame["frame_number"] = frame_number
+        frame["objects"] = frame_template["objects"].copy()
+        frame["objects"]["objects"] = objects
+        return frame
+
+    @classmethod
+    def _get_templates(cls):
+        # Serialize a prototype detection via ETA so that the generated JSON
+        # matches the format of the installed version of ETA
+        if cls._FRAME_TEMPLATE is None:
+            image_labels = etai.ImageLabels()
+            image_labels.add_object(
+                etao.DetectedObject(
+                    "", etag.BoundingBox.from_coords(0, 0, 0, 0),
+                    confidence=0.0))
+            frame = json.loads(
+                etav.VideoFrameLabels.from_image_labels(
+                    image_labels, 0).to_str(pretty_print=False))
+            cls._FRAME_TEMPLATE = (frame, frame["objects"]["objects"][0])
+
+        return cls._FRAME_TEMPLATE
+
+    def _get_label_id(self, label):
+        label_id = self._label_ids.get(label)
+        if label_id is None:
+            label_id = len(self.label_names)
+            self._label_ids[label] = label_id
+            self.label_names.append(label)
+
+        return label_id
+
+
+def _grow(arr, capacity=None):
+    if capacity is None:
+        capacity = 2 * len(arr)
+
+    grown = np.zeros((capacity,) + arr.shape[1:], dtype=arr.dtype)
+    grown[:len(arr)] = arr
+    return grown
 
 
 def setup_logging():
@@ -73,22 +497,415 @@ def setup_logging():
     etal.custom_setup(logging_config, rotate=False)
 
 
-def read_images():
+def read_images(prefetch=0, num_workers=1, checkpoint=None):
     '''Returns an iterator over the images to process and their frame numbers
     in the source video.
 
+    If a ``voxel51.platform.checkpoint.FrameCheckpoint`` is provided, the
+    frames that it has already processed are skipped.
+
+    By default, each image is read from disk when it is requested. When
+    ``prefetch > 0``, images are read and decoded ahead of time by
+    ``num_workers`` background threads, so that disk I/O and decoding overlap
+    with the work that you perform on each image. At most ``prefetch`` images
+    are read ahead of the consumer, which bounds memory usage, and the images
+    are always emitted in frame order.
+
+    Args:
+        prefetch (int, optional): the maximum number of images to read ahead
+            of the consumer. The default is 0, which disables prefetching
+        num_workers (int, optional): the number of background threads to use
+            to read images when prefetching. The default is 1
+        checkpoint (voxel51.platform.checkpoint.FrameCheckpoint, optional): a
+            checkpoint whose processed frames to skip
+
     Returns:
         an iterator that emits ``(img, frame_number)`` tuples containing the
         images to predict and their associated frame numbers
     '''
+    img_patt, frame_numbers = _get_frames_to_process(checkpoint)
+    if prefetch > 0:
+        return _read_images_prefetched(
+            img_patt, frame_numbers, prefetch, num_workers)
+
+    return _read_images(img_patt, frame_numbers)
+
+
+def _get_frames_to_process(checkpoint):
     img_patt, frame_numbers = etau.parse_dir_pattern(IMAGE_TO_VIDEO_FRAMES_DIR)
     logger.info("Found %d frames", len(frame_numbers))
+    if checkpoint is not None:
+        num_frames = len(frame_numbers)
+        frame_numbers = checkpoint.get_remaining(frame_numbers)
+        logger.info(
+            "Skipping %d frame(s) that were already processed",
+            num_frames - len(frame_numbers))
+
+    return img_patt, frame_numbers
+
+
+def _read_images(img_patt, frame_numbers):
     for frame_number in frame_numbers:
         logger.debug("Processing frame %d", frame_number)
         img = etai.read(img_patt % frame_number)
         yield img, frame_number
 
 
+def _read_images_prefetched(img_patt, frame_numbers, prefetch, num_workers):
+    num_workers = max(1, min(num_workers, prefetch))
+    logger.info(
+        "Prefetching up to %d frames with %d worker(s)", prefetch,
+        num_workers)
+    pool = ThreadPool(num_workers)
+    pending = deque()
+    frame_numbers = iter(frame_numbers)
+
+    def _submit_next():
+        frame_number = next(frame_numbers, None)
+        if frame_number is not None:
+            pending.append((
+                frame_number,
+                pool.apply_async(etai.read, (img_patt % frame_number,))))
+
+    try:
+        for _ in range(prefetch):
+            _submit_next()
+
+        while pending:
+            frame_number, result = pending.popleft()
+            img = result.get()
+            _submit_next()
+            logger.debug("Processing frame %d", frame_number)
+            yield img, frame_number
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def read_image_batches(
+        batch_size, prefetch=0, num_workers=1, checkpoint=None):
+    '''Returns an iterator over batches of the images to process and their
+    frame numbers in the source video.
+
+    The images in each batch are stacked into a single array, so the batches
+    can be passed directly to models that support batched inference. The last
+    batch contains the remaining images and may be smaller than
+    ``batch_size``.
+
+    Args:
+        batch_size (int): the number of images per batch
+        prefetch (int, optional): the maximum number of images to read ahead
+            of the consumer. See :func:`read_images` for details. The default
+            is 0, which disables prefetching
+        num_workers (int, optional): the number of background threads to use
+            to read images when prefetching. The default is 1
+        checkpoint (voxel51.platform.checkpoint.FrameCheckpoint, optional): a
+            checkpoint whose processed frames to skip
+
+    Returns:
+        an iterator that emits ``(imgs, frame_numbers)`` tuples, where
+        ``imgs`` is an ``n x height x width x channels`` array containing the
+        images in the batch and ``frame_numbers`` is a length-``n`` array of
+        their frame numbers
+
+    Raises:
+        ValueError: if ``batch_size`` is not positive
+    '''
+    if batch_size < 1:
+        raise ValueError("batch_size must be positive; found %d" % batch_size)
+
+    return _batch_images(
+        read_images(
+            prefetch=prefetch, num_workers=num_workers,
+            checkpoint=checkpoint),
+        batch_size)
+
+
+def _batch_images(images, batch_size):
+    imgs, frame_numbers = [], []
+    for img, frame_number in images:
+        imgs.append(img)
+        frame_numbers.append(frame_number)
+        if len(imgs) == batch_size:
+            yield np.stack(imgs), np.array(frame_numbers)
+            imgs, frame_numbers = [], []
+
+    if imgs:
+        yield np.stack(imgs), np.array(frame_numbers)
+
+
+def read_video(
+        video_path, frames=None, stride=1, prefetch=0, checkpoint=None):
+    '''Returns an iterator over the frames of the given video and their frame
+    numbers.
+
+    This is an alternative to :func:`read_images` that decodes the video
+    directly via an ``ffmpeg`` pipe, so the frames need not be extracted to
+    disk first. The frames are emitted in the same ``(img, frame_number)``
+    format as :func:`read_images`, as RGB arrays with 1-based frame numbers.
+
+    When ``prefetch > 0``, frames are decoded in a background thread, so that
+    decoding overlaps with the work that you perform on each frame. At most
+    ``prefetch`` frames are decoded ahead of the consumer, which bounds memory
+    usage.
+
+    If a ``voxel51.platform.checkpoint.FrameCheckpoint`` is provided, the
+    frames that it has already processed are decoded but not emitted.
+
+    Args:
+        video_path (str): the path to the video
+        frames (str, optional): the frames to read, in any format supported
+            by ``eta.core.video.FFmpegVideoReader``, e.g., a string like
+            ``"1-100,201-300"`` or a list of frame numbers. By default, all
+            frames are read
+        stride (int, optional): read every ``stride``-th frame of the
+            selected frames, starting with the first. The default is 1
+        prefetch (int, optional): the maximum number of frames to decode
+            ahead of the consumer. The default is 0, which disables
+            prefetching
+        checkpoint (voxel51.platform.checkpoint.FrameCheckpoint, optional): a
+            checkpoint whose processed frames to skip
+
+    Returns:
+        an iterator that emits ``(img, frame_number)`` tuples containing the
+        frames to predict and their associated frame numbers
+
+    Raises:
+        ValueError: if ``stride`` is not positive
+    '''
+    if stride < 1:
+        raise ValueError("stride must be positive; found %d" % stride)
+
+    images = _read_video(video_path, frames, stride, checkpoint)
+    if prefetch > 0:
+        logger.info("Prefetching up to %d frames", prefetch)
+        return _prefetch(images, prefetch)
+
+    return images
+
+
+def read_video_batches(
+        video_path, batch_size, frames=None, stride=1, prefetch=0,
+        checkpoint=None):
+    '''Returns an iterator over batches of the frames of the given video and
+    their frame numbers.
+
+    See :func:`read_video` and :func:`read_image_batches` for details.
+
+    Args:
+        video_path (str): the path to the video
+        batch_size (int): the number of frames per batch
+        frames (str, optional): the frames to read. By default, all frames are
+            read
+        stride (int, optional): read every ``stride``-th frame of the
+            selected frames. The default is 1
+        prefetch (int, optional): the maximum number of frames to decode
+            ahead of the consumer. The default is 0, which disables
+            prefetching
+        checkpoint (voxel51.platform.checkpoint.FrameCheckpoint, optional): a
+            checkpoint whose processed frames to skip
+
+    Returns:
+        an iterator that emits ``(imgs, frame_numbers)`` tuples, where
+        ``imgs`` is an ``n x height x width x 3`` array containing the frames
+        in the batch and ``frame_numbers`` is a length-``n`` array of their
+        frame numbers
+
+    Raises:
+        ValueError: if ``batch_size`` or ``stride`` is not positive
+    '''
+    if batch_size < 1:
+        raise ValueError("batch_size must be positive; found %d" % batch_size)
+
+    return _batch_images(
+        read_video(
+            video_path, frames=frames, stride=stride, prefetch=prefetch,
+            checkpoint=checkpoint),
+        batch_size)
+
+
+def _read_video(video_path, frames, stride, checkpoint):
+    logger.info("Reading frames from '%s'", video_path)
+    with etav.FFmpegVideoReader(video_path, frames=frames) as vr:
+        for idx, img in enumerate(vr):
+            if idx % stride:
+                continue
+
+            frame_number = vr.frame_number
+            if checkpoint is not None and checkpoint.is_processed(
+                    frame_number):
+                continue
+
+            logger.debug("Processing frame %d", frame_number)
+            yield img, frame_number
+
+
+def _prefetch(iterator, prefetch):
+    # Consumes `iterator` in a background thread, buffering at most
+    # `prefetch` items, and re-raises any error in the consumer
+    buf = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    done = object()
+
+    def _put(entry):
+        while not stop.is_set():
+            try:
+                buf.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+
+        return False
+
+    def _produce():
+        try:
+            for item in iterator:
+                if not _put((item, None)):
+                    iterator.close()
+                    return
+
+            _put((done, None))
+        except Exception as e:
+            _put((done, e))
+
+    thread = threading.Thread(target=_produce)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            item, error = buf.get()
+            if error is not None:
+                raise error
+
+            if item is done:
+                break
+
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+class InferenceError(Exception):
+    '''Exception raised when a worker of :func:`run_inference` fails.'''
+    pass
+
+
+def run_inference(
+        load_model, process_image, num_workers=None, chunk_size=16,
+        predictions=None):
+    '''Performs inference on the images to process using a pool of worker
+    processes.
+
+    The frames are split into chunks of ``chunk_size`` consecutive frames that
+    are distributed across ``num_workers`` processes. Each worker calls
+    ``load_model()`` once when it starts and then, for each of its frames,
+    reads the image and calls ``process_image(model, img)``. The results are
+    added to ``predictions`` in frame order.
+
+    ``load_model`` and ``process_image`` must be picklable, e.g., functions
+    defined at the top-level of a module, and the models that they use are
+    not shared between workers, so each worker holds its own copy of the
+    model in memory.
+
+    Any error raised by a worker is logged, with its traceback, by the calling
+    process, and an :class:`InferenceError` is raised.
+
+    If ``predictions`` has a checkpoint, the frames that it has already
+    processed are skipped.
+
+    Args:
+        load_model: a function that accepts no arguments and returns the model
+            to use
+        process_image: a function that accepts ``(model, img)`` and returns
+            an ``eta.core.image.ImageLabels`` instance describing the image
+        num_workers (int, optional): the number of worker processes to use.
+            By default, one worker per CPU is used
+        chunk_size (int, optional): the number of consecutive frames that
+            each worker processes at a time. The default is 16
+        predictions (Predictions, optional): the Predictions to which to add
+            the results, e.g., a streaming Predictions instance. By default,
+            a new Predictions instance is created
+
+    Returns:
+        the Predictions
+
+    Raises:
+        InferenceError: if a worker failed
+    '''
+    if predictions is None:
+        predictions = Predictions()
+
+    img_patt, frame_numbers = _get_frames_to_process(predictions.checkpoint)
+    num_workers = num_workers or multiprocessing.cpu_count()
+    chunks = [
+        frame_numbers[idx:(idx + chunk_size)]
+        for idx in range(0, len(frame_numbers), chunk_size)]
+    num_workers = max(1, min(num_workers, len(chunks)))
+    logger.info(
+        "Processing %d frames with %d worker process(es)",
+        len(frame_numbers), num_workers)
+
+    pool = multiprocessing.Pool(
+        num_workers, initializer=_init_worker,
+        initargs=(load_model, process_image, img_patt))
+    try:
+        for results, error in pool.imap(_process_frames, chunks):
+            if error is not None:
+                pid, chunk, tb = error
+                logger.error(
+                    "Worker process %d failed while processing frames "
+                    "%d-%d:\n%s", pid, chunk[0], chunk[-1], tb)
+                raise InferenceError(
+                    "Worker process %d failed while processing frames %d-%d"
+                    % (pid, chunk[0], chunk[-1]))
+
+            for frame_number, image_labels in results:
+                predictions.add(frame_number, image_labels)
+
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+    return predictions
+
+
+def _init_worker(load_model, process_image, img_patt):
+    # Forked workers inherit the SIGTERM handler of a checkpoint in the
+    # parent, which can only be saved by the parent
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    # Errors are recorded rather than raised here, since `multiprocessing`
+    # would otherwise restart the failed worker indefinitely
+    _WORKER.clear()
+    _WORKER["process_image"] = process_image
+    _WORKER["img_patt"] = img_patt
+    try:
+        _WORKER["model"] = load_model()
+    except Exception:
+        _WORKER["error"] = traceback.format_exc()
+
+
+def _process_frames(frame_numbers):
+    error = _WORKER.get("error")
+    if error is not None:
+        return None, (os.getpid(), frame_numbers, error)
+
+    model = _WORKER["model"]
+    process_image = _WORKER["process_image"]
+    img_patt = _WORKER["img_patt"]
+    results = []
+    try:
+        for frame_number in frame_numbers:
+            img = etai.read(img_patt % frame_number)
+            results.append((frame_number, process_image(model, img)))
+    except Exception:
+        return None, (os.getpid(), frame_numbers, traceback.format_exc())
+
+    return results, None
+
+
 def write_predictions(predictions):
     '''Writes the predictions to disk.
 
@@ -98,4 +915,4 @@ def write_predictions(predictions):
     logger.info(
         "Writing labels for %d frames to '%s'", len(predictions),
         IMAGE_TO_VIDEO_LABELS_PATH)
-    predictions.labels.write_json(IMAGE_TO_VIDEO_LABELS_PATH)
+    predictions.write_json(IMAGE_TO_VIDEO_LABELS_PATH)
@@ -0,0 +1,944 @@
+'''
+asyncio-based API client and task management for the Voxel51 Platform SDK.
+
+This module provides :class:`AsyncAPI`, an asynchronous counterpart of
+:class:`voxel51.platform.api.API`, and :class:`AsyncTaskManager`, an
+asynchronous counterpart of :class:`voxel51.platform.task.TaskManager`, so that
+analytics built on ``asyncio`` can communicate with the platform and transfer
+files concurrently on a single event loop.
+
+All requests, including signed URL transfers, share the connection pool of a
+single ``aiohttp.ClientSession``, and files are streamed to and from disk
+rather than being read into memory.
+
+This module requires Python 3.6 or later and the ``aiohttp`` package.
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+from future.utils import iteritems
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+import asyncio
+import logging
+import os
+import re
+import sys
+import time
+import urllib.parse as urlparse
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from requests.exceptions import HTTPError
+
+import eta.core.utils as etau
+
+import voxel51.platform.api as voxa
+import voxel51.platform.auth as voxauth
+import voxel51.platform.config as voxc
+import voxel51.platform.task as voxt
+import voxel51.platform.utils as voxu
+
+
+logger = logging.getLogger(__name__)
+
+
+_STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+def make_session(limit=100, limit_per_host=10):
+    '''Creates an ``aiohttp.ClientSession`` whose connection pool can be
+    shared by an :class:`AsyncAPI` and the transfer functions in this module.
+
+    This function must be called from a running event loop.
+
+    Args:
+        limit (int, optional): the maximum number of connections in the pool.
+            The default is 100
+        limit_per_host (int, optional): the maximum number of connections to
+            each host. The default is 10
+
+    Returns:
+        an ``aiohttp.ClientSession``
+
+    Raises:
+        ImportError: if ``aiohttp`` is not installed
+    '''
+    if aiohttp is None:
+        raise ImportError(
+            "The 'aiohttp' package is required to use "
+            "voxel51.platform.aio; install it via `pip install aiohttp`")
+
+    connector = aiohttp.TCPConnector(
+        limit=limit, limit_per_host=limit_per_host)
+    return aiohttp.ClientSession(connector=connector)
+
+
+def make_async_api_client(session=None):
+    '''Creates an :class:`AsyncAPI` instance for communicating with the
+    Voxel51 Platform API.
+
+    Args:
+        session (aiohttp.ClientSession, optional): a session to send requests
+            through. By default, the client creates its own session
+
+    Returns:
+        an :class:`AsyncAPI` instance
+    '''
+    private_key = os.environ[voxc.API_TOKEN_ENV_VAR]
+    token = voxauth.Token(private_key)
+    return AsyncAPI(token, session=session)
+
+
+class AsyncAPI(object):
+    '''Class for managing an asynchronous session with the Voxel51 Platform
+    API.
+
+    The methods of this class mirror those of
+    :class:`voxel51.platform.api.API`, including its retry policy, circuit
+    breaker, signed URL cache, and request statistics.
+
+    Attributes:
+        token (voxel51.platform.auth.Token): the Token for the session
+        base_url (str): the base URL of the API for the session
+        url_cache (AsyncSignedURLCache): the cache of signed URLs retrieved by
+            the session, or None if signed URLs are not cached
+        retry_policy (voxel51.platform.api.RetryPolicy): the policy used to
+            retry failed requests
+        circuit_breaker (voxel51.platform.api.CircuitBreaker): the circuit
+            breaker used to stop sending requests to failing endpoints
+    '''
+
+    def __init__(
+            self, token, session=None, cache_urls=True, retry_policy=None,
+            circuit_breaker=None):
+        '''Creates an AsyncAPI instance.
+
+        Args:
+            token (voxel51.platform.auth.Token): the Token to use for the
+                session
+            session (aiohttp.ClientSession, optional): a session to send
+                requests through, e.g., one created by :func:`make_session`.
+                The session is not closed by :func:`AsyncAPI.close`. By
+                default, a session is created on first use
+            cache_urls (bool, optional): whether to cache the signed URLs
+                retrieved by the session until shortly before they expire. By
+                default, this is True
+            retry_policy (voxel51.platform.api.RetryPolicy, optional): the
+                policy to use to retry failed requests. By default,
+                ``RetryPolicy()`` is used
+            circuit_breaker (voxel51.platform.api.CircuitBreaker, optional):
+                the circuit breaker to use to stop sending requests to failing
+                endpoints. By default, ``CircuitBreaker()`` is used
+        '''
+        self.token = token
+        self.base_url = os.environ[voxc.API_BASE_URL_ENV_VAR]
+        self.url_cache = AsyncSignedURLCache() if cache_urls else None
+        self.retry_policy = retry_policy or voxa.RetryPolicy()
+        self.circuit_breaker = circuit_breaker or voxa.CircuitBreaker()
+
+        self._header = self.token.get_header()
+        self._request_stats = voxa.RequestStats()
+        self._session = session
+        self._owns_session = session is None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    @property
+    def session(self):
+        '''The ``aiohttp.ClientSession`` used by the client.'''
+        if self._session is None:
+            self._session = make_session()
+
+        return self._session
+
+    async def close(self):
+        '''Closes the session of the client, if the client created it.'''
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def get_url_cache_stats(self):
+        '''Returns statistics about the signed URL cache of the session.
+
+        Returns:
+            a dictionary of statistics as returned by
+            :func:`voxel51.platform.api.SignedURLCache.get_stats`, or None if
+            signed URLs are not cached
+        '''
+        if self.url_cache is None:
+            return None
+
+        return self.url_cache.get_stats()
+
+    def get_request_stats(self):
+        '''Returns statistics about the requests sent by the session.
+
+        Returns:
+            a dictionary of statistics as returned by
+            :func:`voxel51.platform.api.API.get_request_stats`
+        '''
+        return self._request_stats.get(self.circuit_breaker)
+
+    async def get_job_data_urls(self, task_config):
+        '''Retrieves signed URLs to download job input data.
+
+        Args:
+            task_config (voxel51.platform.task.TaskConfig): the task config
+
+        Returns:
+            a dictionary mapping input names to RemotePathConfig objects
+        '''
+        async def _fetch():
+            endpoint = (
+                self.base_url + "/jobs/" + task_config.job_id + "/url/data")
+            try:
+                res = await self._request("get_job_data_urls", "GET", endpoint)
+                voxa.validate_response(res)
+                inputs = {
+                    k: voxu.RemotePathConfig(v)
+                    for k, v in iteritems(voxa.parse_json_response(res))
+                }
+            except (voxa.APIError, HTTPError, aiohttp.ClientError,
+                    asyncio.TimeoutError) as e:
+                logger.warning(
+                    "Failed to retrieve new input signed URLs; falling back "
+                    "to pre-populated URLs: %r", e)
+                return task_config.inputs, None
+
+            expirations = [pc.get_expiration() for pc in inputs.values()]
+            if None in expirations or not expirations:
+                return inputs, None
+
+            return inputs, min(expirations)
+
+        return await self._get_cached(task_config.job_id, "data", _fetch)
+
+    async def get_job_status_url(self, task_config):
+        '''Retrieves a signed URL to post the job status file
+
+        Args:
+            task_config (voxel51.platform.task.TaskConfig): the task config
+
+        Returns:
+            a RemotePathConfig object
+        '''
+        return await self._get_job_url(task_config, "status")
+
+    async def get_job_log_url(self, task_config):
+        '''Retrieves a signed URL to post the job log file
+
+        Args:
+            task_config (voxel51.platform.task.TaskConfig): the task config
+
+        Returns:
+            a RemotePathConfig object
+        '''
+        return await self._get_job_url(task_config, "log")
+
+    async def get_job_output_url(self, task_config):
+        '''Retrieves a signed URL to post the job output
+
+        Args:
+            task_config (voxel51.platform.task.TaskConfig): the task config
+
+        Returns:
+            a RemotePathConfig object
+        '''
+        return await self._get_job_url(task_config, "output")
+
+    async def post_job_metadata(self, job_id, metadata):
+        '''Posts metadata for the job with the given ID.
+
+        Args:
+            job_id (str): the job ID
+            metadata (dict): the dictionary of metadata to post
+
+        Raises:
+            :class:`voxel51.platform.api.APIError` if the request was
+            unsuccessful
+        '''
+        endpoint = self.base_url + "/jobs/" + job_id + "/metadata"
+        res = await self._request(
+            "post_job_metadata", "POST", endpoint, json=metadata)
+        voxa.validate_response(res)
+
+    async def update_job_state(self, job_id, state, failure_type=None):
+        '''Updates the state of the job with the given ID.
+
+        Transitions to the terminal ``COMPLETE`` and ``FAILED`` states bypass
+        the circuit breaker, so they are attempted even if earlier state
+        updates have opened its circuit.
+
+        Args:
+            job_id (str): the job ID
+            state (str): the new job state
+            failure_type (str, optional): the job failure type, if any
+
+        Raises:
+            :class:`voxel51.platform.api.APIError` if the request was
+            unsuccessful
+        '''
+        endpoint = self.base_url + "/jobs/" + job_id + "/state"
+
+        data = {"state": state}
+        if failure_type is not None:
+            data["failure_type"] = failure_type
+
+        res = await self._request(
+            "update_job_state", "PUT", endpoint,
+            use_breaker=state not in voxa.TERMINAL_JOB_STATES, json=data)
+        voxa.validate_response(res)
+
+    async def upload_job_output_as_data(self, job_id, path):
+        '''Uploads the job output as data to the user's account.
+
+        The file is streamed from disk. Since this request is not idempotent,
+        it is never retried.
+
+        Args:
+            job_id (str): the job ID
+            path (str): the path to the data to upload
+
+        Returns:
+            the ID of the uploaded data
+
+        Raises:
+            :class:`voxel51.platform.api.APIError` if the request was
+            unsuccessful
+        '''
+        endpoint = self.base_url + "/jobs/" + job_id + "/data"
+        f = await _run_in_executor(open, path, "rb")
+        try:
+            data = aiohttp.FormData()
+            data.add_field(
+                "file", f, filename=os.path.basename(path),
+                content_type=voxa.get_mime_type(path))
+            res = await self._request(
+                "upload_job_output_as_data", "POST", endpoint,
+                idempotent=False, data=data)
+        finally:
+            await _run_in_executor(f.close)
+
+        voxa.validate_response(res)
+        return voxa.parse_json_response(res)["data"]["data_id"]
+
+    async def _get_job_url(self, task_config, url_type):
+        async def _fetch():
+            endpoint = (self.base_url + "/jobs/" + task_config.job_id +
+                        "/url/" + url_type)
+            try:
+                res = await self._request(
+                    "get_job_%s_url" % url_type, "GET", endpoint)
+                voxa.validate_response(res)
+                path_config = voxu.RemotePathConfig(
+                    voxa.parse_json_response(res))
+            except (voxa.APIError, HTTPError, aiohttp.ClientError,
+                    asyncio.TimeoutError) as e:
+                logger.warning(
+                    "Failed to retrieve new %s signed URL; falling back to "
+                    "pre-populated URL: %r", url_type, e)
+                return getattr(task_config, url_type), None
+
+            return path_config, path_config.get_expiration()
+
+        return await self._get_cached(task_config.job_id, url_type, _fetch)
+
+    async def _get_cached(self, job_id, url_type, fetch):
+        if self.url_cache is None:
+            return (await fetch())[0]
+
+        return await self.url_cache.get((job_id, url_type), fetch)
+
+    async def _request(
+            self, name, method, url, idempotent=True, use_breaker=True,
+            **kwargs):
+        # See `voxel51.platform.api.API._request` for details
+        headers = dict(self._header)
+        headers.update(kwargs.pop("headers", {}))
+        policy = self.retry_policy
+        breaker = self.circuit_breaker
+
+        start_time = time.time()
+        deadline = start_time + policy.deadline if policy.deadline else None
+        attempt = 0
+        res = None
+        try:
+            while True:
+                if use_breaker:
+                    breaker.before_call(name)
+
+                attempt += 1
+                res = error = None
+                try:
+                    res = await self._send(
+                        method, url, policy.get_timeout(deadline),
+                        headers=headers, **kwargs)
+                except (aiohttp.ClientConnectionError,
+                        asyncio.TimeoutError) as e:
+                    error = e
+                except BaseException:
+                    # Never leave a half-open trial request in flight
+                    breaker.record_failure(name)
+                    raise
+
+                if error is None and not policy.is_retryable(res):
+                    breaker.record_success(name)
+                    return res
+
+                breaker.record_failure(name)
+                delay = policy.get_delay(attempt, res)
+                if (not idempotent or attempt >= policy.max_attempts or
+                        (use_breaker and breaker.get_state(name) ==
+                         voxa.CircuitBreaker.OPEN) or
+                        (deadline is not None and
+                         time.time() + delay >= deadline)):
+                    if error is not None:
+                        raise error
+
+                    return res
+
+                logger.warning(
+                    "%s attempt %d/%d failed (%s); retrying in %.1fs", name,
+                    attempt, policy.max_attempts,
+                    error or res.status_code, delay)
+                await asyncio.sleep(delay)
+        finally:
+            latency = time.time() - start_time
+            failed = res is None or policy.is_retryable(res)
+            self._request_stats.record(name, attempt, latency, failed)
+
+    async def _send(self, method, url, timeout, **kwargs):
+        async with self.session.request(
+                method, url, timeout=_make_timeout(timeout),
+                **kwargs) as res:
+            content = await res.read()
+            return _Response(res.status, res.headers, content)
+
+
+class AsyncSignedURLCache(voxa.SignedURLCache):
+    '''An asynchronous cache of signed URLs that are refreshed ahead of their
+    expiration.
+
+    This class has the same semantics as
+    :class:`voxel51.platform.api.SignedURLCache`, except that values are
+    fetched by coroutines, and concurrent requests for the same key await a
+    single in-flight fetch. Instances must only be used from a single event
+    loop.
+    '''
+
+    async def get(self, key, fetch):
+        '''Gets the value for the given key, fetching it if necessary.
+
+        Args:
+            key: a hashable key
+            fetch: a coroutine function that accepts no arguments and returns
+                a ``(value, expiration)`` tuple, where ``expiration`` is the
+                expiration time of the value, in seconds since the epoch, or
+                None if the value should not be cached
+
+        Returns:
+            the value
+        '''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() < entry[1]:
+                self._num_hits += 1
+                return entry[0]
+
+            future = self._in_flight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = asyncio.get_event_loop().create_future()
+                self._in_flight[key] = future
+                if entry is None:
+                    self._num_misses += 1
+                else:
+                    self._num_refreshes += 1
+            else:
+                self._num_shared += 1
+
+        if not is_leader:
+            return await asyncio.shield(future)
+
+        try:
+            value, expiration = await fetch()
+        except Exception as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            future.exception()  # mark as retrieved if no one is waiting
+            raise
+
+        with self._lock:
+            del self._in_flight[key]
+            if expiration is not None:
+                self._entries[key] = (
+                    value, self._get_refresh_time(expiration))
+            else:
+                self._entries.pop(key, None)
+                self._num_uncacheable += 1
+
+        future.set_result(value)
+        return value
+
+
+class AsyncTaskManager(object):
+    '''Class for managing the execution of a task on an ``asyncio`` event
+    loop.
+
+    The methods of this class are coroutine counterparts of the lifecycle
+    methods of :class:`voxel51.platform.task.TaskManager`. The
+    :class:`voxel51.platform.task.TaskStatus` of the task is published via
+    :func:`AsyncTaskManager.publish_status` rather than via a publish
+    callback.
+
+    Attributes:
+        task_config (voxel51.platform.task.TaskConfig): the TaskConfig for the
+            task
+        task_status (voxel51.platform.task.TaskStatus): the TaskStatus for the
+            task
+        api (AsyncAPI): the API client used by the manager, which shares its
+            connection pool with all transfers
+    '''
+
+    def __init__(self, task_config, task_status=None, api=None):
+        '''Creates an AsyncTaskManager instance.
+
+        Args:
+            task_config (voxel51.platform.task.TaskConfig): a TaskConfig
+                instance
+            task_status (voxel51.platform.task.TaskStatus, optional): an
+                optional TaskStatus instance to use. If not provided, a new
+                TaskStatus is created
+            api (AsyncAPI, optional): an optional API client to use. If not
+                provided, one is created via :func:`make_async_api_client`
+        '''
+        self.task_config = task_config
+        if task_status is None:
+            task_status = voxt.TaskStatus(
+                analytic=task_config.analytic, version=task_config.version)
+
+        self.task_status = task_status
+        self.api = api or make_async_api_client()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    @classmethod
+    async def from_url(cls, task_config_url):
+        '''Creates an AsyncTaskManager for the TaskConfig downloadable from
+        the given URL.
+
+        Args:
+            task_config_url (str): a URL from which to download a
+                :class:`voxel51.platform.task.TaskConfig`
+
+        Returns:
+            an AsyncTaskManager instance
+        '''
+        api = make_async_api_client()
+        path_config = voxu.RemotePathConfig.from_signed_url(task_config_url)
+        task_config_str = await download_bytes(api.session, path_config)
+        task_config = voxt.TaskConfig.from_str(task_config_str)
+        logger.info("TaskConfig downloaded from %s", task_config_url)
+        return cls(task_config, api=api)
+
+    async def close(self):
+        '''Closes the API client of the manager.'''
+        await self.api.close()
+
+    def add_status_message(self, msg):
+        '''Adds the given status message to the TaskStatus for the task. The
+        status is not yet published to the platform.
+
+        Args:
+            msg (str): a status message
+        '''
+        self.task_status.add_message(msg)
+
+    async def publish_status(self):
+        '''Publishes the current status of the task to the platform.'''
+        task_status = self.task_status
+        state = task_status.state
+        if state == voxt.TaskState.FAILED:
+            failure_type = task_status.failure_type
+        else:
+            failure_type = None
+
+        status_str = task_status.to_str()
+        await self.api.update_job_state(
+            self.task_config.job_id, state, failure_type=failure_type)
+        if state == voxt.TaskState.FAILED:
+            logger.info(
+                "Job state %s (%s) posted to API", state, failure_type)
+        else:
+            logger.info("Job state %s posted to API", state)
+
+        status_url = await self.api.get_job_status_url(self.task_config)
+        await upload_bytes(self.api.session, status_str, status_url)
+        logger.info("Task status written to cloud storage")
+
+    async def start(self):
+        '''Marks the task as started and publishes the TaskStatus to the
+        platform.
+
+        If the task is already started, no action is taken.
+        '''
+        if self.task_status.state == voxt.TaskState.RUNNING:
+            return
+
+        logger.info("Task started")
+        self.task_status.start()
+        await self.publish_status()
+
+    async def download_inputs(self, inputs_dir, max_concurrency=None):
+        '''Downloads the task inputs concurrently.
+
+        Args:
+            inputs_dir (str): the directory to which to download the inputs
+            max_concurrency (int, optional): the maximum number of inputs to
+                download concurrently. By default, all inputs are downloaded
+                concurrently
+
+        Returns:
+            a dictionary mapping input names to filepaths
+        '''
+        inputs = await self.api.get_job_data_urls(self.task_config)
+        input_paths = {}
+        async for name, local_path in download_many(
+                self.api.session, inputs, inputs_dir,
+                max_concurrency=max_concurrency):
+            input_paths[name] = local_path
+            logger.info("Input '%s' downloaded", name)
+            self.task_status.add_message("Input '%s' downloaded" % name)
+
+        return input_paths
+
+    async def parse_parameters(
+            self, data_params_dir=None, max_concurrency=None):
+        '''Parses the task parameters, downloading any data parameters
+        concurrently.
+
+        Args:
+            data_params_dir (str, optional): the directory to which to download
+                data (non-builtin) parameters, if any. By default, this is None
+            max_concurrency (int, optional): the maximum number of data
+                parameters to download concurrently. By default, all data
+                parameters are downloaded concurrently
+
+        Returns:
+            a dictionary mapping parameter names to values (builtin parameters)
+            or paths (data parameters)
+        '''
+        parameters = {}
+        data_params = {}
+        for name, val in iteritems(self.task_config.parameters):
+            if voxu.RemotePathConfig.is_path_config_dict(val):
+                if data_params_dir is None:
+                    logger.info("Skipping data parameter '%s'", name)
+                    self.task_status.add_message(
+                        "Skipping data parameter '%s'" % name)
+                    continue
+
+                data_params[name] = voxu.RemotePathConfig(val)
+            else:
+                logger.info("Found value '%s' for parameter '%s'", val, name)
+                parameters[name] = val
+
+        async for name, local_path in download_many(
+                self.api.session, data_params, data_params_dir,
+                max_concurrency=max_concurrency):
+            parameters[name] = local_path
+            logger.info("Parameter '%s' downloaded", name)
+            self.task_status.add_message("Parameter '%s' downloaded" % name)
+
+        return parameters
+
+    async def upload_output(self, output_path):
+        '''Uploads the task output.
+
+        Args:
+            output_path (str): the local path to the output file to upload
+        '''
+        output_url = await self.api.get_job_output_url(self.task_config)
+        await upload(self.api.session, output_path, output_url)
+        logger.info("Output uploaded to %s", output_url)
+        self.task_status.add_message("Output published")
+
+    async def upload_output_as_data(self, name, output_path):
+        '''Uploads the given task output as data on behalf of the user.
+
+        Args:
+            name (str): the name of the output
+            output_path (str): the local path to the output file to upload
+        '''
+        data_id = await self.api.upload_job_output_as_data(
+            self.task_config.job_id, output_path)
+        self.task_status.record_posted_data(name, data_id)
+        logger.info("Output '%s' published as data", name)
+        self.task_status.add_message("Output '%s' published as data" % name)
+
+    async def upload_logfile(self, logfile_path):
+        '''Uploads the given logfile for the task.
+
+        Args:
+            logfile_path (str): the path to a logfile to upload
+        '''
+        logfile_url = await self.api.get_job_log_url(self.task_config)
+        logger.info("Uploading logfile to %s", str(logfile_url))
+        await upload(self.api.session, logfile_path, logfile_url)
+
+    async def complete(self, logfile_path=None):
+        '''Marks the task as complete and publishes the TaskStatus to the
+        platform.
+
+        Args:
+            logfile_path (str, optional): an optional path to a logfile to
+                upload for the task
+        '''
+        logger.info("Task complete")
+        self.task_status.complete()
+        await self.publish_status()
+        if logfile_path:
+            await self.upload_logfile(logfile_path)
+
+    async def fail_gracefully(self, failure_type=None, logfile_path=None):
+        '''Marks the task as failed and gracefully winds up by posting any
+        available information (status, logfile, etc.) to the platform.
+
+        Args:
+            failure_type (voxel51.platform.task.TaskFailureType, optional): an
+                optional failure reason for the task
+            logfile_path (str, optional): an optional local path to a logfile
+                for the task
+        '''
+        # Log the error
+        if failure_type is not None:
+            logger.info("Failure type: %s", failure_type)
+        else:
+            logger.info("Failure type not specified")
+        logger.error("Uncaught exception", exc_info=sys.exc_info())
+
+        # Mark the task as failed
+        self.task_status.fail(failure_type=failure_type)
+
+        try:
+            # Try to publish the task status
+            await self.publish_status()
+        except Exception:
+            logger.error(
+                "Failed to publish task status", exc_info=sys.exc_info())
+
+        try:
+            # Try to upload the logfile, if requested
+            if logfile_path:
+                await self.upload_logfile(logfile_path)
+        except Exception:
+            logger.error("Failed to upload logfile", exc_info=sys.exc_info())
+
+
+async def get_download_path(session, path_config, output_dir):
+    '''Gets the local path for the given download.
+
+    Args:
+        session (aiohttp.ClientSession): the session to use
+        path_config (voxel51.platform.utils.RemotePathConfig): a
+            RemotePathConfig describing the file to download
+        output_dir (str): the directory to download the file to
+
+    Returns:
+        the local path for the download
+    '''
+    filename = await _get_filename(session, path_config.signed_url)
+    return os.path.join(output_dir, filename)
+
+
+async def download(session, path_config, output_dir):
+    '''Downloads the specified file to the given directory, streaming it to
+    disk.
+
+    Args:
+        session (aiohttp.ClientSession): the session to use
+        path_config (voxel51.platform.utils.RemotePathConfig): a
+            RemotePathConfig describing the file to download
+        output_dir (str): the directory to download the file to
+
+    Returns:
+        the local path to the downloaded file
+    '''
+    local_path = await get_download_path(session, path_config, output_dir)
+    await _run_in_executor(etau.ensure_basedir, local_path)
+    async with session.get(path_config.signed_url) as res:
+        res.raise_for_status()
+        f = await _run_in_executor(open, local_path, "wb")
+        try:
+            async for chunk in res.content.iter_chunked(_STREAM_CHUNK_SIZE):
+                await _run_in_executor(f.write, chunk)
+        finally:
+            await _run_in_executor(f.close)
+
+    return local_path
+
+
+async def download_many(
+        session, path_configs, output_dir, max_concurrency=None):
+    '''Downloads the specified files to the given directory concurrently.
+
+    Args:
+        session (aiohttp.ClientSession): the session to use
+        path_configs (dict): a dictionary mapping names to
+            :class:`voxel51.platform.utils.RemotePathConfig` instances
+            describing the files to download
+        output_dir (str): the directory to download the files to
+        max_concurrency (int, optional): the maximum number of files to
+            download concurrently. By default, all files are downloaded
+            concurrently
+
+    Returns:
+        an asynchronous iterator that emits ``(name, local_path)`` tuples as
+        each download completes
+    '''
+    semaphore = asyncio.Semaphore(max_concurrency or max(len(path_configs), 1))
+
+    async def _download(name, path_config):
+        async with semaphore:
+            return name, await download(session, path_config, output_dir)
+
+    tasks = [
+        asyncio.ensure_future(_download(name, path_config))
+        for name, path_config in iteritems(path_configs)]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def download_bytes(session, path_config):
+    '''Downloads the specified file as bytes.
+
+    Args:
+        session (aiohttp.ClientSession): the session to use
+        path_config (voxel51.platform.utils.RemotePathConfig): a
+            RemotePathConfig describing the file to download
+
+    Returns:
+        the downloaded bytes
+    '''
+    async with session.get(path_config.signed_url) as res:
+        res.raise_for_status()
+        return await res.read()
+
+
+async def upload(session, local_path, path_config):
+    '''Uploads the given file to the specified location, streaming it from
+    disk.
+
+    Args:
+        session (aiohttp.ClientSession): the session to use
+        local_path (str): the path to the file to upload
+        path_config (voxel51.platform.utils.RemotePathConfig): a
+            RemotePathConfig describing where to upload the file
+    '''
+    # aiohttp reads file bodies in its executor, so only the open and close
+    # need to be kept off of the event loop
+    f = await _run_in_executor(open, local_path, "rb")
+    try:
+        await _put(session, path_config.signed_url, f)
+    finally:
+        await _run_in_executor(f.close)
+
+
+async def upload_bytes(session, bytes_str, path_config):
+    '''Uploads the given bytes to the specified location.
+
+    Args:
+        session (aiohttp.ClientSession): the session to use
+        bytes_str (str): the bytes to upload
+        path_config (voxel51.platform.utils.RemotePathConfig): a
+            RemotePathConfig describing where to upload the bytes
+    '''
+    if not isinstance(bytes_str, bytes):
+        bytes_str = bytes_str.encode("utf-8")
+
+    await _put(session, path_config.signed_url, bytes_str)
+
+
+class _Response(object):
+    '''A fully-read response with the parts of the ``requests.Response``
+    interface that are used by :mod:`voxel51.platform.api`.
+    '''
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise HTTPError("%d Error" % self.status_code, response=self)
+
+
+async def _run_in_executor(fcn, *args):
+    # Runs blocking file I/O in the default executor so that it does not
+    # stall the other transfers on the event loop
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, fcn, *args)
+
+
+async def _put(session, url, data):
+    # Signed URLs reject `Content-Type` headers that were not signed
+    async with session.put(
+            url, data=data, skip_auto_headers=["Content-Type"]) as res:
+        res.raise_for_status()
+
+
+async def _get_filename(session, url):
+    # See `voxel51.platform.utils._get_filename`
+    filename = None
+    try:
+        async with session.head(url) as res:
+            cd = res.headers["Content-Disposition"]
+            filename = re.findall("filename=([^;]+)", cd)[0].strip("\"'")
+    except (KeyError, IndexError):
+        pass
+
+    if not filename:
+        filename = os.path.basename(urlparse.urlparse(url).path)
+
+    return filename
+
+
+def _make_timeout(timeout):
+    if isinstance(timeout, (list, tuple)):
+        connect, read = timeout
+        return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+
+    return aiohttp.ClientTimeout(total=timeout)
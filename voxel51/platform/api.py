@@ -18,12 +18,16 @@ from future.utils import iteritems
 # pragma pylint: enable=unused-wildcard-import
 # pragma pylint: enable=wildcard-import
 
+import email.utils
 import logging
 import os
+import random
+import threading
+import time
 
 import mimetypes
 import requests
-from requests.exceptions import HTTPError
+from requests.exceptions import RequestException
 
 import voxel51.platform.auth as voxa
 import voxel51.platform.config as voxc
@@ -32,16 +36,30 @@ import voxel51.platform.utils as voxu
 logger = logging.getLogger(__name__)
 
 
+_RETRYABLE_ERRORS = (
+    requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+#
+# The job states that end a job. Transitions to these states are never
+# short-circuited, since a job that fails to report them is never wound up
+#
+TERMINAL_JOB_STATES = {"COMPLETE", "FAILED"}
+
+
 def make_api_client():
     '''Creates an :class:`API` instance for communicating with the Voxel51
     Platform API.
 
+    The client sends its requests through the shared HTTP session returned
+    by :func:`voxel51.platform.utils.get_http_session`, so connections are
+    reused across API calls and signed URL transfers.
+
     Returns:
         an :class:`API` instance
     '''
     private_key = os.environ[voxc.API_TOKEN_ENV_VAR]
     token = voxa.Token(private_key)
-    return API(token)
+    return API(token, session=voxu.get_http_session())
 
 
 class API(object):
@@ -52,23 +70,52 @@ class API(object):
         keep_alive (bool): whether the request session should be kept alive
             between requests
         base_url (str): the base URL of the API for the session
+        url_cache (SignedURLCache): the cache of signed URLs retrieved by the
+            session, or None if signed URLs are not cached
+        retry_policy (RetryPolicy): the policy used to retry failed requests
+        circuit_breaker (CircuitBreaker): the circuit breaker used to stop
+            sending requests to failing endpoints
     '''
 
-    def __init__(self, token, keep_alive=False):
+    def __init__(
+            self, token, keep_alive=False, cache_urls=True, session=None,
+            retry_policy=None, circuit_breaker=None):
         '''Starts a new API session.
 
         Args:
             token (voxel51.platform.auth.Token): the Token to use for the
                 session
             keep_alive (bool, optional): whether to keep the request session
-                alive between requests. By default, this is False
+                alive between requests. By default, this is False. This is
+                ignored when a ``session`` is provided
+            cache_urls (bool, optional): whether to cache the signed URLs
+                retrieved by the session until shortly before they expire. By
+                default, this is True
+            session (requests.Session, optional): an existing session to send
+                requests through, e.g., the shared session returned by
+                :func:`voxel51.platform.utils.get_http_session`. The session
+                is not closed by :func:`API.close`
+            retry_policy (RetryPolicy, optional): the policy to use to retry
+                failed requests. By default, ``RetryPolicy()`` is used
+            circuit_breaker (CircuitBreaker, optional): the circuit breaker to
+                use to stop sending requests to failing endpoints. By default,
+                ``CircuitBreaker()`` is used
         '''
         self.token = token
-        self.keep_alive = keep_alive
+        self.keep_alive = keep_alive or session is not None
         self.base_url = os.environ[voxc.API_BASE_URL_ENV_VAR]
+        self.url_cache = SignedURLCache() if cache_urls else None
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
 
         self._header = self.token.get_header()
-        self._requests = requests.Session() if keep_alive else requests
+        self._request_stats = RequestStats()
+        if session is not None:
+            self._requests = session
+            self._owns_session = False
+        else:
+            self._requests = requests.Session() if keep_alive else requests
+            self._owns_session = keep_alive
 
     def __enter__(self):
         return self
@@ -80,9 +127,34 @@ class API(object):
         '''Closes the HTTP session. Only needs to be called when
         ``keep_alive=True`` is passed to the constructor.
         '''
-        if self.keep_alive:
+        if self._owns_session:
             self._requests.close()
 
+    def get_url_cache_stats(self):
+        '''Returns statistics about the signed URL cache of the session.
+
+        Returns:
+            a dictionary of statistics as returned by
+            :func:`SignedURLCache.get_stats`, or None if signed URLs are not
+            cached
+        '''
+        if self.url_cache is None:
+            return None
+
+        return self.url_cache.get_stats()
+
+    def get_request_stats(self):
+        '''Returns statistics about the requests sent by the session.
+
+        Returns:
+            a dictionary mapping the names of the API methods that were called
+            to dictionaries with the following keys: ``num_calls``,
+            ``num_attempts``, ``num_failures`` (calls that failed after all
+            attempts), ``mean_latency`` and ``max_latency`` (per call,
+            including retries, in seconds), and ``circuit_state``
+        '''
+        return self._request_stats.get(self.circuit_breaker)
+
     def get_job_data_urls(self, task_config):
         '''Retrieves signed URLs to download job input data.
 
@@ -92,19 +164,29 @@ class API(object):
         Returns:
             a dictionary mapping input names to RemotePathConfig objects
         '''
-        endpoint = self.base_url + "/jobs/" + task_config.job_id + "/url/data"
-        res = self._requests.get(endpoint, headers=self._header)
-        try:
-            _validate_response(res)
-            return {
-                k: voxu.RemotePathConfig(v)
-                for k, v in iteritems(_parse_json_response(res))
-            }
-        except (APIError, HTTPError) as e:
-            logger.warning(
-                "Failed to retrieve new input signed URLs; falling back to "
-                "pre-populated URLs: %r", e)
-            return task_config.inputs
+        def _fetch():
+            endpoint = (
+                self.base_url + "/jobs/" + task_config.job_id + "/url/data")
+            try:
+                res = self._request("get_job_data_urls", "GET", endpoint)
+                validate_response(res)
+                inputs = {
+                    k: voxu.RemotePathConfig(v)
+                    for k, v in iteritems(parse_json_response(res))
+                }
+            except (APIError, RequestException) as e:
+                logger.warning(
+                    "Failed to retrieve new input signed URLs; falling back "
+                    "to pre-populated URLs: %r", e)
+                return task_config.inputs, None
+
+            expirations = [pc.get_expiration() for pc in inputs.values()]
+            if None in expirations or not expirations:
+                return inputs, None
+
+            return inputs, min(expirations)
+
+        return self._get_cached(task_config.job_id, "data", _fetch)
 
     def get_job_status_url(self, task_config):
         '''Retrieves a signed URL to post the job status file
@@ -150,13 +232,17 @@ class API(object):
             :class:`APIError` if the request was unsuccessful
         '''
         endpoint = self.base_url + "/jobs/" + job_id + "/metadata"
-        res = self._requests.post(
-            endpoint, headers=self._header, json=metadata)
-        _validate_response(res)
+        res = self._request(
+            "post_job_metadata", "POST", endpoint, json=metadata)
+        validate_response(res)
 
     def update_job_state(self, job_id, state, failure_type=None):
         '''Updates the state of the job with the given ID.
 
+        Transitions to the terminal ``COMPLETE`` and ``FAILED`` states bypass
+        the circuit breaker, so they are attempted even if earlier state
+        updates have opened its circuit.
+
         Args:
             job_id (str): the job ID
             state (str): the new job state
@@ -171,12 +257,18 @@ class API(object):
         if failure_type is not None:
             data["failure_type"] = failure_type
 
-        res = self._requests.put(endpoint, headers=self._header, json=data)
-        _validate_response(res)
+        res = self._request(
+            "update_job_state", "PUT", endpoint,
+            use_breaker=state not in TERMINAL_JOB_STATES, json=data)
+        validate_response(res)
 
     def upload_job_output_as_data(self, job_id, path):
         '''Uploads the job output as data to the user's account.
 
+        The file is streamed from disk, so arbitrarily large outputs can be
+        uploaded without reading them into memory. Since this request is not
+        idempotent, it is never retried.
+
         Args:
             job_id (str): the job ID
             path (str): the path to the data to upload
@@ -188,14 +280,14 @@ class API(object):
             :class:`APIError` if the request was unsuccessful
         '''
         endpoint = self.base_url + "/jobs/" + job_id + "/data"
-        filename = os.path.basename(path)
-        mime_type = _get_mime_type(path)
-        with open(path, "rb") as df:
-            files = {"file": (filename, df, mime_type)}
-            res = self._requests.post(
-                endpoint, files=files, headers=self._header)
-        _validate_response(res)
-        return _parse_json_response(res)["data"]["data_id"]
+        mime_type = get_mime_type(path)
+        with voxu.MultipartFileStream(path, mime_type=mime_type) as data:
+            res = self._request(
+                "upload_job_output_as_data", "POST", endpoint,
+                idempotent=False, data=data,
+                headers={"Content-Type": data.content_type})
+        validate_response(res)
+        return parse_json_response(res)["data"]["data_id"]
 
     def _get_job_url(self, task_config, url_type):
         '''Retrieves a signed URL to post job information or output.
@@ -207,17 +299,531 @@ class API(object):
         Returns:
             a RemotePathConfig object
         '''
-        endpoint = (self.base_url + "/jobs/" + task_config.job_id +
-                    "/url/" + url_type)
-        res = self._requests.get(endpoint, headers=self._header)
+        def _fetch():
+            endpoint = (self.base_url + "/jobs/" + task_config.job_id +
+                        "/url/" + url_type)
+            try:
+                res = self._request(
+                    "get_job_%s_url" % url_type, "GET", endpoint)
+                validate_response(res)
+                path_config = voxu.RemotePathConfig(parse_json_response(res))
+            except (APIError, RequestException) as e:
+                logger.warning(
+                    "Failed to retrieve new %s signed URL; falling back to "
+                    "pre-populated URL: %r", url_type, e)
+                return getattr(task_config, url_type), None
+
+            return path_config, path_config.get_expiration()
+
+        return self._get_cached(task_config.job_id, url_type, _fetch)
+
+    def _get_cached(self, job_id, url_type, fetch):
+        if self.url_cache is None:
+            return fetch()[0]
+
+        return self.url_cache.get((job_id, url_type), fetch)
+
+    def _request(
+            self, name, method, url, idempotent=True, use_breaker=True,
+            **kwargs):
+        '''Sends a request, retrying it according to the retry policy of the
+        session if it fails with a retryable error.
+
+        Args:
+            name (str): the name of the API method sending the request, which
+                identifies its circuit and statistics
+            method (str): the HTTP method
+            url (str): the URL
+            idempotent (bool, optional): whether the request can safely be
+                retried. The default is True
+            use_breaker (bool, optional): whether the request may be
+                short-circuited by the circuit breaker. If False, the request
+                is sent and retried even if the circuit of the method is open,
+                although its outcome is still recorded. The default is True
+            **kwargs: keyword arguments for ``requests.Session.request``
+
+        Returns:
+            the response to the last attempt
+
+        Raises:
+            :class:`CircuitOpenError` if ``use_breaker`` is True and the
+            circuit of the method is open
+            ``requests.exceptions.ConnectionError`` or
+            ``requests.exceptions.Timeout`` if the last attempt failed with a
+            connection error or timed out
+        '''
+        headers = dict(self._header)
+        headers.update(kwargs.pop("headers", {}))
+        policy = self.retry_policy
+        breaker = self.circuit_breaker
+
+        start_time = time.time()
+        deadline = start_time + policy.deadline if policy.deadline else None
+        attempt = 0
+        res = None
+        try:
+            while True:
+                if use_breaker:
+                    breaker.before_call(name)
+
+                attempt += 1
+                res = error = None
+                try:
+                    res = self._requests.request(
+                        method, url, headers=headers,
+                        timeout=policy.get_timeout(deadline), **kwargs)
+                except _RETRYABLE_ERRORS as e:
+                    error = e
+                except BaseException:
+                    # Never leave a half-open trial request in flight
+                    breaker.record_failure(name)
+                    raise
+
+                if error is None and not policy.is_retryable(res):
+                    breaker.record_success(name)
+                    return res
+
+                breaker.record_failure(name)
+                delay = policy.get_delay(attempt, res)
+                if (not idempotent or attempt >= policy.max_attempts or
+                        (use_breaker and
+                         breaker.get_state(name) == CircuitBreaker.OPEN) or
+                        (deadline is not None and
+                         time.time() + delay >= deadline)):
+                    if error is not None:
+                        raise error
+
+                    return res
+
+                logger.warning(
+                    "%s attempt %d/%d failed (%s); retrying in %.1fs", name,
+                    attempt, policy.max_attempts,
+                    error or res.status_code, delay)
+                time.sleep(delay)
+        finally:
+            latency = time.time() - start_time
+            failed = res is None or policy.is_retryable(res)
+            self._request_stats.record(name, attempt, latency, failed)
+
+
+class RequestStats(object):
+    '''Thread-safe per-method statistics about the requests sent by an API
+    client.
+    '''
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, num_attempts, latency, failed):
+        '''Records a call to the given API method.
+
+        Args:
+            name (str): the name of the API method
+            num_attempts (int): the number of attempts made by the call
+            latency (float): the total latency of the call, in seconds
+            failed (bool): whether the call failed
+        '''
+        with self._lock:
+            stats = self._stats.setdefault(name, {
+                "num_calls": 0,
+                "num_attempts": 0,
+                "num_failures": 0,
+                "total_latency": 0.0,
+                "max_latency": 0.0,
+            })
+            stats["num_calls"] += 1
+            stats["num_attempts"] += num_attempts
+            stats["num_failures"] += int(failed)
+            stats["total_latency"] += latency
+            stats["max_latency"] = max(stats["max_latency"], latency)
+
+    def get(self, circuit_breaker):
+        '''Returns the statistics of each API method.
+
+        Args:
+            circuit_breaker (CircuitBreaker): the circuit breaker whose state
+                for each method is reported
+
+        Returns:
+            a dict mapping API method names to dicts of statistics
+        '''
+        with self._lock:
+            stats = {}
+            for name, s in iteritems(self._stats):
+                stats[name] = {
+                    "num_calls": s["num_calls"],
+                    "num_attempts": s["num_attempts"],
+                    "num_failures": s["num_failures"],
+                    "mean_latency": s["total_latency"] / s["num_calls"],
+                    "max_latency": s["max_latency"],
+                    "circuit_state": circuit_breaker.get_state(name),
+                }
+
+            return stats
+
+
+class RetryPolicy(object):
+    '''Policy for retrying failed :class:`API` requests.
+
+    Requests that fail with a connection error, a timeout, or a retryable
+    status code are retried with exponential backoff and full jitter, up to
+    ``max_attempts`` attempts in total. When a response includes a
+    ``Retry-After`` header, the next attempt is not made before the time that
+    it specifies. All attempts of a request must complete within the
+    ``deadline`` of the request.
+
+    Attributes:
+        max_attempts (int): the maximum number of attempts per request
+        backoff (float): the base backoff, in seconds
+        max_backoff (float): the maximum backoff, in seconds
+        retry_statuses (tuple): the HTTP status codes to retry
+        timeout (float or tuple): the ``(connect, read)`` timeout of each
+            attempt, in seconds, as accepted by ``requests``
+        deadline (float): the total time budget of each request, in seconds,
+            or None for no limit
+    '''
+
+    def __init__(
+            self, max_attempts=4, backoff=0.5, max_backoff=30.0,
+            retry_statuses=(429, 500, 502, 503, 504), timeout=(10.0, 60.0),
+            deadline=120.0):
+        '''Creates a RetryPolicy instance.
+
+        Args:
+            max_attempts (int, optional): the maximum number of attempts per
+                request. The default is 4. Use 1 to disable retries
+            backoff (float, optional): the base backoff, in seconds. The
+                default is 0.5
+            max_backoff (float, optional): the maximum backoff, in seconds.
+                The default is 30
+            retry_statuses (tuple, optional): the HTTP status codes to retry.
+                The default is ``(429, 500, 502, 503, 504)``
+            timeout (float or tuple, optional): the ``(connect, read)``
+                timeout of each attempt, in seconds. The default is
+                ``(10, 60)``
+            deadline (float, optional): the total time budget of each request,
+                in seconds, or None for no limit. The default is 120
+        '''
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_statuses = retry_statuses
+        self.timeout = timeout
+        self.deadline = deadline
+
+    def is_retryable(self, res):
+        '''Determines whether the given response should be retried.
+
+        Args:
+            res (requests.Response): a response
+
+        Returns:
+            True/False
+        '''
+        return res.status_code in self.retry_statuses
+
+    def get_delay(self, attempt, res=None):
+        '''Returns the delay before the next attempt of a request.
+
+        Args:
+            attempt (int): the number of attempts made so far
+            res (requests.Response, optional): the response to the last
+                attempt, if any
+
+        Returns:
+            the delay, in seconds
+        '''
+        delay = random.uniform(
+            0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+        if res is not None:
+            retry_after = _parse_retry_after(res.headers.get("Retry-After"))
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+
+        return delay
+
+    def get_timeout(self, deadline=None):
+        '''Returns the timeout for an attempt of a request.
+
+        Args:
+            deadline (float, optional): the deadline of the request, in
+                seconds since the epoch, if any
+
+        Returns:
+            a timeout as accepted by ``requests``
+        '''
+        if deadline is None:
+            return self.timeout
+
+        remaining = max(deadline - time.time(), 0.001)
+        if isinstance(self.timeout, (list, tuple)):
+            return tuple(min(t, remaining) for t in self.timeout)
+
+        if self.timeout is None:
+            return remaining
+
+        return min(self.timeout, remaining)
+
+
+class CircuitBreaker(object):
+    '''A thread-safe circuit breaker that stops sending requests to failing
+    :class:`API` endpoints.
+
+    Each endpoint has its own circuit. A circuit opens after
+    ``failure_threshold`` consecutive failures, after which requests fail
+    immediately with a :class:`CircuitOpenError`. After ``reset_timeout``
+    seconds, the circuit becomes half-open and a single trial request is
+    allowed through: if it succeeds, the circuit closes; otherwise, it opens
+    again.
+
+    Attributes:
+        failure_threshold (int): the number of consecutive failures after
+            which a circuit opens
+        reset_timeout (float): the number of seconds after which an open
+            circuit becomes half-open
+    '''
+
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        '''Creates a CircuitBreaker instance.
+
+        Args:
+            failure_threshold (int, optional): the number of consecutive
+                failures after which a circuit opens. The default is 5
+            reset_timeout (float, optional): the number of seconds after which
+                an open circuit becomes half-open. The default is 30
+        '''
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def get_state(self, key):
+        '''Returns the state of the circuit with the given key.
+
+        Args:
+            key (str): the circuit key
+
+        Returns:
+            one of ``CircuitBreaker.CLOSED``, ``CircuitBreaker.OPEN``, or
+            ``CircuitBreaker.HALF_OPEN``
+        '''
+        with self._lock:
+            return self._get_circuit(key).state
+
+    def before_call(self, key):
+        '''Checks whether a request may be sent on the circuit with the given
+        key.
+
+        Args:
+            key (str): the circuit key
+
+        Raises:
+            :class:`CircuitOpenError` if the circuit is open
+        '''
+        with self._lock:
+            circuit = self._get_circuit(key)
+            if circuit.state == self.CLOSED:
+                return
+
+            if (circuit.state == self.OPEN and
+                    time.time() >= circuit.opened_at + self.reset_timeout):
+                circuit.state = self.HALF_OPEN
+                circuit.trial_in_flight = False
+
+            if circuit.state == self.HALF_OPEN and not circuit.trial_in_flight:
+                circuit.trial_in_flight = True
+                return
+
+        raise CircuitOpenError(key)
+
+    def record_success(self, key):
+        '''Records a successful request on the circuit with the given key.
+
+        Args:
+            key (str): the circuit key
+        '''
+        with self._lock:
+            circuit = self._get_circuit(key)
+            circuit.state = self.CLOSED
+            circuit.num_failures = 0
+            circuit.trial_in_flight = False
+
+    def record_failure(self, key):
+        '''Records a failed request on the circuit with the given key.
+
+        Args:
+            key (str): the circuit key
+        '''
+        with self._lock:
+            circuit = self._get_circuit(key)
+            circuit.num_failures += 1
+            circuit.trial_in_flight = False
+            if (circuit.state == self.HALF_OPEN or
+                    circuit.num_failures >= self.failure_threshold):
+                if circuit.state != self.OPEN:
+                    logger.warning("Opening circuit for '%s'", key)
+
+                circuit.state = self.OPEN
+                circuit.opened_at = time.time()
+
+    def _get_circuit(self, key):
+        circuit = self._circuits.get(key)
+        if circuit is None:
+            circuit = _Circuit(self.CLOSED)
+            self._circuits[key] = circuit
+
+        return circuit
+
+
+class _Circuit(object):
+
+    def __init__(self, state):
+        self.state = state
+        self.num_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+
+class SignedURLCache(object):
+    '''A thread-safe cache of signed URLs that are refreshed ahead of their
+    expiration.
+
+    Values are cached until ``refresh_margin`` seconds before they expire, or
+    until halfway through their remaining lifetime, whichever is sooner.
+    Values whose expiration is unknown are never cached. Concurrent requests
+    for the same key share a single in-flight fetch.
+    '''
+
+    def __init__(self, refresh_margin=300):
+        '''Creates a SignedURLCache instance.
+
+        Args:
+            refresh_margin (float, optional): the number of seconds before
+                expiration at which to refresh values. The default is 300
+        '''
+        self.refresh_margin = refresh_margin
+
+        self._entries = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+        self._num_hits = 0
+        self._num_misses = 0
+        self._num_refreshes = 0
+        self._num_shared = 0
+        self._num_uncacheable = 0
+
+    def get(self, key, fetch):
+        '''Gets the value for the given key, fetching it if necessary.
+
+        Args:
+            key: a hashable key
+            fetch: a function that accepts no arguments and returns a
+                ``(value, expiration)`` tuple, where ``expiration`` is the
+                expiration time of the value, in seconds since the epoch, or
+                None if the value should not be cached
+
+        Returns:
+            the value
+        '''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() < entry[1]:
+                self._num_hits += 1
+                return entry[0]
+
+            call = self._in_flight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _InFlightFetch()
+                self._in_flight[key] = call
+                if entry is None:
+                    self._num_misses += 1
+                else:
+                    self._num_refreshes += 1
+            else:
+                self._num_shared += 1
+
+        if not is_leader:
+            return call.wait()
+
         try:
-            _validate_response(res)
-            return voxu.RemotePathConfig(_parse_json_response(res))
-        except (APIError, HTTPError) as e:
-            logger.warning(
-                "Failed to retrieve new %s signed URL; falling back to "
-                "pre-populated URL: %r", url_type, e)
-            return getattr(task_config, url_type)
+            value, expiration = fetch()
+        except Exception as e:
+            with self._lock:
+                del self._in_flight[key]
+            call.set_error(e)
+            raise
+
+        with self._lock:
+            del self._in_flight[key]
+            if expiration is not None:
+                self._entries[key] = (
+                    value, self._get_refresh_time(expiration))
+            else:
+                self._entries.pop(key, None)
+                self._num_uncacheable += 1
+
+        call.set_value(value)
+        return value
+
+    def clear(self):
+        '''Removes all values from the cache.'''
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        '''Returns statistics about the cache.
+
+        Returns:
+            a dictionary with the following keys: ``num_hits``,
+            ``num_misses``, ``num_refreshes``, ``num_shared`` (requests that
+            waited on another caller's in-flight fetch), ``num_uncacheable``
+            (fetches whose expiration was unknown), and ``size``
+        '''
+        with self._lock:
+            return {
+                "num_hits": self._num_hits,
+                "num_misses": self._num_misses,
+                "num_refreshes": self._num_refreshes,
+                "num_shared": self._num_shared,
+                "num_uncacheable": self._num_uncacheable,
+                "size": len(self._entries),
+            }
+
+    def _get_refresh_time(self, expiration):
+        now = time.time()
+        lifetime = max(0, expiration - now)
+        return now + max(0, min(lifetime - self.refresh_margin, lifetime / 2))
+
+
+class _InFlightFetch(object):
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._value = None
+        self._error = None
+
+    def set_value(self, value):
+        self._value = value
+        self._event.set()
+
+    def set_error(self, error):
+        self._error = error
+        self._event.set()
+
+    def wait(self):
+        self._event.wait()
+        if self._error is not None:
+            raise self._error
+
+        return self._value
 
 
 class APIError(Exception):
@@ -249,20 +855,75 @@ class APIError(Exception):
         if res.ok:
             raise ValueError("Response is not an error")
         try:
-            message = _parse_json_response(res)["error"]["message"]
+            message = parse_json_response(res)["error"]["message"]
         except ValueError:
             res.raise_for_status()
         return cls(message, res.status_code)
 
 
-def _get_mime_type(path):
+class CircuitOpenError(APIError):
+    '''Exception raised when an :class:`API` request is not sent because
+    the circuit of its endpoint is open.
+    '''
+
+    def __init__(self, key):
+        '''Creates a new CircuitOpenError object.
+
+        Args:
+            key (str): the key of the open circuit
+        '''
+        super(CircuitOpenError, self).__init__(
+            "Circuit for '%s' is open; not sending request" % key, 503)
+
+
+def get_mime_type(path):
+    '''Guesses the MIME type of the given file from its extension.
+
+    Args:
+        path (str): the path to the file
+
+    Returns:
+        the MIME type, or "application/octet-stream" if it cannot be guessed
+    '''
     return mimetypes.guess_type(path)[0] or "application/octet-stream"
 
 
-def _validate_response(res):
+def validate_response(res):
+    '''Validates that the given API response was successful.
+
+    Args:
+        res (requests.Response): a requests response
+
+    Raises:
+        :class:`APIError` if the request was unsuccessful
+    '''
     if not res.ok:
         raise APIError.from_response(res)
 
 
-def _parse_json_response(res):
+def parse_json_response(res):
+    '''Parses the JSON content of the given API response.
+
+    Args:
+        res (requests.Response): a requests response
+
+    Returns:
+        the parsed JSON
+    '''
     return voxu.load_json(res.content)
+
+
+def _parse_retry_after(value):
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    parsed = email.utils.parsedate_tz(value)
+    if parsed is None:
+        return None
+
+    return max(0.0, email.utils.mktime_tz(parsed) - time.time())
@@ -0,0 +1,456 @@
+'''
+Frame-level checkpointing for the Voxel51 Platform SDK.
+
+A :class:`FrameCheckpoint` persists the per-frame results of an analytic to
+local disk as they are produced, so that an analytic that is interrupted,
+e.g., because its node was preempted, can resume from where it left off
+rather than reprocessing every frame.
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+from collections import deque, OrderedDict
+import io
+import json
+import logging
+import os
+import signal
+import threading
+import time
+
+import eta.core.utils as etau
+
+
+logger = logging.getLogger(__name__)
+
+
+#
+# The default interval, in seconds, between checkpoints
+#
+DEFAULT_CHECKPOINT_INTERVAL = 60
+
+#
+# The interval, in seconds, at which the background writer checks for new
+# results and save requests
+#
+_POLL_INTERVAL = 0.1
+
+
+class FrameCheckpoint(object):
+    '''Periodically persists per-frame results and the set of processed
+    frames to a local directory.
+
+    Results are added via :func:`FrameCheckpoint.add` and are serialized and
+    appended to a log file by a background thread, so the cost of writing
+    checkpoints is kept off of the processing loop. Results may be passed as
+    zero-argument functions that return them, in which case even their
+    serialization is deferred to the background thread. A checkpoint is
+    committed every ``every_frames`` frames and/or every ``every_seconds``
+    seconds, when :func:`FrameCheckpoint.save` is called, and, if
+    ``handle_sigterm`` is True, when the process receives ``SIGTERM``. Results
+    added after the last commit are discarded when the checkpoint is
+    reopened.
+
+    When a FrameCheckpoint is created for a directory that already contains a
+    checkpoint with the same ``checkpoint_id``, the committed results are
+    restored: they are available via :func:`FrameCheckpoint.restored_frames`,
+    and :func:`FrameCheckpoint.get_remaining` can be used to skip the frames
+    that were already processed.
+
+    Attributes:
+        checkpoint_dir (str): the checkpoint directory
+        checkpoint_id (str): an identifier of the work being checkpointed, or
+            None
+        every_frames (int): the number of frames between checkpoints, or None
+        every_seconds (float): the number of seconds between checkpoints, or
+            None
+    '''
+
+    def __init__(
+            self, checkpoint_dir, checkpoint_id=None, every_frames=None,
+            every_seconds=DEFAULT_CHECKPOINT_INTERVAL, handle_sigterm=True,
+            sigterm_timeout=10):
+        '''Creates a FrameCheckpoint instance.
+
+        Args:
+            checkpoint_dir (str): the directory in which to store the
+                checkpoint, which is created if necessary
+            checkpoint_id (str, optional): an identifier of the work being
+                checkpointed, e.g., a job ID. An existing checkpoint is only
+                restored if its identifier matches
+            every_frames (int, optional): commit a checkpoint whenever this
+                many frames have been added since the last checkpoint
+            every_seconds (float, optional): commit a checkpoint at most this
+                many seconds after a frame is added. The default is
+                ``DEFAULT_CHECKPOINT_INTERVAL``. Pass None to only checkpoint
+                every ``every_frames`` frames
+            handle_sigterm (bool, optional): whether to commit a checkpoint
+                when the process receives ``SIGTERM``, after which the
+                previous handler is invoked. This is only possible when the
+                instance is created in the main thread. By default, this is
+                True
+            sigterm_timeout (float, optional): the maximum number of seconds
+                to wait for the checkpoint to be committed on ``SIGTERM``. The
+                default is 10
+        '''
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_id = checkpoint_id
+        self.every_frames = every_frames
+        self.every_seconds = every_seconds
+        self.sigterm_timeout = sigterm_timeout
+
+        self._log_path = os.path.join(checkpoint_dir, "frames.jsonl")
+        self._state_path = os.path.join(checkpoint_dir, "checkpoint.json")
+
+        # The processing loop and the writer only communicate through these
+        # lock-free structures, so that a checkpoint can be saved from a
+        # signal handler without risking a deadlock
+        self._pending = deque()
+        self._num_saves_requested = 0
+        self._num_saves = 0
+        self._closing = False
+        self._error = None
+
+        self._processed = set()
+        self._restored = OrderedDict()
+        self._num_committed = 0
+        self._log_size = 0
+        self._load()
+
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+        self._prev_sigterm_handler = None
+        self._handles_sigterm = False
+        self._sigterm_pid = None
+        if handle_sigterm:
+            self._install_sigterm_handler()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def num_processed(self):
+        '''The number of frames that have been processed, including those
+        that were restored.
+        '''
+        return len(self._processed)
+
+    @property
+    def num_restored(self):
+        '''The number of frames that were restored from disk.'''
+        return len(self._restored)
+
+    def restored_frames(self):
+        '''Returns the results that were restored from disk.
+
+        Returns:
+            a list of ``(frame_number, result)`` tuples, in the order in which
+            the frames were first added. If a frame was added more than once,
+            its last result is returned
+        '''
+        return list(self._restored.items())
+
+    def is_processed(self, frame_number):
+        '''Whether the given frame has been processed.
+
+        Args:
+            frame_number (int): the frame number
+
+        Returns:
+            True/False
+        '''
+        return frame_number in self._processed
+
+    def get_remaining(self, frame_numbers):
+        '''Returns the given frame numbers that have not been processed.
+
+        Args:
+            frame_numbers (list): a list of frame numbers
+
+        Returns:
+            a list of the frame numbers that have not been processed
+        '''
+        return [fn for fn in frame_numbers if fn not in self._processed]
+
+    def add(self, frame_number, result):
+        '''Adds the result for the given frame to the checkpoint.
+
+        Args:
+            frame_number (int): the frame number
+            result: a JSON-serializable result for the frame, or a function
+                that accepts no arguments and returns it. Functions are called
+                in the background thread, so the result must not be modified
+                after it is added
+
+        Raises:
+            ValueError: if the checkpoint has been closed
+            Exception: the error that stopped the background writer, if any
+        '''
+        if self._error is not None:
+            raise self._error
+
+        if self._closing:
+            raise ValueError("Cannot add results to a closed checkpoint")
+
+        frame_number = int(frame_number)
+        self._processed.add(frame_number)
+        self._pending.append((frame_number, result))
+
+    def save(self, timeout=None):
+        '''Commits a checkpoint containing all results added so far and waits
+        for it to be written.
+
+        Args:
+            timeout (float, optional): the maximum number of seconds to wait.
+                By default, there is no timeout
+
+        Returns:
+            True if the checkpoint was committed, or False if the timeout
+            elapsed first
+
+        Raises:
+            Exception: the error that stopped the background writer, if any
+        '''
+        self._wakeup.set()
+        return self._save(timeout)
+
+    def close(self):
+        '''Commits a final checkpoint, stops the background writer, and
+        restores the previous ``SIGTERM`` handler.
+
+        Raises:
+            Exception: the error that stopped the background writer, if any
+        '''
+        self._restore_sigterm_handler()
+        if not self._thread.is_alive():
+            if self._error is not None:
+                raise self._error
+            return
+
+        self._closing = True
+        self._wakeup.set()
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def clear(self):
+        '''Closes the checkpoint and deletes it from disk, e.g., after the
+        work that it checkpoints has completed successfully.
+        '''
+        self.close()
+        for path in (self._state_path, self._log_path):
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def _save(self, timeout):
+        self._num_saves_requested += 1
+        target = self._num_saves_requested
+
+        deadline = time.time() + timeout if timeout is not None else None
+        while self._num_saves < target and self._thread.is_alive():
+            if deadline is not None and time.time() >= deadline:
+                return False
+
+            time.sleep(0.01)
+
+        if self._error is not None:
+            raise self._error
+
+        return self._num_saves >= target
+
+    def _load(self):
+        etau.ensure_dir(self.checkpoint_dir)
+
+        state = None
+        if os.path.isfile(self._state_path):
+            with open(self._state_path, "r") as f:
+                try:
+                    state = json.load(f)
+                except ValueError:
+                    logger.warning(
+                        "Ignoring invalid checkpoint '%s'", self._state_path)
+
+        if state is not None and state.get("id") != self.checkpoint_id:
+            logger.info(
+                "Ignoring checkpoint for '%s' in '%s'", state.get("id"),
+                self.checkpoint_dir)
+            state = None
+
+        log_size = state["log_size"] if state is not None else 0
+        if log_size and (
+                not os.path.isfile(self._log_path) or
+                os.path.getsize(self._log_path) < log_size):
+            logger.warning(
+                "Ignoring checkpoint '%s' whose log is truncated",
+                self._state_path)
+            log_size = 0
+
+        mode = "r+b" if os.path.isfile(self._log_path) else "w+b"
+        with open(self._log_path, mode) as f:
+            for line in io.BytesIO(f.read(log_size)):
+                frame_number, result = json.loads(line.decode("utf-8"))
+                self._restored[frame_number] = result
+                self._processed.add(frame_number)
+                self._num_committed += 1
+
+            # Discard any results that were written after the last commit
+            f.truncate(log_size)
+
+        self._log_size = log_size
+        if self._restored:
+            logger.info(
+                "Restored %d frame(s) from checkpoint '%s'",
+                len(self._restored), self.checkpoint_dir)
+
+    def _run(self):
+        try:
+            with open(self._log_path, "ab") as f:
+                self._write_loop(f)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Checkpointing failed: %r", e)
+            self._error = e
+
+    def _write_loop(self, f):
+        num_uncommitted = 0
+        first_uncommitted_time = None
+        while True:
+            self._wakeup.wait(_POLL_INTERVAL)
+            self._wakeup.clear()
+
+            # Read the requests before draining, so that a save includes all
+            # results that were added before it was requested
+            closing = self._closing
+            num_saves_requested = self._num_saves_requested
+
+            while self._pending:
+                frame_number, result = self._pending.popleft()
+                if callable(result):
+                    result = result()
+
+                f.write(
+                    (json.dumps([frame_number, result]) + "\n").encode(
+                        "utf-8"))
+                num_uncommitted += 1
+                if first_uncommitted_time is None:
+                    first_uncommitted_time = time.time()
+
+            if (closing or num_saves_requested > self._num_saves or
+                    self._is_due(num_uncommitted, first_uncommitted_time)):
+                if num_uncommitted:
+                    self._commit(f, num_uncommitted)
+                    num_uncommitted = 0
+                    first_uncommitted_time = None
+
+                self._num_saves = num_saves_requested
+
+            if closing:
+                return
+
+    def _is_due(self, num_uncommitted, first_uncommitted_time):
+        if not num_uncommitted:
+            return False
+
+        if self.every_frames and num_uncommitted >= self.every_frames:
+            return True
+
+        return (
+            self.every_seconds is not None and
+            time.time() - first_uncommitted_time >= self.every_seconds)
+
+    def _commit(self, f, num_frames):
+        # Persist the results before the state that refers to them
+        f.flush()
+        os.fsync(f.fileno())
+        self._log_size = f.tell()
+        self._num_committed += num_frames
+
+        state = {
+            "id": self.checkpoint_id,
+            "num_frames": self._num_committed,
+            "log_size": self._log_size,
+        }
+        tmp_path = self._state_path + ".tmp"
+        with open(tmp_path, "w") as sf:
+            json.dump(state, sf)
+        if os.name == "nt" and os.path.exists(self._state_path):
+            os.remove(self._state_path)
+        os.rename(tmp_path, self._state_path)
+
+        logger.debug(
+            "Checkpointed %d frame(s) to '%s'", self._num_committed,
+            self.checkpoint_dir)
+
+    def _install_sigterm_handler(self):
+        try:
+            self._prev_sigterm_handler = signal.signal(
+                signal.SIGTERM, self._handle_sigterm)
+            self._handles_sigterm = True
+            self._sigterm_pid = os.getpid()
+        except ValueError:
+            # Signal handlers can only be installed by the main thread
+            logger.warning(
+                "Unable to handle SIGTERM outside of the main thread; "
+                "checkpoints will only be saved periodically")
+
+    def _restore_sigterm_handler(self):
+        if not self._handles_sigterm:
+            return
+
+        try:
+            # Handlers that were not installed from Python are reported as
+            # None and cannot be restored
+            signal.signal(
+                signal.SIGTERM, self._prev_sigterm_handler or signal.SIG_DFL)
+        except ValueError:
+            return  # not in the main thread
+
+        self._handles_sigterm = False
+
+    def _handle_sigterm(self, signum, frame):
+        prev_handler = self._prev_sigterm_handler
+        if os.getpid() != self._sigterm_pid:
+            # Forked processes inherit the handler but not the writer thread,
+            # so they have no checkpoint to save
+            signal.signal(signal.SIGTERM, prev_handler or signal.SIG_DFL)
+            _call_sigterm_handler(prev_handler, signum, frame)
+            return
+
+        logger.warning("Received SIGTERM; saving checkpoint")
+        self._restore_sigterm_handler()
+
+        # The writer is not woken explicitly, since the interrupted thread
+        # may hold the lock of the wakeup event
+        try:
+            if not self._save(self.sigterm_timeout):
+                logger.warning("Timed out while saving checkpoint")
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Failed to save checkpoint: %r", e)
+
+        _call_sigterm_handler(prev_handler, signum, frame)
+
+
+def _call_sigterm_handler(handler, signum, frame):
+    if callable(handler):
+        handler(signum, frame)
+    elif handler != signal.SIG_IGN:
+        # Terminate as the default handler would have
+        os.kill(os.getpid(), signum)
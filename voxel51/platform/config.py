@@ -45,3 +45,20 @@ API_BASE_URL_ENV_VAR = "API_BASE_URL"
 # for the task
 #
 LOGFILE_SIGNED_URL_ENV_VAR = "LOGFILE_SIGNED_URL"
+
+#
+# The environment variable that holds the directory of the download cache
+#
+DOWNLOAD_CACHE_DIR_ENV_VAR = "DOWNLOAD_CACHE_DIR"
+
+#
+# The environment variable that holds the maximum size, in bytes, of the
+# download cache
+#
+DOWNLOAD_CACHE_SIZE_ENV_VAR = "DOWNLOAD_CACHE_SIZE"
+
+#
+# The environment variable that holds the path of the file in which the
+# metadata cache is persisted
+#
+METADATA_CACHE_PATH_ENV_VAR = "METADATA_CACHE_PATH"
@@ -18,22 +18,30 @@ from future.utils import iteritems
 # pragma pylint: enable=unused-wildcard-import
 # pragma pylint: enable=wildcard-import
 
+from collections import deque, OrderedDict
 import datetime
+import io
 import logging
 import os
 import sys
+import threading
+import time
+import uuid
 
 from eta.core.config import Config
 import eta.core.logging as etal
+import eta.core.serial as etas
 from eta.core.serial import Serializable
 import eta.core.utils as etau
 
 import voxel51.platform.api as voxa
+import voxel51.platform.checkpoint as voxk
 import voxel51.platform.config as voxc
 import voxel51.platform.utils as voxu
 
 
 _API_CLIENT = None
+_MESSAGES_PLACEHOLDER = "__messages_%s__" % uuid.uuid4().hex
 
 
 logger = logging.getLogger(__name__)
@@ -79,36 +87,104 @@ class TaskFailureType(object):
 
 
 class TaskManager(object):
-    '''Class for managing the execution of a task.'''
+    '''Class for managing the execution of a task.
 
-    def __init__(self, task_config, task_status=None):
+    The lifecycle stages of the task (downloading inputs, uploading outputs,
+    etc.) are timed automatically, and custom stages can be timed via
+    :func:`TaskManager.stage`. The timings are recorded in the ``stages``
+    metrics of the :class:`TaskStatus`, and a summary table is logged when
+    the task completes or fails.
+
+    Per-frame results can be checkpointed to local disk via
+    :func:`TaskManager.open_checkpoint`, so that a task that is interrupted
+    can skip the frames that it already processed when it is rerun.
+
+    Attributes:
+        task_config (TaskConfig): the TaskConfig for the task
+        task_status (TaskStatus): the TaskStatus for the task
+        stage_timer (StageTimer): the StageTimer for the task
+        checkpoint (voxel51.platform.checkpoint.FrameCheckpoint): the
+            checkpoint of the task, or None if
+            :func:`TaskManager.open_checkpoint` has not been called
+    '''
+
+    def __init__(
+            self, task_config, task_status=None, background_publish=False,
+            message_retention=None, stage_timer=None):
         '''Creates a TaskManager instance.
 
         Args:
             task_config (TaskConfig): a TaskConfig instance
             task_status (TaskStatus, optional): an optional TaskStatus instance
                 to use. If not provided, the default TaskStatus is created
+            background_publish (bool, optional): whether the default TaskStatus
+                should publish itself in a background thread via a
+                :class:`BackgroundPublisher`. By default, this is False
+            message_retention (MessageRetentionPolicy, optional): an optional
+                policy for bounding the messages retained by the default
+                TaskStatus. By default, all messages are retained
+            stage_timer (StageTimer, optional): an optional StageTimer that
+                has already timed earlier stages of the task. By default, a
+                new StageTimer is created
         '''
         self.task_config = task_config
         if task_status is not None:
             self.task_status = task_status
         else:
-            self.task_status = make_task_status(task_config)
+            self.task_status = make_task_status(
+                task_config, background_publish=background_publish,
+                message_retention=message_retention)
+
+        self.stage_timer = stage_timer or StageTimer()
+        self.checkpoint = None
+        self._record_stages()
 
     @classmethod
-    def from_url(cls, task_config_url):
+    def from_url(
+            cls, task_config_url, background_publish=False,
+            message_retention=None):
         '''Creates a TaskManager for the TaskConfig downloadable from the given
         URL.
 
         Args:
             task_config_url (str): a URL from which to download a
                 :class:`TaskConfig`
+            background_publish (bool, optional): whether to publish the
+                :class:`TaskStatus` in a background thread via a
+                :class:`BackgroundPublisher`. By default, this is False
+            message_retention (MessageRetentionPolicy, optional): an optional
+                policy for bounding the messages retained by the
+                :class:`TaskStatus`. By default, all messages are retained
 
         Returns:
             a TaskManager instance
         '''
-        task_config = download_task_config(task_config_url)
-        return cls(task_config)
+        stage_timer = StageTimer()
+        with stage_timer.stage("download_task_config"):
+            task_config = download_task_config(task_config_url)
+
+        return cls(
+            task_config, background_publish=background_publish,
+            message_retention=message_retention, stage_timer=stage_timer)
+
+    def stage(self, name):
+        '''Returns a context manager that times a custom stage of the task.
+
+        The stage is recorded in the :class:`TaskStatus` when the block exits,
+        even if it raises an exception. The returned object has an
+        ``add_bytes(num_bytes)`` method that can be used to record the bytes
+        transferred by the stage::
+
+            with task_manager.stage("inference"):
+                ...
+
+        Args:
+            name (str): the name of the stage
+
+        Returns:
+            a context manager
+        '''
+        return self.stage_timer.stage(name, callback=self._record_stages)
 
     def start(self):
         '''Marks the task as started and publishes the :class:`TaskStatus` to
@@ -116,47 +192,158 @@ class TaskManager(object):
 
         If the task is already started, no action is taken.
         '''
-        start_task(self.task_status)
+        with self.stage("start"):
+            start_task(self.task_status)
 
     def pause(self, config_path, status_path):
         '''Pauses the task by writing the :class:`TaskConfig` and current
         :class:`TaskStatus` to disk locally.
 
         To resume a task and retrieve the associated :class:`TaskManger`, use
-        :func:`resume_task`.
+        :func:`resume_task`. Any inputs or data parameters whose downloads
+        were interrupted are resumed rather than restarted when they are
+        downloaded to the same directory by the resumed task.
+
+        If the task has a checkpoint, it is saved first.
 
         Args:
             config_path (str): local path to write the TaskConfig
             status_path (str): local path to write the TaskStatus
         '''
+        if self.checkpoint is not None:
+            self.checkpoint.save()
+
         pause_task(
             self.task_config, self.task_status, config_path, status_path)
 
-    def download_inputs(self, inputs_dir):
+    def open_checkpoint(
+            self, checkpoint_dir, every_frames=None,
+            every_seconds=voxk.DEFAULT_CHECKPOINT_INTERVAL,
+            handle_sigterm=True):
+        '''Opens a checkpoint of the per-frame results of the task.
+
+        If the directory contains a checkpoint for the same job, e.g., one
+        written by an earlier run of the task that was preempted, it is
+        restored. Use ``checkpoint.restored_frames()`` to retrieve the
+        restored results and ``checkpoint.get_remaining(frame_numbers)`` to
+        skip the frames that were already processed. Add the result of each
+        new frame via ``checkpoint.add(frame_number, result)``.
+
+        The checkpoint is saved when the task is paused, is kept when the
+        task fails so that a rerun can resume from it, and is deleted when
+        the task completes.
+
+        Args:
+            checkpoint_dir (str): the local directory in which to store the
+                checkpoint
+            every_frames (int, optional): commit a checkpoint whenever this
+                many frames have been added since the last checkpoint
+            every_seconds (float, optional): commit a checkpoint at most this
+                many seconds after a frame is added. The default is
+                ``voxel51.platform.checkpoint.DEFAULT_CHECKPOINT_INTERVAL``
+            handle_sigterm (bool, optional): whether to commit a checkpoint
+                when the process receives ``SIGTERM``. By default, this is
+                True
+
+        Returns:
+            a ``voxel51.platform.checkpoint.FrameCheckpoint``
+        '''
+        self.checkpoint = voxk.FrameCheckpoint(
+            checkpoint_dir, checkpoint_id=self.task_config.job_id,
+            every_frames=every_frames, every_seconds=every_seconds,
+            handle_sigterm=handle_sigterm)
+        if self.checkpoint.num_restored:
+            self.task_status.add_message(
+                "Resumed from a checkpoint of %d frame(s)" %
+                self.checkpoint.num_restored)
+
+        return self.checkpoint
+
+    def download_inputs(
+            self, inputs_dir, num_workers=None, num_range_workers=None):
         '''Downloads the task inputs.
 
         Args:
             inputs_dir (str): the directory to which to download the inputs
+            num_workers (int, optional): the maximum number of inputs to
+                download concurrently. By default, inputs are downloaded
+                serially
+            num_range_workers (int, optional): the number of parallel HTTP
+                Range requests to use to download each input. By default, each
+                input is downloaded via a single request
 
         Returns:
             a dictionary mapping input names to filepaths
         '''
-        return download_inputs(inputs_dir, self.task_config, self.task_status)
+        with self.stage("download_inputs") as stage:
+            input_paths = download_inputs(
+                inputs_dir, self.task_config, self.task_status,
+                num_workers=num_workers, num_range_workers=num_range_workers)
+            stage.add_bytes(_get_total_size(input_paths.values()))
+
+        return input_paths
 
-    def parse_parameters(self, data_params_dir=None):
+    def download_inputs_progressive(self, inputs_dir):
+        '''Starts downloading the task inputs in the background, so that
+        they can be processed while they are downloaded.
+
+        See :func:`download_inputs_progressive` for details.
+
+        Each download is recorded as a call of the
+        ``download_inputs_progressive`` stage when it finishes. Since the
+        downloads overlap with the processing of the inputs, their time is
+        not subtracted from ``unstaged_seconds``.
+
+        Args:
+            inputs_dir (str): the directory to which to download the inputs
+
+        Returns:
+            a dictionary mapping input names to
+            ``voxel51.platform.utils.ProgressiveDownload`` instances
+        '''
+        start_time = time.time()
+
+        def _record_download(download):
+            self.stage_timer.record(
+                "download_inputs_progressive", time.time() - start_time,
+                num_bytes=download.bytes_downloaded, top_level=False)
+            self._record_stages()
+
+        return download_inputs_progressive(
+            inputs_dir, self.task_config, self.task_status,
+            callback=_record_download)
+
+    def parse_parameters(
+            self, data_params_dir=None, num_workers=None,
+            num_range_workers=None):
         '''Parses the task parameters.
 
         Args:
             data_params_dir (str, optional): the directory to which to download
                 data (non-builtin) parameters, if any. By default, this is None
+            num_workers (int, optional): the maximum number of data parameters
+                to download concurrently. By default, data parameters are
+                downloaded serially
+            num_range_workers (int, optional): the number of parallel HTTP
+                Range requests to use to download each data parameter. By
+                default, each parameter is downloaded via a single request
 
         Returns:
             a dictionary mapping parameter names to values (builtin parameters)
             or paths (data parameters)
         '''
-        return parse_parameters(
-            self.task_config, self.task_status,
-            data_params_dir=data_params_dir)
+        with self.stage("parse_parameters") as stage:
+            parameters = parse_parameters(
+                self.task_config, self.task_status,
+                data_params_dir=data_params_dir, num_workers=num_workers,
+                num_range_workers=num_range_workers)
+            stage.add_bytes(_get_total_size(
+                parameters[name]
+                for name, val in iteritems(self.task_config.parameters)
+                if name in parameters and
+                voxu.RemotePathConfig.is_path_config_dict(val)))
+
+        return parameters
 
     def get_path_for_input(self, name, inputs_dir):
         '''Gets the filepath for the task input with the given name.
@@ -221,9 +408,13 @@ class TaskManager(object):
             metadata (dict, optional): a metadata dict describing the input
         '''
         if image_path:
-            metadata = voxu.get_metadata_for_image(image_path).serialize()
+            with self.stage("record_input_metadata"):
+                metadata = voxu.get_metadata_for_image(image_path).serialize()
         if video_path:
-            metadata = voxu.get_metadata_for_video(video_path).serialize()
+            with self.stage("record_input_metadata"):
+                metadata = voxu.get_metadata_for_video(video_path).serialize()
+        if image_path or video_path:
+            _record_metadata_cache_metrics(self.task_status)
         self.task_status.record_input_metadata(name, metadata)
 
     def post_job_metadata(self, image_path=None, video_path=None):
@@ -238,12 +429,13 @@ class TaskManager(object):
             image_path (str, optional): the path to the input image for the job
             video_path (str, optional): the path to the input video for the job
         '''
-        if image_path:
-            post_job_metadata_for_image(
-                image_path, self.task_config, self.task_status)
-        if video_path:
-            post_job_metadata_for_video(
-                video_path, self.task_config, self.task_status)
+        with self.stage("post_job_metadata"):
+            if image_path:
+                post_job_metadata_for_image(
+                    image_path, self.task_config, self.task_status)
+            if video_path:
+                post_job_metadata_for_video(
+                    video_path, self.task_config, self.task_status)
 
     def add_status_message(self, msg):
         '''Adds the given status message to the :class:`TaskStatus` for the
@@ -255,16 +447,33 @@ class TaskManager(object):
         self.task_status.add_message(msg)
 
     def publish_status(self):
-        '''Publishes the current status of the task to the platform.'''
-        self.task_status.publish()
+        '''Publishes the current status of the task to the platform.
+
+        When publishing in the background, this method returns immediately.
+        Use :func:`TaskManager.flush_status` to wait for the publish to
+        complete.
+        '''
+        with self.stage("publish_status"):
+            self.task_status.publish()
 
-    def upload_output(self, output_path):
+    def flush_status(self):
+        '''Blocks until all pending status publishes have completed.'''
+        self.task_status.flush()
+
+    def upload_output(self, output_path, part_size=None):
         '''Uploads the task output.
 
         Args:
             output_path (str): the local path to the output file to upload
+            part_size (int, optional): a part size, in bytes. If provided, the
+                output is uploaded in parts of this size. By default, the
+                output is uploaded via a single request
         '''
-        upload_output(output_path, self.task_config, self.task_status)
+        with self.stage("upload_output") as stage:
+            upload_output(
+                output_path, self.task_config, self.task_status,
+                part_size=part_size)
+            stage.add_bytes(os.path.getsize(output_path))
 
     def upload_output_as_data(self, name, output_path):
         '''Uploads the given task output as data on behalf of the user.
@@ -273,19 +482,37 @@ class TaskManager(object):
             name (str): the name of the output
             output_path (str): the local path to the output file to upload
         '''
-        upload_output_as_data(
-            name, output_path, self.task_config, self.task_status)
+        with self.stage("upload_output_as_data") as stage:
+            upload_output_as_data(
+                name, output_path, self.task_config, self.task_status)
+            stage.add_bytes(os.path.getsize(output_path))
 
     def complete(self, logfile_path=None):
         '''Marks the task as complete and publishes the :class:`TaskStatus` to
         the platform.
 
+        The logfile, if any, is uploaded first, as the ``upload_logfile``
+        stage. A summary of the stage timings of the task is then logged and
+        recorded in the status that is published. Note that the final publish
+        is not itself included in the timings.
+
         Args:
             logfile_path (str): an optional path to a logfile to upload for the
                 task
         '''
-        complete_task(
-            self.task_config, self.task_status, logfile_path=logfile_path)
+        logger.info("Task complete")
+        self.task_status.complete()
+        if logfile_path:
+            with self.stage("upload_logfile") as stage:
+                upload_logfile(logfile_path, self.task_config)
+                stage.add_bytes(os.path.getsize(logfile_path))
+
+        self._log_stage_summary()
+        self.task_status.publish()
+        self.task_status.flush()
+        _close_message_retention(self.task_status)
+        if self.checkpoint is not None:
+            self.checkpoint.clear()
 
     def fail_gracefully(self, failure_type=None, logfile_path=None):
         '''Marks the task as failed and gracefully winds up by posting any
@@ -297,10 +524,26 @@ class TaskManager(object):
             logfile_path (str): an optional local path to a logfile for the
                 task
         '''
+        self._log_stage_summary()
+        if self.checkpoint is not None:
+            try:
+                self.checkpoint.close()
+            except:
+                logger.error(
+                    "Failed to save checkpoint", exc_info=sys.exc_info())
+
         fail_gracefully(
             self.task_config, self.task_status, failure_type=failure_type,
             logfile_path=logfile_path)
 
+    def _record_stages(self):
+        self.task_status.record_metrics(
+            "stages", self.stage_timer.get_stats())
+
+    def _log_stage_summary(self):
+        self._record_stages()
+        logger.info("Stage timings:\n%s", self.stage_timer.get_summary())
+
 
 class TaskStatus(Serializable):
     '''Class for recording the status of a task.
@@ -322,6 +565,15 @@ class TaskStatus(Serializable):
             task
         posted_data (dict): a dictionary mapping names of outputs posted as
             data to their associated data IDs
+        omitted_messages (TaskStatusMessage): a message summarizing the
+            messages that were dropped from ``messages`` by the
+            :class:`MessageRetentionPolicy` of the status, or None if no
+            messages were dropped
+        metrics (dict): a dictionary mapping names to metrics about the
+            execution of the task, e.g., download cache statistics
+        message_retention (MessageRetentionPolicy): the policy used to bound
+            the messages retained by the status, or None if all messages are
+            retained. The policy is not serialized
     '''
 
     def __init__(
@@ -335,7 +587,9 @@ class TaskStatus(Serializable):
             failure_type=TaskFailureType.NONE,
             messages=None,
             inputs=None,
-            posted_data=None
+            posted_data=None,
+            omitted_messages=None,
+            metrics=None
         ):
         '''Creates a TaskStatus instance.
 
@@ -357,6 +611,11 @@ class TaskStatus(Serializable):
                 inputs to the task, if any
             posted_data (dict, optional): a dictionary mapping names of
                 outputs, if any, posted as data to their associated data IDs
+            omitted_messages (TaskStatusMessage, optional): a message
+                summarizing the messages that were dropped from ``messages``,
+                if any
+            metrics (dict, optional): a dictionary mapping names to metrics
+                about the execution of the task, if any
         '''
         self.analytic = analytic or ""
         self.version = version
@@ -368,23 +627,37 @@ class TaskStatus(Serializable):
         self.messages = messages or []
         self.inputs = inputs or {}
         self.posted_data = posted_data or {}
+        self.omitted_messages = omitted_messages
+        self.metrics = metrics or {}
+        self.message_retention = None
         self._publish_callback = None
+        self._message_cache = {}
 
     @classmethod
-    def build_for(cls, task_config):
+    def build_for(
+            cls, task_config, background_publish=False,
+            message_retention=None):
         '''Builds a TaskStatus for recording the status of the task specified
         by the given TaskConfig.
 
         Args:
             task_config (TaskConfig): a TaskConfig describing the task
+            background_publish (bool, optional): whether to publish the status
+                in a background thread via a :class:`BackgroundPublisher`. By
+                default, this is False
+            message_retention (MessageRetentionPolicy, optional): an optional
+                policy for bounding the messages retained by the status. By
+                default, all messages are retained
 
         Returns:
             a TaskStatus instance
         '''
         task_status = cls(
             analytic=task_config.analytic, version=task_config.version)
-        publish_callback = make_publish_callback(task_config)
+        publish_callback = make_publish_callback(
+            task_config, background=background_publish)
         task_status.set_publish_callback(publish_callback)
+        task_status.set_message_retention(message_retention)
         return task_status
 
     def record_input_metadata(self, name, metadata):
@@ -406,6 +679,15 @@ class TaskStatus(Serializable):
         '''
         self.posted_data[name] = data_id
 
+    def record_metrics(self, name, metrics):
+        '''Records metrics about the execution of the task.
+
+        Args:
+            name (str): the name of the metrics
+            metrics (dict): a dictionary of metrics
+        '''
+        self.metrics[name] = metrics
+
     def start(self, msg="Task started"):
         '''Marks the task as started.
 
@@ -456,6 +738,9 @@ class TaskStatus(Serializable):
         '''Adds the given message to the status. Messages are timestamped and
         stored in an internal messages list.
 
+        If the status has a :class:`MessageRetentionPolicy`, the messages list
+        is compacted according to the policy.
+
         Args:
             msg (str): a message to log
 
@@ -463,9 +748,35 @@ class TaskStatus(Serializable):
             the timestamp of the message
         '''
         message = TaskStatusMessage(msg)
-        self.messages.append(message)
+        retention = self.message_retention
+        if retention is None:
+            self.messages.append(message)
+            return message.time
+
+        retention.spill(message)
+        last = self.messages[-1] if self.messages else None
+        if (retention.collapse_repeats and last is not None and
+                last.message == message.message):
+            # Messages are replaced rather than modified so that their cached
+            # encodings remain valid
+            self.messages[-1] = last.merge(message)
+        else:
+            self.messages.append(message)
+
+        retention.apply(self)
         return message.time
 
+    def set_message_retention(self, message_retention):
+        '''Sets the policy used to bound the messages retained by the status.
+
+        Args:
+            message_retention (MessageRetentionPolicy): a
+                :class:`MessageRetentionPolicy`, or None to retain all messages
+        '''
+        self.message_retention = message_retention
+        if message_retention is not None:
+            message_retention.apply(self)
+
     def set_publish_callback(self, publish_callback):
         '''Sets the callback to use when `publish()` is called.
 
@@ -482,11 +793,104 @@ class TaskStatus(Serializable):
         if self._publish_callback:
             self._publish_callback(self)
 
+    def flush(self):
+        '''Blocks until all previous calls to :func:`TaskStatus.publish` have
+        completed.
+
+        This is only necessary when the publish callback publishes
+        asynchronously, e.g., a :class:`BackgroundPublisher`; otherwise, no
+        action is taken.
+
+        Raises:
+            Exception: any exception raised by the most recent publish
+        '''
+        flush = getattr(self._publish_callback, "flush", None)
+        if flush is not None:
+            flush()
+
+        if self.message_retention is not None:
+            self.message_retention.flush()
+
+    def get_publish_stats(self):
+        '''Returns statistics about the publishes of the task status, if the
+        publish callback records them, e.g., a :class:`BackgroundPublisher`.
+
+        Returns:
+            a dictionary of publish statistics, or None if no statistics are
+            available
+        '''
+        get_stats = getattr(self._publish_callback, "get_stats", None)
+        return get_stats() if get_stats is not None else None
+
     def attributes(self):
         '''Returns a list of class attributes to be serialized.'''
-        return [
+        attrs = [
             "analytic", "version", "state", "start_time", "complete_time",
             "fail_time", "failure_type", "messages", "inputs", "posted_data"]
+        if self.omitted_messages is not None:
+            attrs.append("omitted_messages")
+        if self.metrics:
+            attrs.append("metrics")
+
+        return attrs
+
+    def to_str(self, pretty_print=True, **kwargs):
+        '''Returns a string representation of the task status.
+
+        The output is identical to ``eta.core.serial.Serializable.to_str``,
+        but the encoded messages are cached between calls, so only the
+        messages that were added since the last call are encoded. Messages
+        are assumed to be immutable once they have been added to the status.
+
+        Args:
+            pretty_print (bool, optional): whether to render the JSON in human
+                readable format with newlines and indentations. By default,
+                this is True
+            **kwargs: optional keyword arguments for
+                ``eta.core.serial.Serializable.serialize``. If provided, the
+                status is serialized without caching
+
+        Returns:
+            a string representation of the task status
+        '''
+        if kwargs:
+            return super(TaskStatus, self).to_str(
+                pretty_print=pretty_print, **kwargs)
+
+        d = OrderedDict()
+        for attr in self.attributes():
+            if attr == "messages":
+                d[attr] = _MESSAGES_PLACEHOLDER
+            else:
+                d[attr] = getattr(self, attr)
+
+        status_str = etas.json_to_str(d, pretty_print=pretty_print)
+        return status_str.replace(
+            "\"%s\"" % _MESSAGES_PLACEHOLDER,
+            self._encode_messages(pretty_print), 1)
+
+    def _encode_messages(self, pretty_print):
+        # Reuse the encodings of messages that were encoded by previous calls
+        cache = self._message_cache.get(pretty_print, {})
+        new_cache = {}
+        message_strs = []
+        for message in self.messages:
+            entry = cache.get(id(message))
+            if entry is None or entry[0] is not message:
+                entry = (message, _encode_message(message, pretty_print))
+
+            new_cache[id(message)] = entry
+            message_strs.append(entry[1])
+
+        self._message_cache[pretty_print] = new_cache
+
+        if not message_strs:
+            return "[]"
+
+        if pretty_print:
+            return "[\n" + ",\n".join(message_strs) + "\n    ]"
+
+        return "[" + ",".join(message_strs) + "]"
 
     @classmethod
     def from_dict(cls, d):
@@ -509,34 +913,73 @@ class TaskStatus(Serializable):
         # Note that we are not parsing Serializable objects here, if any
         inputs = d["inputs"]
         posted_data = d["posted_data"]
+        omitted_messages = d.get("omitted_messages", None)
+        if omitted_messages is not None:
+            omitted_messages = TaskStatusMessage.from_dict(omitted_messages)
+        metrics = d.get("metrics", None)
+
         return cls(
             analytic=analytic, version=version, state=state,
             start_time=start_time, complete_time=complete_time,
             fail_time=fail_time, failure_type=failure_type, messages=messages,
-            inputs=inputs, posted_data=posted_data)
+            inputs=inputs, posted_data=posted_data,
+            omitted_messages=omitted_messages, metrics=metrics)
 
 
 class TaskStatusMessage(Serializable):
     '''Class encapsulating a task status message with a timestamp.
 
+    A message may summarize a run of ``count`` messages, in which case
+    ``time`` and ``end_time`` are the timestamps of the first and last
+    messages in the run.
+
     Attributes:
         message (str): the message string
         time (datetime): the message timestamp
+        count (int): the number of messages summarized by the message
+        end_time (datetime): the timestamp of the last message summarized by
+            the message, or None if ``count == 1``
     '''
 
-    def __init__(self, message, time=None):
+    def __init__(self, message, time=None, count=1, end_time=None):
         '''Creates a TaskStatusMessage instance.
 
         Args:
             message (str): a message string
             time (datetime, optional): an optional timestamp. If not provided,
                 the current time is used
+            count (int, optional): the number of messages summarized by the
+                message. The default is 1
+            end_time (datetime, optional): the timestamp of the last message
+                summarized by the message, if ``count > 1``
         '''
         self.message = message
         self.time = time or datetime.datetime.utcnow()
+        self.count = count
+        self.end_time = end_time
+
+    def merge(self, message, summary=None):
+        '''Returns a new message that summarizes this message followed by
+        the given message.
+
+        Args:
+            message (TaskStatusMessage): a later message
+            summary (str, optional): the message string of the summary. By
+                default, the message string of this message is used
+
+        Returns:
+            a TaskStatusMessage
+        '''
+        return TaskStatusMessage(
+            summary if summary is not None else self.message, time=self.time,
+            count=self.count + message.count,
+            end_time=message.end_time or message.time)
 
     def attributes(self):
         '''Returns a list of class attributes to be serialized.'''
+        if self.count > 1:
+            return ["message", "time", "count", "end_time"]
+
         return ["message", "time"]
 
     @classmethod
@@ -551,7 +994,454 @@ class TaskStatusMessage(Serializable):
             a TaskStatusMessage instance
         '''
         time = etau.parse_isotime(d.get("time"))
-        return cls(d["message"], time=time)
+        count = d.get("count", 1)
+        end_time = etau.parse_isotime(d.get("end_time"))
+        return cls(d["message"], time=time, count=count, end_time=end_time)
+
+
+class MessageRetentionPolicy(object):
+    '''Policy for bounding the messages retained by a :class:`TaskStatus`.
+
+    The policy retains the first ``max_head`` and the last ``max_tail``
+    messages of the task. The messages in between are dropped and summarized
+    by the ``omitted_messages`` attribute of the status. Runs of repeated
+    messages can also be collapsed into a single message that records the
+    number of repeats and the time range of the run.
+
+    Optionally, every message can be appended to a local JSON Lines file so
+    that the full history of the task is preserved. The file is closed when
+    the task is paused, completed, or failed, and is reopened if more
+    messages are added afterwards.
+
+    Attributes:
+        max_head (int): the number of messages to retain from the start of the
+            task
+        max_tail (int): the number of most recent messages to retain
+        collapse_repeats (bool): whether to collapse runs of repeated messages
+        spill_path (str): the path to which all messages are appended, or None
+    '''
+
+    def __init__(
+            self, max_head=100, max_tail=1000, collapse_repeats=True,
+            spill_path=None):
+        '''Creates a MessageRetentionPolicy instance.
+
+        Args:
+            max_head (int, optional): the number of messages to retain from
+                the start of the task. The default is 100
+            max_tail (int, optional): the number of most recent messages to
+                retain. The default is 1000
+            collapse_repeats (bool, optional): whether to collapse runs of
+                repeated messages. The default is True
+            spill_path (str, optional): an optional path to a JSON Lines file
+                to which to append all messages
+        '''
+        self.max_head = max_head
+        self.max_tail = max_tail
+        self.collapse_repeats = collapse_repeats
+        self.spill_path = spill_path
+        self._spill_file = None
+
+    def apply(self, task_status):
+        '''Drops messages from the given status as required by the policy.
+
+        Args:
+            task_status (TaskStatus): a TaskStatus
+        '''
+        messages = task_status.messages
+        num_dropped = len(messages) - self.max_head - self.max_tail
+        if num_dropped <= 0:
+            return
+
+        dropped = messages[self.max_head:self.max_head + num_dropped]
+        del messages[self.max_head:self.max_head + num_dropped]
+
+        omitted = task_status.omitted_messages
+        for message in dropped:
+            if omitted is None:
+                omitted = TaskStatusMessage(
+                    "", time=message.time, count=0, end_time=message.time)
+
+            omitted = omitted.merge(message)
+
+        omitted.message = "%d messages omitted" % omitted.count
+        task_status.omitted_messages = omitted
+
+    def spill(self, message):
+        '''Appends the given message to the spill file, if any.
+
+        Args:
+            message (TaskStatusMessage): a TaskStatusMessage
+        '''
+        if self.spill_path is None:
+            return
+
+        if self._spill_file is None:
+            etau.ensure_basedir(self.spill_path)
+            self._spill_file = io.open(self.spill_path, "a", encoding="utf-8")
+
+        self._spill_file.write(
+            etas.json_to_str(message, pretty_print=False) + "\n")
+
+    def flush(self):
+        '''Flushes any messages buffered for the spill file to disk.'''
+        if self._spill_file is not None:
+            self._spill_file.flush()
+
+    def close(self):
+        '''Closes the spill file, if necessary.'''
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+
+def _encode_message(message, pretty_print):
+    message_str = etas.json_to_str(message, pretty_print=pretty_print)
+    if pretty_print:
+        # Indent to the depth of the elements of the ``messages`` list
+        message_str = "        " + message_str.replace("\n", "\n        ")
+
+    return message_str
+
+
+class BackgroundPublisher(object):
+    '''A publish callback that publishes :class:`TaskStatus` instances to
+    the platform in a background thread.
+
+    Calling the publisher takes a snapshot of the task status and returns
+    immediately. Snapshots are published in order by a single background
+    thread, so at most one publish is in flight at any time. When a burst of
+    snapshots with the same task state is queued behind an in-flight publish,
+    only the latest one is published; the superseded snapshots are dropped.
+    Snapshots that change the task state are never dropped, so every state
+    transition is reported to the platform.
+
+    Use :func:`BackgroundPublisher.flush` to wait for all pending snapshots to
+    be published.
+    '''
+
+    def __init__(self, task_config):
+        '''Creates a BackgroundPublisher instance.
+
+        Args:
+            task_config (TaskConfig): the TaskConfig for the task
+        '''
+        self.task_config = task_config
+
+        self._pending = deque()
+        self._in_flight = False
+        self._error = None
+        self._cond = threading.Condition()
+        self._thread = None
+
+        self._num_requested = 0
+        self._num_published = 0
+        self._num_dropped = 0
+        self._num_failed = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+        self._last_latency = None
+
+    def __call__(self, task_status):
+        snapshot = _StatusSnapshot(task_status)
+        with self._cond:
+            self._num_requested += 1
+            if self._pending and self._pending[-1].state == snapshot.state:
+                self._pending[-1] = snapshot
+                self._num_dropped += 1
+            else:
+                self._pending.append(snapshot)
+
+            self._ensure_thread()
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        '''Blocks until all pending snapshots have been published.
+
+        Args:
+            timeout (float, optional): an optional maximum number of seconds
+                to wait
+
+        Raises:
+            Exception: the exception raised by the most recent publish, if it
+                failed
+        '''
+        if timeout is not None:
+            deadline = time.time() + timeout
+
+        with self._cond:
+            while self._pending or self._in_flight:
+                if timeout is None:
+                    self._cond.wait()
+                    continue
+
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    logger.warning(
+                        "Timed out waiting for task status to be published")
+                    break
+
+                self._cond.wait(remaining)
+
+            error = self._error
+            self._error = None
+
+        if error is not None:
+            raise error
+
+    def get_stats(self):
+        '''Returns statistics about the publishes performed so far.
+
+        The latency of a publish is the time elapsed between the snapshot
+        being taken and the publish completing, including any time spent
+        waiting behind other publishes.
+
+        Returns:
+            a dictionary with the following keys: ``num_requested``,
+            ``num_published``, ``num_dropped``, ``num_failed``,
+            ``num_pending``, ``last_latency``, ``mean_latency`` and
+            ``max_latency``
+        '''
+        with self._cond:
+            num_completed = self._num_published + self._num_failed
+            mean_latency = (
+                self._total_latency / num_completed if num_completed else None)
+            return {
+                "num_requested": self._num_requested,
+                "num_published": self._num_published,
+                "num_dropped": self._num_dropped,
+                "num_failed": self._num_failed,
+                "num_pending": len(self._pending) + int(self._in_flight),
+                "last_latency": self._last_latency,
+                "mean_latency": mean_latency,
+                "max_latency": self._max_latency,
+            }
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+
+                snapshot = self._pending.popleft()
+                self._in_flight = True
+
+            error = None
+            try:
+                snapshot.publish(self.task_config)
+            except Exception as e:
+                logger.error(
+                    "Failed to publish task status", exc_info=sys.exc_info())
+                error = e
+
+            latency = time.time() - snapshot.timestamp
+            with self._cond:
+                self._in_flight = False
+                self._error = error
+                if error is None:
+                    self._num_published += 1
+                else:
+                    self._num_failed += 1
+
+                self._last_latency = latency
+                self._total_latency += latency
+                self._max_latency = max(self._max_latency, latency)
+                self._cond.notify_all()
+
+
+class StageTimer(object):
+    '''Records the wall time, number of calls, and bytes transferred by the
+    named stages of a task.
+
+    Stages are timed via :func:`StageTimer.stage`. Stages may be nested, in
+    which case the time of the inner stage is also counted by the outer
+    stage. The time elapsed since the timer was created that was not spent
+    in any (top-level) stage is reported as ``unstaged_seconds``.
+    '''
+
+    def __init__(self):
+        '''Creates a StageTimer instance.'''
+        self._stages = OrderedDict()
+        self._start_time = time.time()
+        self._staged_seconds = 0.0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def stage(self, name, callback=None):
+        '''Returns a context manager that times a stage.
+
+        The context manager returns an object whose ``add_bytes(num_bytes)``
+        method can be used to record the bytes transferred by the stage. The
+        stage is recorded even if the block raises an exception.
+
+        Args:
+            name (str): the name of the stage
+            callback (function, optional): an optional function to call with
+                no arguments after the stage has been recorded
+
+        Returns:
+            a context manager
+        '''
+        return _StageContext(self, name, callback)
+
+    def record(self, name, seconds, num_bytes=0, top_level=True):
+        '''Records a call to the given stage.
+
+        Args:
+            name (str): the name of the stage
+            seconds (float): the wall time of the call, in seconds
+            num_bytes (int, optional): the number of bytes transferred by the
+                call. The default is 0
+            top_level (bool, optional): whether the call was not nested in
+                another stage. The default is True
+        '''
+        with self._lock:
+            stats = self._stages.get(name)
+            if stats is None:
+                stats = {"num_calls": 0, "wall_seconds": 0.0, "bytes": 0}
+                self._stages[name] = stats
+
+            stats["num_calls"] += 1
+            stats["wall_seconds"] += seconds
+            stats["bytes"] += num_bytes
+            if top_level:
+                self._staged_seconds += seconds
+
+    def get_stats(self):
+        '''Returns the statistics of the stages recorded so far.
+
+        Returns:
+            a dictionary with the following keys: ``elapsed_seconds`` (the
+            time elapsed since the timer was created), ``unstaged_seconds``,
+            and ``stages``, an ordered dictionary mapping stage names to
+            dictionaries with ``num_calls``, ``wall_seconds``, and ``bytes``
+            keys
+        '''
+        with self._lock:
+            elapsed = time.time() - self._start_time
+            stages = OrderedDict(
+                (name, {
+                    "num_calls": stats["num_calls"],
+                    "wall_seconds": round(stats["wall_seconds"], 3),
+                    "bytes": stats["bytes"],
+                })
+                for name, stats in iteritems(self._stages))
+            return OrderedDict([
+                ("elapsed_seconds", round(elapsed, 3)),
+                ("unstaged_seconds",
+                 round(max(0.0, elapsed - self._staged_seconds), 3)),
+                ("stages", stages),
+            ])
+
+    def get_summary(self):
+        '''Returns a table summarizing the stages recorded so far.
+
+        Returns:
+            a multiline string
+        '''
+        stats = self.get_stats()
+        rows = [
+            (name, str(s["num_calls"]), "%.3f" % s["wall_seconds"],
+             str(s["bytes"]))
+            for name, s in iteritems(stats["stages"])]
+        rows.append(
+            ("(unstaged)", "", "%.3f" % stats["unstaged_seconds"], ""))
+        rows.append(("(elapsed)", "", "%.3f" % stats["elapsed_seconds"], ""))
+
+        header = ("stage", "calls", "wall (s)", "bytes")
+        widths = [
+            max(len(row[idx]) for row in [header] + rows)
+            for idx in range(len(header))]
+        fmt = "%%-%ds  %%%ds  %%%ds  %%%ds" % tuple(widths)
+        lines = [fmt % header, "  ".join("-" * w for w in widths)]
+        lines.extend((fmt % row).rstrip() for row in rows)
+        return "\n".join(lines)
+
+
+class _StageContext(object):
+    '''Context manager that times a stage of a :class:`StageTimer`.'''
+
+    def __init__(self, timer, name, callback):
+        self._timer = timer
+        self._name = name
+        self._callback = callback
+        self._num_bytes = 0
+        self._start_time = None
+        self._top_level = None
+
+    def __enter__(self):
+        local = self._timer._local
+        depth = getattr(local, "depth", 0)
+        self._top_level = depth == 0
+        local.depth = depth + 1
+        self._start_time = time.time()
+        return self
+
+    def __exit__(self, *args):
+        seconds = time.time() - self._start_time
+        self._timer._local.depth -= 1
+        self._timer.record(
+            self._name, seconds, num_bytes=self._num_bytes,
+            top_level=self._top_level)
+        if self._callback is not None:
+            self._callback()
+
+    def add_bytes(self, num_bytes):
+        '''Records bytes transferred by the stage.
+
+        Args:
+            num_bytes (int): the number of bytes
+        '''
+        self._num_bytes += num_bytes
+
+
+class _StatusSnapshot(object):
+    '''A snapshot of the parts of a :class:`TaskStatus` that are published to
+    the platform.
+    '''
+
+    def __init__(self, task_status):
+        self.state = task_status.state
+        if task_status.state == TaskState.FAILED:
+            self.failure_type = task_status.failure_type
+        else:
+            self.failure_type = None
+
+        self.status_str = task_status.to_str()
+        self.timestamp = time.time()
+
+    def publish(self, task_config):
+        api = _get_api_client()
+
+        #
+        # Report job state to platform
+        #
+
+        api.update_job_state(
+            task_config.job_id, self.state, failure_type=self.failure_type)
+
+        if self.state == TaskState.FAILED:
+            logger.info(
+                "Job state %s (%s) posted to API", self.state,
+                self.failure_type)
+        else:
+            logger.info("Job state %s posted to API", self.state)
+
+        #
+        # Post current task status
+        #
+
+        voxu.upload_bytes(
+            self.status_str, api.get_job_status_url(task_config),
+            content_type="application/json")
+
+        logger.info("Task status written to cloud storage")
 
 
 def setup_logging(logfile_path, rotate=True):
@@ -595,16 +1485,25 @@ def download_task_config(task_config_url):
     return TaskConfig.from_str(task_config_str)
 
 
-def make_task_status(task_config):
+def make_task_status(
+        task_config, background_publish=False, message_retention=None):
     '''Makes a :class:`TaskStatus` instance for the given :class:`TaskConfig`.
 
     Args:
         task_config (TaskConfig): a TaskConfig instance describing the task
+        background_publish (bool, optional): whether to publish the status in a
+            background thread via a :class:`BackgroundPublisher`. By default,
+            this is False
+        message_retention (MessageRetentionPolicy, optional): an optional
+            policy for bounding the messages retained by the status. By
+            default, all messages are retained
 
     Returns:
         a :class:`TaskStatus` instance for tracking the progress of the task
     '''
-    task_status = TaskStatus.build_for(task_config)
+    task_status = TaskStatus.build_for(
+        task_config, background_publish=background_publish,
+        message_retention=message_retention)
     logger.info("TaskStatus instance created")
     return task_status
 
@@ -638,9 +1537,12 @@ def pause_task(task_config, task_status, config_path, status_path):
     '''
     task_config.write_json(config_path)
     task_status.write_json(status_path)
+    _close_message_retention(task_status)
 
 
-def resume_task(config_path, status_path, task_status_cls=TaskStatus):
+def resume_task(
+        config_path, status_path, task_status_cls=TaskStatus,
+        background_publish=False, message_retention=None):
     '''Resumes the task specified by the given :class:`TaskConfig` and
     :class:`TaskStatus` by reading them from disk.
 
@@ -649,6 +1551,12 @@ def resume_task(config_path, status_path, task_status_cls=TaskStatus):
         status_path (str): the path from which to read the TaskStatus
         task_status_cls (type, optional): an optional TaskStatus subclass type
             to use to load the TaskStatus
+        background_publish (bool, optional): whether to publish the status in a
+            background thread via a :class:`BackgroundPublisher`. By default,
+            this is False
+        message_retention (MessageRetentionPolicy, optional): an optional
+            policy for bounding the messages retained by the status. By
+            default, all messages are retained
 
     Returns:
         a TaskManager instance
@@ -656,80 +1564,107 @@ def resume_task(config_path, status_path, task_status_cls=TaskStatus):
     task_config = TaskConfig.from_json(config_path)
     task_status = task_status_cls.from_json(status_path)
 
-    publish_callback = make_publish_callback(task_config)
+    publish_callback = make_publish_callback(
+        task_config, background=background_publish)
     task_status.set_publish_callback(publish_callback)
+    task_status.set_message_retention(message_retention)
 
     return TaskManager(task_config, task_status=task_status)
 
 
-def make_publish_callback(task_config):
+def make_publish_callback(task_config, background=False):
     '''Makes a callback function that can be called to publish the status of an
     ongoing task.
 
     Args:
         task_config (TaskConfig): the ID of the underlying job
+        background (bool, optional): whether to return a
+            :class:`BackgroundPublisher` that publishes in a background thread.
+            By default, this is False
 
     Returns:
         a function that can publish a :class:`TaskStatus` instance via the
         syntax :func:`publish_callback(task_status)`
     '''
-    def _publish_status(task_status):
-        api = _get_api_client()
-        #
-        # Report job state to platform
-        #
-
-        if task_status.state == TaskState.FAILED:
-            failure_type = task_status.failure_type
-        else:
-            failure_type = None
-
-        api.update_job_state(
-            task_config.job_id, task_status.state, failure_type=failure_type)
-
-        if task_status.state == TaskState.FAILED:
-            logger.info(
-                "Job state %s (%s) posted to API", task_status.state,
-                failure_type)
-        else:
-            logger.info("Job state %s posted to API", task_status.state)
-
-        #
-        # Post current task status
-        #
-
-        voxu.upload_bytes(
-            task_status.to_str(), api.get_job_status_url(task_config),
-            content_type="application/json")
+    if background:
+        return BackgroundPublisher(task_config)
 
-        logger.info("Task status written to cloud storage")
+    def _publish_status(task_status):
+        _StatusSnapshot(task_status).publish(task_config)
 
     return _publish_status
 
 
-def download_inputs(inputs_dir, task_config, task_status):
+def download_inputs(
+        inputs_dir, task_config, task_status, num_workers=None,
+        num_range_workers=None):
     '''Downloads the task inputs to the specified directory.
 
     Args:
         inputs_dir (str): the directory to which to download the inputs
         task_config (TaskConfig): the TaskConfig for the task
         task_status (TaskStatus): the TaskStatus for the task
+        num_workers (int, optional): the maximum number of inputs to download
+            concurrently. By default, inputs are downloaded serially
+        num_range_workers (int, optional): the number of parallel HTTP Range
+            requests to use to download each input. By default, each input is
+            downloaded via a single request
 
     Returns:
         a dictionary mapping input names to their downloaded filepaths
     '''
     input_paths = {}
     inputs = _get_api_client().get_job_data_urls(task_config)
-    for name, path_config in iteritems(inputs):
-        local_path = voxu.download(path_config, inputs_dir)
+    for name, local_path in voxu.download_many(
+            inputs, inputs_dir, num_workers=num_workers,
+            num_range_workers=num_range_workers):
         input_paths[name] = local_path
         logger.info("Input '%s' downloaded", name)
         task_status.add_message("Input '%s' downloaded" % name)
 
+    _record_download_cache_metrics(task_status)
     return input_paths
 
 
-def parse_parameters(task_config, task_status, data_params_dir=None):
+def download_inputs_progressive(
+        inputs_dir, task_config, task_status, callback=None):
+    '''Starts downloading the task inputs to the specified directory in the
+    background, returning as soon as each download has begun.
+
+    Each input can be read while it is downloaded via
+    ``voxel51.platform.utils.ProgressiveDownload.open``, whose readers block
+    only when they overtake the downloaded bytes, or waited on via
+    ``voxel51.platform.utils.ProgressiveDownload.wait``, which returns the
+    local path of the completed file. This works best for inputs that are
+    read sequentially, such as MP4 videos whose ``moov`` atom precedes their
+    media data.
+
+    Args:
+        inputs_dir (str): the directory to which to download the inputs
+        task_config (TaskConfig): the TaskConfig for the task
+        task_status (TaskStatus): the TaskStatus for the task
+        callback (function, optional): an optional function to call with
+            each ``voxel51.platform.utils.ProgressiveDownload`` when it
+            finishes. It is called from a background thread
+
+    Returns:
+        a dictionary mapping input names to
+        ``voxel51.platform.utils.ProgressiveDownload`` instances
+    '''
+    downloads = {}
+    inputs = _get_api_client().get_job_data_urls(task_config)
+    for name, path_config in iteritems(inputs):
+        downloads[name] = voxu.download_progressive(
+            path_config, inputs_dir, callback=callback)
+        logger.info("Input '%s' download started", name)
+        task_status.add_message("Input '%s' download started" % name)
+
+    return downloads
+
+
+def parse_parameters(
+        task_config, task_status, data_params_dir=None, num_workers=None,
+        num_range_workers=None):
     '''Parses the task parameters.
 
     Any data parameters are downloaded to the specified `data_params_dir`,
@@ -741,12 +1676,19 @@ def parse_parameters(task_config, task_status, data_params_dir=None):
         data_params_dir (str, optional): the directory to which to download
             data parameters, if any. Can be None if no data parameters are
             expected, or if they should be skipped if encountered
+        num_workers (int, optional): the maximum number of data parameters to
+            download concurrently. By default, data parameters are downloaded
+            serially
+        num_range_workers (int, optional): the number of parallel HTTP Range
+            requests to use to download each data parameter. By default, each
+            parameter is downloaded via a single request
 
     Returns:
         a dictionary mapping parameter names to values (builtin parameters) or
         downloaded filepaths (data parameters)
     '''
     parameters = {}
+    data_params = {}
     for name, val in iteritems(task_config.parameters):
         if voxu.RemotePathConfig.is_path_config_dict(val):
             if data_params_dir is None:
@@ -754,15 +1696,19 @@ def parse_parameters(task_config, task_status, data_params_dir=None):
                 task_status.add_message("Skipping data parameter '%s'" % name)
                 continue
 
-            path_config = voxu.RemotePathConfig(val)
-            local_path = voxu.download(path_config, data_params_dir)
-            parameters[name] = local_path
-            logger.info("Parameter '%s' downloaded", name)
-            task_status.add_message("Parameter '%s' downloaded" % name)
+            data_params[name] = voxu.RemotePathConfig(val)
         else:
             logger.info("Found value '%s' for parameter '%s'", val, name)
             parameters[name] = val
 
+    for name, local_path in voxu.download_many(
+            data_params, data_params_dir, num_workers=num_workers,
+            num_range_workers=num_range_workers):
+        parameters[name] = local_path
+        logger.info("Parameter '%s' downloaded", name)
+        task_status.add_message("Parameter '%s' downloaded" % name)
+
+    _record_download_cache_metrics(task_status)
     return parameters
 
 
@@ -776,6 +1722,7 @@ def post_job_metadata_for_image(image_path, task_config, task_status):
         task_status (TaskStatus): the TaskStatus for the task
     '''
     im = voxu.get_metadata_for_image(image_path)
+    _record_metadata_cache_metrics(task_status)
     metadata = {
         "frame_count": 1,
         "duration_seconds": 0,
@@ -794,6 +1741,7 @@ def post_job_metadata_for_video(video_path, task_config, task_status):
         task_status (TaskStatus): the TaskStatus for the task
     '''
     vm = voxu.get_metadata_for_video(video_path)
+    _record_metadata_cache_metrics(task_status)
     metadata = {
         "frame_count": vm.total_frame_count,
         "duration_seconds": vm.duration,
@@ -817,16 +1765,20 @@ def post_job_metadata(metadata, task_config, task_status):
     task_status.add_message("Job metadata posted")
 
 
-def upload_output(output_path, task_config, task_status):
+def upload_output(output_path, task_config, task_status, part_size=None):
     '''Uploads the given task output.
 
     Args:
         output_path (str): the path to the output file to upload
         task_config (TaskConfig): the TaskConfig for the task
         task_status (TaskStatus): the TaskStatus for the task
+        part_size (int, optional): a part size, in bytes. If provided, the
+            output is uploaded in parts of this size via
+            :func:`voxel51.platform.utils.upload_chunked`. By default, the
+            output is uploaded via a single request
     '''
     output_url = _get_api_client().get_job_output_url(task_config)
-    voxu.upload(output_path, output_url)
+    voxu.upload(output_path, output_url, part_size=part_size)
     logger.info("Output uploaded to %s", output_url)
     task_status.add_message("Output published")
 
@@ -858,20 +1810,26 @@ def complete_task(task_config, task_status, logfile_path=None):
     logger.info("Task complete")
     task_status.complete()
     task_status.publish()
+    task_status.flush()
+    _close_message_retention(task_status)
     if logfile_path:
         upload_logfile(logfile_path, task_config)
 
 
-def upload_logfile(logfile_path, task_config):
+def upload_logfile(logfile_path, task_config, part_size=None):
     '''Uploads the given logfile for the task.
 
     Args:
         logfile_path (str): the path to a logfile to upload
         task_config (TaskConfig): the TaskConfig for the task
+        part_size (int, optional): a part size, in bytes. If provided, the
+            logfile is uploaded in parts of this size via
+            :func:`voxel51.platform.utils.upload_chunked`. By default, the
+            logfile is uploaded via a single request
     '''
     logfile_url = _get_api_client().get_job_log_url(task_config)
     logger.info("Uploading logfile to %s", str(logfile_url))
-    voxu.upload(logfile_path, logfile_url)
+    voxu.upload(logfile_path, logfile_url, part_size=part_size)
 
 
 def fail_gracefully(
@@ -900,9 +1858,12 @@ def fail_gracefully(
     try:
         # Try to publish the task status
         task_status.publish()
+        task_status.flush()
     except:
         logger.error("Failed to publish task status", exc_info=sys.exc_info())
 
+    _close_message_retention(task_status)
+
     try:
         # Try to upload the logfile, if requested
         if logfile_path:
@@ -945,6 +1906,26 @@ def fail_epically(logfile_path=None):
         logger.error("Failed to upload logfile", exc_info=sys.exc_info())
 
 
+def _close_message_retention(task_status):
+    if task_status.message_retention is not None:
+        task_status.message_retention.close()
+
+
+def _get_total_size(paths):
+    return sum(os.path.getsize(path) for path in paths if os.path.isfile(path))
+
+
+def _record_download_cache_metrics(task_status):
+    cache = voxu.get_download_cache()
+    if cache is not None:
+        task_status.record_metrics("download_cache", cache.get_stats())
+
+
+def _record_metadata_cache_metrics(task_status):
+    task_status.record_metrics(
+        "metadata_cache", voxu.get_metadata_cache().get_stats())
+
+
 def _get_api_client():
     global _API_CLIENT  # pylint: disable=global-statement
     if _API_CLIENT is None:
@@ -17,19 +17,153 @@ from builtins import *
 # pragma pylint: enable=unused-wildcard-import
 # pragma pylint: enable=wildcard-import
 
+import calendar
+from collections import OrderedDict
+import errno
+import hashlib
+import importlib
+import io
 import json
+import logging
+from multiprocessing.pool import ThreadPool
 import os
+import re
+import shutil
+import struct
+import threading
+import time
+import types
+import uuid
 
+try:
+    import urllib.parse as urlparse  # Python 3
+except ImportError:
+    import urlparse  # Python 2
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows
+
+import requests
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.poolmanager import PoolManager
 
 from eta.core.config import Config, ConfigError
-import eta.core.image as etai
-import eta.core.storage as etas
-import eta.core.video as etav
+import eta.core.utils as etau
+
+import voxel51.platform.config as voxc
+
+
+def lazy_import(module_name):
+    '''Returns a proxy for the given module that imports the module when one
+    of its attributes is first accessed.
+
+    Use this for heavy modules that are only needed by some code paths, so
+    that they do not add to the import time of the SDK.
+
+    Args:
+        module_name (str): the fully-qualified name of the module
+
+    Returns:
+        a module proxy
+    '''
+    return _LazyModule(module_name)
+
+
+class _LazyModule(types.ModuleType):
+
+    def __init__(self, module_name):
+        super(_LazyModule, self).__init__(module_name)
+        self._module = None
+
+    def __getattr__(self, name):
+        # Only called when `name` is not found the usual way
+        if self._module is None:
+            self._module = importlib.import_module(self.__name__)
+            self.__dict__.update(self._module.__dict__)
+
+        return getattr(self._module, name)
+
+
+# These pull in OpenCV, etc., and are only needed to compute input metadata
+etai = lazy_import("eta.core.image")
+etav = lazy_import("eta.core.video")
+
+
+_HTTP_SESSION = None
+_HTTP_SESSION_KWARGS = {}
+_HTTP_SESSION_LOCK = threading.Lock()
+
+_DOWNLOAD_CACHE = None
+_DOWNLOAD_CACHE_CONFIGURED = False
+_DOWNLOAD_CACHE_LOCK = threading.Lock()
+
+_METADATA_CACHE = None
+_METADATA_CACHE_LOCK = threading.Lock()
+
+#
+# The default size, in bytes, of the byte ranges fetched by
+# :func:`download_ranged`
+#
+DEFAULT_RANGE_SIZE = 16 * 1024 * 1024
+
+#
+# The default size, in bytes, of the parts uploaded by :func:`upload_chunked`
+#
+DEFAULT_PART_SIZE = 16 * 1024 * 1024
+
+#
+# Resumable upload sessions require all parts except the last to be a multiple
+# of this many bytes
+#
+_PART_SIZE_MULTIPLE = 256 * 1024
+
+#
+# The default maximum size, in bytes, of a :class:`DownloadCache`
+#
+DEFAULT_DOWNLOAD_CACHE_SIZE = 10 * 1024 ** 3
+
+#
+# The default maximum number of entries in a :class:`MetadataCache`
+#
+DEFAULT_METADATA_CACHE_SIZE = 1024
+
+#
+# The maximum size, in bytes, of a ``moov`` atom read by
+# :func:`read_video_header`
+#
+_MAX_MOOV_SIZE = 64 * 1024 * 1024
+
+#
+# The atoms that may begin an MP4 or MOV file
+#
+_MP4_TOP_LEVEL_ATOMS = {
+    b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pnot"}
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+#
+# The number of channels of PNG color types and JPEG component counts whose
+# decoded channels do not depend on the decoder
+#
+_PNG_CHANNELS = {0: 1, 2: 3, 6: 4}
+_JPEG_CHANNELS = {1: 1, 3: 3}
+
+#
+# The chunk size, in bytes, used when streaming responses to disk
+#
+_STREAM_CHUNK_SIZE = 1024 * 1024
 
+#
+# The chunk size, in bytes, by which the watermark of a
+# :class:`ProgressiveDownload` advances. Smaller than ``_STREAM_CHUNK_SIZE`` so
+# that blocked readers are woken promptly
+#
+_PROGRESSIVE_CHUNK_SIZE = 256 * 1024
 
-_HTTP_CLIENT = None
+
+logger = logging.getLogger(__name__)
 
 
 class RemotePathConfig(Config):
@@ -67,29 +201,171 @@ class RemotePathConfig(Config):
         '''
         return cls({"signed-url": signed_url})
 
+    def get_expiration(self):
+        '''Gets the expiration time of the signed URL.
+
+        See :func:`get_signed_url_expiration` for details.
+
+        Returns:
+            the expiration time, in seconds since the epoch, or None if it
+            could not be determined
+        '''
+        return get_signed_url_expiration(self.signed_url)
+
+
+def get_signed_url_expiration(signed_url):
+    '''Gets the expiration time of the given signed URL from its query
+    parameters.
+
+    The following signature formats are supported:
+
+    - Google Cloud Storage and Amazon S3 V2 signatures (``Expires``)
+    - Google Cloud Storage V4 signatures (``X-Goog-Date`` and
+      ``X-Goog-Expires``)
+    - Amazon S3 V4 signatures (``X-Amz-Date`` and ``X-Amz-Expires``)
+    - Azure shared access signatures (``se``)
+
+    Args:
+        signed_url (str): a signed URL
+
+    Returns:
+        the expiration time, in seconds since the epoch, or None if it could
+        not be determined
+    '''
+    query = urlparse.parse_qs(urlparse.urlparse(signed_url).query)
+    params = {k.lower(): v[0] for k, v in query.items() if v}
+    try:
+        if "expires" in params:
+            return int(params["expires"])
+
+        for prefix in ("x-goog-", "x-amz-"):
+            if prefix + "date" in params and prefix + "expires" in params:
+                start = _parse_utc_time(
+                    params[prefix + "date"], "%Y%m%dT%H%M%SZ")
+                return start + int(params[prefix + "expires"])
 
-def get_metadata_for_video(video_path):
+        if "se" in params:
+            return _parse_utc_time(params["se"][:19], "%Y-%m-%dT%H:%M:%S")
+    except ValueError:
+        pass
+
+    return None
+
+
+def _parse_utc_time(time_str, fmt):
+    return calendar.timegm(time.strptime(time_str, fmt))
+
+
+def get_metadata_for_video(video_path, use_cache=True):
     '''Gets metadata about the given video.
 
+    The metadata of MP4 and MOV videos is read directly from their headers
+    via :func:`read_video_header`. Other videos are probed via ``ffprobe``.
+
     Args:
         video_path (str): the path to the video
+        use_cache (bool, optional): whether to serve the metadata from the
+            cache returned by :func:`get_metadata_cache`. By default, this is
+            True
 
     Returns:
         an ``eta.core.video.VideoMetadata`` instance describing the video
     '''
-    return etav.VideoMetadata.build_for(video_path)
+    if use_cache:
+        return get_metadata_cache().get_video_metadata(video_path)
 
+    return _build_video_metadata(video_path)
 
-def get_metadata_for_image(image_path):
+
+def get_metadata_for_image(image_path, use_cache=True):
     '''Gets metadata about the given image.
 
+    The metadata of PNG, JPEG, and BMP images is read directly from their
+    headers via :func:`read_image_header`. Other images are decoded.
+
     Args:
         image_path (str): the path to the image
+        use_cache (bool, optional): whether to serve the metadata from the
+            cache returned by :func:`get_metadata_cache`. By default, this is
+            True
 
     Returns:
         an ``eta.core.image.ImageMetadata`` instance describing the image
     '''
-    return etai.ImageMetadata.build_for(image_path)
+    if use_cache:
+        return get_metadata_cache().get_image_metadata(image_path)
+
+    return _build_image_metadata(image_path)
+
+
+def read_video_header(video_path):
+    '''Reads metadata about the given MP4 or MOV video from its ``moov``
+    atom, without spawning ``ffprobe`` or decoding any frames.
+
+    The metadata describes the first video track of the file, with the
+    fields computed as ``eta.core.video.VideoMetadata.build_for`` computes
+    them from the output of ``ffprobe``.
+
+    Args:
+        video_path (str): the path to the video
+
+    Returns:
+        an ``eta.core.video.VideoMetadata`` instance describing the video, or
+        None if the video is not an MP4 or MOV file whose header can be read,
+        e.g., because it is fragmented
+    '''
+    with open(video_path, "rb") as f:
+        try:
+            track = _read_mp4_video_track(f)
+        except (KeyError, ValueError, struct.error):
+            track = None
+
+    if track is None:
+        return None
+
+    width, height, frame_count, duration, encoding_str = track
+    return etav.VideoMetadata(
+        frame_size=(width, height),
+        frame_rate=frame_count / duration,
+        total_frame_count=frame_count,
+        duration=duration,
+        size_bytes=os.path.getsize(video_path),
+        mime_type=etau.guess_mime_type(video_path),
+        encoding_str=encoding_str,
+    )
+
+
+def read_image_header(image_path):
+    '''Reads metadata about the given PNG, JPEG, or BMP image from its
+    header, without decoding the image.
+
+    The number of channels is reported as ``eta.core.image.read`` would load
+    the image with its alpha channel included. Images whose channels depend
+    on the decoder (e.g., palette PNGs or CMYK JPEGs) are not supported.
+
+    Args:
+        image_path (str): the path to the image
+
+    Returns:
+        an ``eta.core.image.ImageMetadata`` instance describing the image, or
+        None if the image is not a supported image whose header can be read
+    '''
+    with open(image_path, "rb") as f:
+        try:
+            header = _read_image_header(f)
+        except (ValueError, struct.error):
+            header = None
+
+    if header is None:
+        return None
+
+    width, height, num_channels = header
+    return etai.ImageMetadata(
+        frame_size=(width, height),
+        num_channels=num_channels,
+        size_bytes=os.path.getsize(image_path),
+        mime_type=etau.guess_mime_type(image_path),
+    )
 
 
 def get_download_path(path_config, output_dir):
@@ -103,26 +379,236 @@ def get_download_path(path_config, output_dir):
     Returns:
         the local path for the download
     '''
-    filename = etas.HTTPStorageClient.get_filename(path_config.signed_url)
+    filename = _get_filename(path_config.signed_url)
     return os.path.join(output_dir, filename)
 
 
-def download(path_config, output_dir):
+def download(
+        path_config, output_dir, num_range_workers=None, use_cache=True,
+        resumable=True):
     '''Downloads the specified file to the given directory.
 
+    If a download cache has been configured (see :func:`get_download_cache`),
+    the file is served from the cache when possible. Otherwise, the file is
+    downloaded via :func:`download_resumable` by default, so an interrupted
+    download of the file to the same directory, e.g., by a task that was
+    paused and resumed, is resumed rather than restarted.
+
     Args:
         path_config (RemotePathConfig): a RemotePathConfig describing the file
             to download
         output_dir (str): the directory to download the file to
+        num_range_workers (int, optional): the number of parallel HTTP Range
+            requests to use to download the file. If provided, the file is
+            downloaded via :func:`download_ranged`. By default, the file is
+            downloaded via a single GET request
+        use_cache (bool, optional): whether to use the download cache, if one
+            has been configured. By default, this is True
+        resumable (bool, optional): whether to download the file such that an
+            interrupted download can be resumed. By default, this is True
 
     Returns:
         the local path to the downloaded file
     '''
-    local_path = get_download_path(path_config, output_dir)
-    _get_http_client().download(path_config.signed_url, local_path)
+    cache = get_download_cache() if use_cache else None
+    if cache is not None:
+        return cache.download(
+            path_config.signed_url, output_dir,
+            num_range_workers=num_range_workers)
+
+    url = path_config.signed_url
+    if not resumable:
+        local_path = get_download_path(path_config, output_dir)
+        _fetch_to_file(url, local_path, num_range_workers)
+        return local_path
+
+    res = get_http_session().head(url)
+    local_path = os.path.join(output_dir, _get_filename_from_head(url, res))
+    _download_resumable(url, local_path, res, num_range_workers, None)
     return local_path
 
 
+def download_many(
+        path_configs, output_dir, num_workers=None, num_range_workers=None):
+    '''Downloads the specified files to the given directory, optionally using
+    a pool of worker threads to perform the downloads concurrently.
+
+    Args:
+        path_configs (dict): a dictionary mapping names to RemotePathConfig
+            instances describing the files to download
+        output_dir (str): the directory to download the files to
+        num_workers (int, optional): the maximum number of downloads to
+            perform concurrently. By default, the files are downloaded serially
+        num_range_workers (int, optional): the number of parallel HTTP Range
+            requests to use to download each file. See :func:`download` for
+            details
+
+    Returns:
+        an iterator that emits ``(name, local_path)`` tuples as each download
+        completes
+    '''
+    def _download(item):
+        name, path_config = item
+        local_path = download(
+            path_config, output_dir, num_range_workers=num_range_workers)
+        return name, local_path
+
+    items = list(path_configs.items())
+    if not num_workers or num_workers <= 1 or len(items) <= 1:
+        for item in items:
+            yield _download(item)
+        return
+
+    pool = ThreadPool(min(num_workers, len(items)))
+    try:
+        for name, local_path in pool.imap_unordered(_download, items):
+            yield name, local_path
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def download_progressive(path_config, output_dir, callback=None):
+    '''Starts downloading the specified file to the given directory in a
+    background thread, returning as soon as the server has begun sending it.
+
+    The returned :class:`ProgressiveDownload` can be read via
+    :meth:`ProgressiveDownload.open` while the download is in progress, so
+    that processing can overlap with the download. The download cache is not
+    used, and the file is downloaded via a single GET request.
+
+    Args:
+        path_config (RemotePathConfig): a RemotePathConfig describing the file
+            to download
+        output_dir (str): the directory to download the file to
+        callback (function, optional): an optional function to call with the
+            :class:`ProgressiveDownload` when it finishes, successfully or
+            not. It is called from the background thread
+
+    Returns:
+        a :class:`ProgressiveDownload`
+
+    Raises:
+        requests.exceptions.HTTPError: if the download could not be started
+    '''
+    local_path = get_download_path(path_config, output_dir)
+    return ProgressiveDownload(
+        path_config.signed_url, local_path, callback=callback).start()
+
+
+def download_resumable(url, local_path, num_workers=None, range_size=None):
+    '''Downloads the file at the given URL such that, if the download is
+    interrupted, a later call resumes it rather than starting over.
+
+    The file is written to ``<local_path>.part`` alongside a
+    ``<local_path>.part.json`` manifest that records the byte ranges that
+    have been written, along with the ``ETag`` and size of the remote file.
+    Progress is recorded every ``range_size`` bytes. If a manifest for the
+    same remote file exists, only its missing ranges are fetched, via HTTP
+    Range requests. The URL may be a freshly signed URL for the same object,
+    e.g., one returned by
+    ``voxel51.platform.api.API.get_job_data_urls`` after a task is resumed.
+    When the download completes, the partial file is renamed to
+    ``local_path`` and the manifest is deleted.
+
+    If the remote file has changed since the partial file was written, or if
+    the server does not report an ``ETag`` and size for the file, the file is
+    downloaded from scratch.
+
+    Args:
+        url (str): the (signed) URL of the file to download
+        local_path (str): the path to which to write the downloaded file
+        num_workers (int, optional): the maximum number of ranges to download
+            concurrently. By default, each missing range is downloaded via a
+            single request
+        range_size (int, optional): the size, in bytes, of the ranges to
+            request concurrently and the interval at which progress is
+            recorded. By default, ``DEFAULT_RANGE_SIZE`` is used
+
+    Raises:
+        ``requests.exceptions.HTTPError`` if a request failed
+        ``IOError`` if the server returned an unexpected range
+    '''
+    res = get_http_session().head(url)
+    _download_resumable(url, local_path, res, num_workers, range_size)
+
+
+def download_ranged(url, local_path, range_size=None, num_workers=4):
+    '''Downloads the file at the given URL via parallel HTTP Range requests.
+
+    The first range is requested immediately; if the server responds with
+    ``206 Partial Content``, the total size of the file is read from the
+    ``Content-Range`` header, the local file is preallocated, and the
+    remaining ranges are fetched concurrently over the shared HTTP session
+    (see :func:`get_http_session`) and written in place. If the server does
+    not honor the Range request, the full response body is streamed to disk
+    instead, so this function is equivalent to a single GET request in that
+    case.
+
+    For connections to be reused across ranges, ``num_workers`` should not
+    exceed the ``pool_maxsize`` of the shared session.
+
+    Args:
+        url (str): the URL of the file to download
+        local_path (str): the path to which to write the downloaded file
+        range_size (int, optional): the size, in bytes, of each range to
+            request. By default, ``DEFAULT_RANGE_SIZE`` is used
+        num_workers (int, optional): the maximum number of ranges to download
+            concurrently. The default is 4
+
+    Raises:
+        ``requests.exceptions.HTTPError`` if a request failed
+        ``IOError`` if the server returned an unexpected range
+    '''
+    range_size = range_size or DEFAULT_RANGE_SIZE
+    num_workers = max(1, num_workers or 1)
+
+    etau.ensure_basedir(local_path)
+    session = get_http_session()
+    res = _get_range(session, url, 0, range_size - 1)
+    if res.status_code == 416:
+        # Requested range not satisfiable, i.e., the file is empty
+        res.close()
+        open(local_path, "wb").close()
+        return
+
+    res.raise_for_status()
+    if res.status_code != 206:
+        # The server ignored the Range header, so we got the whole file
+        with open(local_path, "wb") as f:
+            _write_response(res, f)
+        return
+
+    _, _, total_size = _parse_content_range(res)
+    with open(local_path, "wb") as f:
+        f.truncate(total_size)
+
+    ranges = [
+        (start, min(start + range_size, total_size) - 1)
+        for start in range(range_size, total_size, range_size)]
+
+    def _download_range(byte_range):
+        start, end = byte_range
+        _download_range_to_file(session, url, local_path, start, end)
+
+    pool = ThreadPool(min(num_workers, len(ranges))) if ranges else None
+    try:
+        if pool is not None:
+            result = pool.map_async(_download_range, ranges)
+
+        # Write the first range while the others are in flight
+        _write_range_response(res, local_path, 0)
+
+        if pool is not None:
+            result.get()
+            pool.close()
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
 def download_bytes(path_config):
     '''Downloads the specified file as bytes.
 
@@ -133,18 +619,117 @@ def download_bytes(path_config):
     Returns:
         the bytes of the downloaded file
     '''
-    return _get_http_client().download_bytes(path_config.signed_url)
+    res = get_http_session().get(path_config.signed_url)
+    res.raise_for_status()
+    return res.content
 
 
-def upload(local_path, path_config):
+def upload(local_path, path_config, part_size=None):
     '''Uploads the given file to the specified location.
 
     Args:
         local_path (str): the path to the file to upload
         path_config (RemotePathConfig): a RemotePathConfig describing where to
             upload the file
+        part_size (int, optional): a part size, in bytes. If provided, the file
+            is uploaded in parts of this size via :func:`upload_chunked`. By
+            default, the file is uploaded via a single request
+    '''
+    if part_size:
+        upload_chunked(local_path, path_config.signed_url, part_size=part_size)
+    else:
+        with open(local_path, "rb") as f:
+            res = get_http_session().put(path_config.signed_url, data=f)
+        res.raise_for_status()
+
+
+def upload_chunked(local_path, url, part_size=None, num_retries=3):
+    '''Uploads the given file to the given URL in fixed-size parts via a
+    resumable upload session.
+
+    The session is started by POSTing to the URL with an
+    ``x-goog-resumable: start`` header. Each part is then streamed from disk
+    and PUT to the session URI with a ``Content-Range`` header, so the file is
+    never read into memory. When a part fails with a retryable error, the
+    number of bytes committed by the server is queried and the upload resumes
+    from there, up to ``num_retries`` times per part.
+
+    If the URL does not support resumable sessions, the file is instead
+    uploaded via a single streaming PUT request.
+
+    Args:
+        local_path (str): the path to the file to upload
+        url (str): the URL to which to upload the file
+        part_size (int, optional): the size, in bytes, of each part. This is
+            rounded down to a multiple of 256KB, which resumable sessions
+            require. By default, ``DEFAULT_PART_SIZE`` is used
+        num_retries (int, optional): the maximum number of times to retry each
+            part. The default is 3
+
+    Raises:
+        ``requests.exceptions.HTTPError`` if the upload failed
     '''
-    _get_http_client().upload(local_path, path_config.signed_url)
+    part_size = max(
+        _PART_SIZE_MULTIPLE,
+        (part_size or DEFAULT_PART_SIZE) // _PART_SIZE_MULTIPLE *
+        _PART_SIZE_MULTIPLE)
+    total_size = os.path.getsize(local_path)
+
+    session = get_http_session()
+    res = session.post(url, headers={"x-goog-resumable": "start"})
+    session_url = res.headers.get("Location")
+    if not res.ok or not session_url:
+        logger.debug(
+            "Unable to start resumable upload session (%d); uploading '%s' "
+            "via a single request", res.status_code, local_path)
+        with open(local_path, "rb") as f:
+            res = session.put(url, data=f)
+        res.raise_for_status()
+        return
+
+    offset = 0
+    num_failures = 0
+    while True:
+        end = min(offset + part_size, total_size)
+        error = None
+        try:
+            res = _upload_part(
+                session, session_url, local_path, offset, end, total_size)
+            if res.status_code in (200, 201):
+                return
+
+            if res.status_code == 308:
+                committed = _get_committed_bytes(res)
+                if committed > offset:
+                    offset = committed
+                    num_failures = 0
+                    continue
+
+                # The server did not commit any of the part, so count this as
+                # a failure rather than resending it indefinitely
+                error = requests.exceptions.HTTPError(
+                    "No bytes of the part were committed", response=res)
+            elif not _is_retryable(res):
+                res.raise_for_status()
+                raise requests.exceptions.HTTPError(
+                    "Unexpected status %d while uploading bytes %d-%d" % (
+                        res.status_code, offset, end - 1), response=res)
+            else:
+                error = "HTTP %d" % res.status_code
+        except requests.exceptions.ConnectionError as e:
+            res = None
+            error = e
+
+        num_failures += 1
+        if num_failures > num_retries:
+            if res is not None:
+                res.raise_for_status()
+            raise error
+
+        logger.warning(
+            "Failed to upload bytes %d-%d of '%s' (%s); retrying", offset,
+            end - 1, local_path, error)
+        offset = _query_committed_bytes(session, session_url, total_size)
 
 
 def upload_bytes(bytes_str, path_config, content_type=None):
@@ -155,10 +740,267 @@ def upload_bytes(bytes_str, path_config, content_type=None):
         path_config (RemotePathConfig): a RemotePathConfig describing where to
             upload the bytes
         content_type (str, optional): a string specifying the content type of
-            the file being uploaded
+            the file being uploaded. Note that this is not included in the
+            request, since signed URLs reject ``Content-Type`` headers that
+            were not part of their signatures
+    '''
+    if not isinstance(bytes_str, bytes):
+        bytes_str = bytes_str.encode("utf-8")
+
+    res = get_http_session().put(path_config.signed_url, data=bytes_str)
+    res.raise_for_status()
+
+
+class MultipartFileStream(object):
+    '''A file-like ``multipart/form-data`` request body that streams a file
+    from disk.
+
+    Passing an instance of this class as the ``data`` of a ``requests``
+    request uploads the file without reading it into memory, unlike the
+    ``files`` argument of ``requests``, which encodes the entire body in
+    memory.
+
+    Attributes:
+        boundary (str): the multipart boundary
+        content_type (str): the ``Content-Type`` header for the request
+    '''
+
+    def __init__(self, path, field_name="file", mime_type=None):
+        '''Creates a MultipartFileStream instance.
+
+        Args:
+            path (str): the path to the file to upload
+            field_name (str, optional): the name of the form field. The
+                default is "file"
+            mime_type (str, optional): the MIME type of the file. The default
+                is "application/octet-stream"
+        '''
+        self.boundary = uuid.uuid4().hex
+        self.content_type = "multipart/form-data; boundary=%s" % self.boundary
+
+        filename = os.path.basename(path)
+        header = (
+            "--%s\r\nContent-Disposition: form-data; name=\"%s\"; "
+            "filename=\"%s\"\r\nContent-Type: %s\r\n\r\n" % (
+                self.boundary, field_name, filename,
+                mime_type or "application/octet-stream")).encode("utf-8")
+        footer = ("\r\n--%s--\r\n" % self.boundary).encode("utf-8")
+
+        self._streams = [
+            io.BytesIO(header), open(path, "rb"), io.BytesIO(footer)]
+        self._remaining = len(header) + os.path.getsize(path) + len(footer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self._remaining
+
+    def read(self, size=-1):
+        '''Reads up to ``size`` bytes from the stream.
+
+        Args:
+            size (int, optional): the maximum number of bytes to read. By
+                default, the remainder of the stream is read
+
+        Returns:
+            the bytes read, which are empty when the stream is exhausted
+        '''
+        if size is None or size < 0:
+            size = self._remaining
+
+        chunks = []
+        while size > 0 and self._streams:
+            chunk = self._streams[0].read(size)
+            if not chunk:
+                self._streams.pop(0).close()
+                continue
+
+            chunks.append(chunk)
+            size -= len(chunk)
+
+        data = b"".join(chunks)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        '''Closes the stream.'''
+        for stream in self._streams:
+            stream.close()
+
+        self._streams = []
+
+
+def configure_http_session(
+        pool_connections=10, pool_maxsize=10, pool_block=False,
+        keep_alive=True, adapter=None):
+    '''Configures the shared HTTP session used by the SDK for all Platform
+    API requests and signed URL transfers.
+
+    Any existing shared session is closed, and a new session is created with
+    the given settings the next time :func:`get_http_session` is called.
+
+    Args:
+        pool_connections (int, optional): the number of hosts for which to
+            cache connection pools. The default is 10
+        pool_maxsize (int, optional): the maximum number of connections to
+            keep alive per host. The default is 10
+        pool_block (bool, optional): whether to block when all connections to
+            a host are in use, making ``pool_maxsize`` a hard limit on the
+            number of concurrent connections per host, rather than opening
+            additional connections that are discarded after use. By default,
+            this is False
+        keep_alive (bool, optional): whether to keep connections alive between
+            requests. By default, this is True
+        adapter (PooledHTTPAdapter, optional): a custom adapter to mount in
+            the session, e.g., a :class:`SourcePortAdapter`. If provided, the
+            pool arguments are ignored in favor of the adapter's settings
+    '''
+    # pylint: disable=global-statement
+    global _HTTP_SESSION, _HTTP_SESSION_KWARGS
+    with _HTTP_SESSION_LOCK:
+        if _HTTP_SESSION is not None:
+            _HTTP_SESSION.close()
+            _HTTP_SESSION = None
+
+        _HTTP_SESSION_KWARGS = {
+            "pool_connections": pool_connections,
+            "pool_maxsize": pool_maxsize,
+            "pool_block": pool_block,
+            "keep_alive": keep_alive,
+            "adapter": adapter,
+        }
+
+
+def get_http_session():
+    '''Gets the shared HTTP session used by the SDK for all Platform API
+    requests and signed URL transfers.
+
+    The session is created on first use with the settings provided to
+    :func:`configure_http_session`, if any.
+
+    Returns:
+        a ``requests.Session``
+    '''
+    global _HTTP_SESSION  # pylint: disable=global-statement
+    with _HTTP_SESSION_LOCK:
+        if _HTTP_SESSION is None:
+            _HTTP_SESSION = _make_http_session(**_HTTP_SESSION_KWARGS)
+        return _HTTP_SESSION
+
+
+def get_connection_stats():
+    '''Returns connection reuse statistics for the shared HTTP session.
+
+    Returns:
+        a dictionary of statistics as returned by
+        :func:`PooledHTTPAdapter.get_stats`, or None if the session has not
+        been created or has no :class:`PooledHTTPAdapter` mounted
+    '''
+    with _HTTP_SESSION_LOCK:
+        session = _HTTP_SESSION
+
+    if session is None:
+        return None
+
+    adapter = session.get_adapter("https://")
+    if not isinstance(adapter, PooledHTTPAdapter):
+        return None
+
+    return adapter.get_stats()
+
+
+def configure_download_cache(cache_dir, max_size=None):
+    '''Configures the on-disk cache used by :func:`download`.
+
+    The cache is disabled by default. It can also be enabled by setting the
+    ``voxel51.platform.config.DOWNLOAD_CACHE_DIR_ENV_VAR`` environment
+    variable and, optionally, the
+    ``voxel51.platform.config.DOWNLOAD_CACHE_SIZE_ENV_VAR`` environment
+    variable before the first download.
+
+    Args:
+        cache_dir (str): the directory in which to store cached files, which
+            may be shared by concurrent tasks on the same machine, or None to
+            disable the cache
+        max_size (int, optional): the maximum size, in bytes, of the cache.
+            By default, ``DEFAULT_DOWNLOAD_CACHE_SIZE`` is used
+    '''
+    # pylint: disable=global-statement
+    global _DOWNLOAD_CACHE, _DOWNLOAD_CACHE_CONFIGURED
+    with _DOWNLOAD_CACHE_LOCK:
+        if cache_dir:
+            _DOWNLOAD_CACHE = DownloadCache(cache_dir, max_size=max_size)
+        else:
+            _DOWNLOAD_CACHE = None
+
+        _DOWNLOAD_CACHE_CONFIGURED = True
+
+
+def get_download_cache():
+    '''Gets the on-disk cache used by :func:`download`, if any.
+
+    If :func:`configure_download_cache` has not been called, the cache is
+    configured from the environment on first use.
+
+    Returns:
+        a :class:`DownloadCache`, or None if downloads are not cached
+    '''
+    # pylint: disable=global-statement
+    global _DOWNLOAD_CACHE, _DOWNLOAD_CACHE_CONFIGURED
+    with _DOWNLOAD_CACHE_LOCK:
+        if not _DOWNLOAD_CACHE_CONFIGURED:
+            cache_dir = os.environ.get(voxc.DOWNLOAD_CACHE_DIR_ENV_VAR)
+            if cache_dir:
+                max_size = os.environ.get(voxc.DOWNLOAD_CACHE_SIZE_ENV_VAR)
+                _DOWNLOAD_CACHE = DownloadCache(
+                    cache_dir, max_size=int(max_size) if max_size else None)
+
+            _DOWNLOAD_CACHE_CONFIGURED = True
+
+        return _DOWNLOAD_CACHE
+
+
+def configure_metadata_cache(max_entries=None, path=None):
+    '''Configures the cache used by :func:`get_metadata_for_video` and
+    :func:`get_metadata_for_image`.
+
+    By default, metadata is cached in memory only. It can also be persisted
+    by setting the ``voxel51.platform.config.METADATA_CACHE_PATH_ENV_VAR``
+    environment variable before metadata is first computed.
+
+    Args:
+        max_entries (int, optional): the maximum number of entries in the
+            cache. By default, ``DEFAULT_METADATA_CACHE_SIZE`` is used
+        path (str, optional): the path to a JSON file in which to persist the
+            cache, e.g., alongside the files written when pausing a task so
+            that the resumed task does not re-probe its inputs
+    '''
+    global _METADATA_CACHE  # pylint: disable=global-statement
+    with _METADATA_CACHE_LOCK:
+        _METADATA_CACHE = MetadataCache(max_entries=max_entries, path=path)
+
+
+def get_metadata_cache():
+    '''Gets the cache used by :func:`get_metadata_for_video` and
+    :func:`get_metadata_for_image`.
+
+    If :func:`configure_metadata_cache` has not been called, the cache is
+    configured from the environment on first use.
+
+    Returns:
+        a :class:`MetadataCache`
     '''
-    _get_http_client().upload_bytes(
-        bytes_str, path_config.signed_url, content_type=content_type)
+    global _METADATA_CACHE  # pylint: disable=global-statement
+    with _METADATA_CACHE_LOCK:
+        if _METADATA_CACHE is None:
+            _METADATA_CACHE = MetadataCache(
+                path=os.environ.get(voxc.METADATA_CACHE_PATH_ENV_VAR))
+
+        return _METADATA_CACHE
 
 
 def load_json(str_or_bytes):
@@ -177,7 +1019,70 @@ def load_json(str_or_bytes):
         return json.loads(str_or_bytes.decode("utf-8"))
 
 
-class SourcePortAdapter(HTTPAdapter):
+class PooledHTTPAdapter(HTTPAdapter):
+    '''Custom :class:`requests.adapters.HTTPAdapter` that records statistics
+    about the reuse of the connections in its pools.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        '''Creates a PooledHTTPAdapter instance.
+
+        Args:
+            *args: valid positional arguments for
+                :class:`requests.adapters.HTTPAdapter`
+            **kwargs: valid keyword arguments for
+                :class:`requests.adapters.HTTPAdapter`
+        '''
+        self._stats_lock = threading.Lock()
+        self._num_disposed_connections = 0
+        self._num_disposed_requests = 0
+        super(PooledHTTPAdapter, self).__init__(*args, **kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **kwargs):
+        self.poolmanager = PoolManager(
+            num_pools=connections, maxsize=maxsize, block=block, **kwargs)
+
+        # Record the statistics of pools evicted from the pool manager
+        pools = self.poolmanager.pools
+        dispose_func = pools.dispose_func
+
+        def _dispose(pool):
+            with self._stats_lock:
+                self._num_disposed_connections += pool.num_connections
+                self._num_disposed_requests += pool.num_requests
+            dispose_func(pool)
+
+        pools.dispose_func = _dispose
+
+    def get_stats(self):
+        '''Returns statistics about the connections made by the adapter.
+
+        Returns:
+            a dictionary with the following keys: ``num_requests`` (the number
+            of requests sent), ``num_connections`` (the number of new
+            connections opened), ``num_reused`` (the number of requests that
+            reused an existing connection), and ``reuse_ratio``
+        '''
+        pools = self.poolmanager.pools
+        with self._stats_lock:
+            num_connections = self._num_disposed_connections
+            num_requests = self._num_disposed_requests
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    num_connections += pool.num_connections
+                    num_requests += pool.num_requests
+
+        num_reused = max(0, num_requests - num_connections)
+        return {
+            "num_requests": num_requests,
+            "num_connections": num_connections,
+            "num_reused": num_reused,
+            "reuse_ratio": num_reused / num_requests if num_requests else None,
+        }
+
+
+class SourcePortAdapter(PooledHTTPAdapter):
     '''Custom :class:`requests.adapters.HTTPAdapter` that allows the source
     port to be specified.
     '''
@@ -195,14 +1100,1320 @@ class SourcePortAdapter(HTTPAdapter):
         self._source_port = source_port
         super(SourcePortAdapter, self).__init__(*args, **kwargs)
 
-    def init_poolmanager(self, connections, maxsize, block=False):
-        self.poolmanager = PoolManager(
-            num_pools=connections, maxsize=maxsize,
-            block=block, source_address=("", self._source_port))
+    def init_poolmanager(self, connections, maxsize, block=False, **kwargs):
+        kwargs["source_address"] = ("", self._source_port)
+        super(SourcePortAdapter, self).init_poolmanager(
+            connections, maxsize, block=block, **kwargs)
+
+
+class DownloadCache(object):
+    '''A size-bounded, content-addressed cache of downloaded files that can
+    be shared by concurrent tasks on the same machine.
+
+    Files are keyed by the URL of the remote object without its query string,
+    which carries the signature of a signed URL, together with the ``ETag``
+    and ``Content-Length`` reported by a ``HEAD`` request. Files whose
+    ``ETag`` is not reported are never cached, since a changed object could
+    not be detected.
+
+    Files are downloaded to a temporary path and atomically renamed into the
+    cache, and, where ``fcntl`` is available, concurrent fills of the same
+    file are serialized by a lock file, so processes that share the cache
+    download each file once. Files are provided to callers as hard links to
+    the cached file when possible, or as copies otherwise, so callers must
+    not modify them in place.
+
+    When the cache exceeds its maximum size, the least recently used files
+    that are not being read or filled are evicted.
+
+    Attributes:
+        cache_dir (str): the cache directory
+        max_size (int): the maximum size, in bytes, of the cache
+    '''
+
+    def __init__(self, cache_dir, max_size=None):
+        '''Creates a DownloadCache instance.
+
+        Args:
+            cache_dir (str): the cache directory, which is created if
+                necessary
+            max_size (int, optional): the maximum size, in bytes, of the
+                cache. By default, ``DEFAULT_DOWNLOAD_CACHE_SIZE`` is used
+        '''
+        self.cache_dir = cache_dir
+        self.max_size = max_size or DEFAULT_DOWNLOAD_CACHE_SIZE
+
+        self._objects_dir = os.path.join(cache_dir, "objects")
+        self._locks_dir = os.path.join(cache_dir, "locks")
+        self._tmp_dir = os.path.join(cache_dir, "tmp")
+        for dirname in (self._objects_dir, self._locks_dir, self._tmp_dir):
+            etau.ensure_dir(dirname)
+
+        self._lock = threading.Lock()
+        self._num_hits = 0
+        self._num_misses = 0
+        self._num_uncacheable = 0
+        self._num_evictions = 0
+        self._bytes_hit = 0
+        self._bytes_downloaded = 0
+
+    @staticmethod
+    def get_key(url, etag, size=None):
+        '''Returns the cache key for the given remote object.
+
+        Args:
+            url (str): the (signed) URL of the object
+            etag (str): the ETag of the object, or None if unknown
+            size (int, optional): the size of the object, in bytes, if known
+
+        Returns:
+            the cache key, or None if the object cannot be cached
+        '''
+        if not etag:
+            return None
+
+        parts = urlparse.urlparse(url)
+        identity = "%s://%s%s\n%s\n%s" % (
+            parts.scheme, parts.netloc, parts.path, etag,
+            size if size is not None else "")
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def download(self, url, output_dir, num_range_workers=None):
+        '''Downloads the file at the given URL to the given directory,
+        serving it from the cache when possible.
+
+        Args:
+            url (str): the (signed) URL of the file
+            output_dir (str): the directory to download the file to
+            num_range_workers (int, optional): the number of parallel HTTP
+                Range requests to use to download the file on a cache miss.
+                See :func:`download` for details
+
+        Returns:
+            the local path to the downloaded file
+        '''
+        res = get_http_session().head(url)
+        filename = _get_filename_from_head(url, res)
+        local_path = os.path.join(output_dir, filename)
+
+        etag = size = None
+        if res.ok:
+            etag = res.headers.get("ETag")
+            size = res.headers.get("Content-Length")
+            size = int(size) if size is not None else None
+
+        key = self.get_key(url, etag, size=size)
+        if key is None:
+            _fetch_to_file(url, local_path, num_range_workers)
+            with self._lock:
+                self._num_uncacheable += 1
+            return local_path
+
+        cache_path = os.path.join(self._objects_dir, key)
+        with self._lock_key(key):
+            if os.path.isfile(cache_path):
+                # Mark the file as recently used
+                os.utime(cache_path, None)
+                is_hit = True
+            else:
+                self._fill(url, cache_path, size, num_range_workers)
+                is_hit = False
+
+            num_bytes = os.path.getsize(cache_path)
+            _link_or_copy(cache_path, local_path)
+
+        with self._lock:
+            if is_hit:
+                self._num_hits += 1
+                self._bytes_hit += num_bytes
+            else:
+                self._num_misses += 1
+                self._bytes_downloaded += num_bytes
+
+        if is_hit:
+            logger.info("Download cache hit for %s", local_path)
+        else:
+            self._evict(keep=key)
+
+        return local_path
+
+    def get_size(self):
+        '''Returns the current size of the cache.
+
+        Returns:
+            the size of the cached files, in bytes
+        '''
+        return sum(size for _, size, _ in self._list_files())
+
+    def get_stats(self):
+        '''Returns statistics about the downloads served by this instance.
+
+        Returns:
+            a dictionary with the following keys: ``num_hits``,
+            ``num_misses``, ``num_uncacheable`` (downloads whose ETag was
+            unknown), ``num_evictions``, ``bytes_hit`` (bytes served from the
+            cache), and ``bytes_downloaded`` (bytes downloaded into the cache)
+        '''
+        with self._lock:
+            return {
+                "num_hits": self._num_hits,
+                "num_misses": self._num_misses,
+                "num_uncacheable": self._num_uncacheable,
+                "num_evictions": self._num_evictions,
+                "bytes_hit": self._bytes_hit,
+                "bytes_downloaded": self._bytes_downloaded,
+            }
+
+    def clear(self):
+        '''Removes all files from the cache that are not in use.'''
+        self._evict(max_size=0)
+
+    def _fill(self, url, cache_path, size, num_range_workers):
+        tmp_path = os.path.join(
+            self._tmp_dir, "%s.%s" % (os.path.basename(cache_path),
+                                      uuid.uuid4().hex))
+        try:
+            _fetch_to_file(url, tmp_path, num_range_workers)
+            if size is not None and os.path.getsize(tmp_path) != size:
+                raise IOError(
+                    "Expected %d bytes from '%s' but received %d" % (
+                        size, url, os.path.getsize(tmp_path)))
+
+            os.rename(tmp_path, cache_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _evict(self, max_size=None, keep=None):
+        if max_size is None:
+            max_size = self.max_size
+
+        with self._lock_key(".evict"):
+            files = self._list_files()
+            total_size = sum(size for _, size, _ in files)
+            for key, size, _ in sorted(files, key=lambda f: f[2]):
+                if total_size <= max_size:
+                    break
+
+                if key == keep:
+                    continue
+
+                # Skip files that are being read or filled by other callers
+                with self._lock_key(key, blocking=False) as acquired:
+                    if not acquired:
+                        continue
+
+                    os.remove(os.path.join(self._objects_dir, key))
+
+                total_size -= size
+                with self._lock:
+                    self._num_evictions += 1
+
+    def _list_files(self):
+        files = []
+        for key in os.listdir(self._objects_dir):
+            try:
+                st = os.stat(os.path.join(self._objects_dir, key))
+            except OSError:
+                continue  # evicted by another process
+
+            files.append((key, st.st_size, st.st_mtime))
+
+        return files
+
+    def _lock_key(self, key, blocking=True):
+        return _FileLock(
+            os.path.join(self._locks_dir, key + ".lock"), blocking=blocking)
+
+
+class MetadataCache(object):
+    '''A size-bounded, in-memory cache of image and video metadata that can
+    optionally be persisted to disk.
+
+    Entries are keyed by the absolute path of the media together with its
+    size and modification time, so an entry is never served for a file that
+    has changed since it was probed. When the cache holds more than its
+    maximum number of entries, the least recently used entries are evicted.
+
+    If a ``path`` is provided, the cache is loaded from that JSON file when
+    it is created and rewritten whenever a new entry is added, so a task that
+    is paused and later resumed on the same machine does not re-probe its
+    inputs.
+
+    Attributes:
+        max_entries (int): the maximum number of entries in the cache
+        path (str): the path to the JSON file in which the cache is persisted,
+            or None if the cache is not persisted
+    '''
+
+    def __init__(self, max_entries=None, path=None):
+        '''Creates a MetadataCache instance.
+
+        Args:
+            max_entries (int, optional): the maximum number of entries in the
+                cache. By default, ``DEFAULT_METADATA_CACHE_SIZE`` is used
+            path (str, optional): the path to a JSON file in which to persist
+                the cache
+        '''
+        self.max_entries = max_entries or DEFAULT_METADATA_CACHE_SIZE
+        self.path = path
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._num_hits = 0
+        self._num_misses = 0
+        self._num_evictions = 0
+
+        if path and os.path.isfile(path):
+            self._load()
+
+    def get_video_metadata(self, video_path):
+        '''Gets metadata about the given video, probing it only if it is not
+        in the cache.
+
+        Args:
+            video_path (str): the path to the video
+
+        Returns:
+            an ``eta.core.video.VideoMetadata`` instance describing the video
+        '''
+        return self._get(
+            "video", video_path, _build_video_metadata,
+            etav.VideoMetadata.from_dict)
+
+    def get_image_metadata(self, image_path):
+        '''Gets metadata about the given image, probing it only if it is not
+        in the cache.
+
+        Args:
+            image_path (str): the path to the image
+
+        Returns:
+            an ``eta.core.image.ImageMetadata`` instance describing the image
+        '''
+        return self._get(
+            "image", image_path, _build_image_metadata,
+            etai.ImageMetadata.from_dict)
+
+    def get_stats(self):
+        '''Returns statistics about the lookups served by this instance.
+
+        Returns:
+            a dictionary with the following keys: ``num_hits`` (the number of
+            probes saved), ``num_misses`` (the number of probes performed),
+            ``num_evictions``, and ``num_entries``
+        '''
+        with self._lock:
+            return {
+                "num_hits": self._num_hits,
+                "num_misses": self._num_misses,
+                "num_evictions": self._num_evictions,
+                "num_entries": len(self._entries),
+            }
+
+    def clear(self):
+        '''Removes all entries from the cache and its persisted form.'''
+        with self._lock:
+            self._entries.clear()
+            if self.path and os.path.isfile(self.path):
+                os.remove(self.path)
+
+    def _get(self, kind, media_path, build_fcn, from_dict_fcn):
+        media_path = os.path.abspath(media_path)
+        st = os.stat(media_path)
+        key = (kind, media_path, st.st_size, st.st_mtime)
+
+        with self._lock:
+            d = self._entries.pop(key, None)
+            if d is not None:
+                self._entries[key] = d  # most recently used
+                self._num_hits += 1
+                return from_dict_fcn(d)
+
+        # Probe outside the lock so that lookups of other media do not wait
+        metadata = build_fcn(media_path)
+        with self._lock:
+            self._num_misses += 1
+            self._entries.pop(key, None)
+            self._entries[key] = metadata.serialize()
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._num_evictions += 1
+
+            if self.path:
+                self._save()
+
+        return metadata
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                entries = json.load(f)["entries"]
+        except (IOError, OSError, ValueError, KeyError) as e:
+            logger.warning(
+                "Ignoring invalid metadata cache '%s': %s", self.path, e)
+            return
+
+        for e in entries[-self.max_entries:]:
+            key = (e["kind"], e["path"], e["size"], e["mtime"])
+            self._entries[key] = e["metadata"]
+
+    def _save(self):
+        entries = [
+            {
+                "kind": kind,
+                "path": path,
+                "size": size,
+                "mtime": mtime,
+                "metadata": d,
+            }
+            for (kind, path, size, mtime), d in self._entries.items()]
+
+        # Write to a temporary file and rename it so that readers never see
+        # a partially written cache
+        etau.ensure_basedir(self.path)
+        tmp_path = "%s.%s.tmp" % (self.path, uuid.uuid4().hex)
+        with open(tmp_path, "w") as f:
+            json.dump({"entries": entries}, f)
+        if os.name == "nt" and os.path.exists(self.path):
+            os.remove(self.path)
+        os.rename(tmp_path, self.path)
+
+
+class ProgressiveDownload(object):
+    '''A download that is written to a local file by a background thread
+    while the file is being read.
+
+    The number of bytes written so far is the download's watermark. Readers
+    returned by :meth:`open` can read and seek anywhere in the file, and they
+    block only when they read past the watermark. Sequential consumers and
+    MP4 videos whose ``moov`` atom precedes their media data can therefore be
+    processed while they are downloaded. Consumers that seek to the end of
+    the file, e.g., MP4 videos whose ``moov`` atom is at the end, will block
+    until the download completes.
+
+    If the download fails, the error is raised by any read that is waiting
+    on bytes that were not downloaded.
+
+    Attributes:
+        url (str): the URL being downloaded
+        local_path (str): the local path to which the file is being written
+        size (int): the size of the file, in bytes, or None if the server did
+            not report it
+    '''
+
+    def __init__(self, url, local_path, callback=None):
+        '''Creates a ProgressiveDownload instance.
+
+        Args:
+            url (str): the (signed) URL of the file
+            local_path (str): the local path to write the file
+            callback (function, optional): an optional function to call with
+                this instance when the download finishes, successfully or
+                not. It is called from the background thread
+        '''
+        self.url = url
+        self.local_path = local_path
+        self.size = None
+
+        self._callback = callback
+
+        self._cond = threading.Condition()
+        self._bytes_written = 0
+        self._done = False
+        self._error = None
+        self._cancelled = False
+        self._thread = None
+
+    @property
+    def bytes_downloaded(self):
+        '''The number of bytes downloaded so far.'''
+        with self._cond:
+            return self._bytes_written
+
+    @property
+    def is_complete(self):
+        '''Whether the download has finished, successfully or not.'''
+        with self._cond:
+            return self._done
+
+    def start(self):
+        '''Starts the download.
+
+        Returns:
+            this instance
+
+        Raises:
+            requests.exceptions.HTTPError: if the download could not be
+                started
+        '''
+        res = get_http_session().get(self.url, stream=True)
+        try:
+            res.raise_for_status()
+        except Exception:
+            res.close()
+            raise
+
+        # The length of encoded responses is not their decoded length
+        size = res.headers.get("Content-Length")
+        if size is not None and res.headers.get(
+                "Content-Encoding", "identity") == "identity":
+            self.size = int(size)
+
+        # Create the file before returning so that it can be opened at once
+        etau.ensure_basedir(self.local_path)
+        f = open(self.local_path, "wb")
+
+        self._thread = threading.Thread(target=self._run, args=(res, f))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def open(self, buffer_size=io.DEFAULT_BUFFER_SIZE):
+        '''Opens a binary file-like object that reads the file as it is
+        downloaded.
+
+        Args:
+            buffer_size (int, optional): the buffer size of the reader
+
+        Returns:
+            an ``io.BufferedReader``
+        '''
+        return io.BufferedReader(
+            _ProgressiveReader(self), buffer_size=buffer_size)
+
+    def wait_for(self, num_bytes, timeout=None):
+        '''Waits until at least the given number of bytes have been
+        downloaded or the download has finished.
+
+        Args:
+            num_bytes (int): the number of bytes to wait for
+            timeout (float, optional): the maximum number of seconds to wait.
+                By default, there is no timeout
+
+        Returns:
+            the number of bytes downloaded
+
+        Raises:
+            Exception: the error that stopped the download, if it stopped
+                before ``num_bytes`` bytes were downloaded
+        '''
+        deadline = time.time() + timeout if timeout is not None else None
+        with self._cond:
+            while self._bytes_written < num_bytes and not self._done:
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+
+                self._cond.wait(remaining)
+
+            if self._error is not None and self._bytes_written < num_bytes:
+                raise self._error
+
+            return self._bytes_written
+
+    def wait(self):
+        '''Waits for the download to complete.
+
+        Returns:
+            the local path to the downloaded file
+
+        Raises:
+            Exception: the error that stopped the download, if any
+        '''
+        self.wait_for(float("inf"))
+        return self.local_path
+
+    def get_size(self):
+        '''Gets the size of the file, waiting for the download to complete if
+        the server did not report it.
+
+        Returns:
+            the size of the file, in bytes
+        '''
+        if self.size is not None:
+            return self.size
+
+        self.wait()
+        return self.bytes_downloaded
+
+    def cancel(self):
+        '''Cancels the download, if it is in progress, and waits for the
+        background thread to exit.
+        '''
+        self._cancelled = True
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self, res, f):
+        error = None
+        try:
+            with res, f:
+                for chunk in res.iter_content(
+                        chunk_size=_PROGRESSIVE_CHUNK_SIZE):
+                    if self._cancelled:
+                        raise IOError("Download of '%s' was cancelled" % (
+                            self.local_path))
+
+                    # Flush before advancing the watermark so that readers
+                    # never see unwritten bytes
+                    f.write(chunk)
+                    f.flush()
+                    with self._cond:
+                        self._bytes_written += len(chunk)
+                        self._cond.notify_all()
+
+            if self.size is not None and self._bytes_written != self.size:
+                raise IOError(
+                    "Downloaded %d bytes of '%s' but expected %d" % (
+                        self._bytes_written, self.local_path, self.size))
+        except Exception as e:  # pylint: disable=broad-except
+            if not self._cancelled:
+                logger.warning(
+                    "Download of '%s' failed: %r", self.local_path, e)
+
+            error = e
+
+        with self._cond:
+            self._error = error
+            self._done = True
+            self._cond.notify_all()
+
+        if self._callback is not None:
+            try:
+                self._callback(self)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("Download callback failed: %r", e)
+
+
+class _ProgressiveReader(io.RawIOBase):
+
+    def __init__(self, download):
+        super(_ProgressiveReader, self).__init__()
+        self._download = download
+        self._f = open(download.local_path, "rb")
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        if not len(b):
+            return 0
+
+        # Block only until the byte at the current position is available
+        available = self._download.wait_for(self._pos + 1) - self._pos
+        if available <= 0:
+            return 0  # EOF
+
+        self._f.seek(self._pos)
+        data = self._f.read(min(len(b), available))
+        b[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self._download.get_size() + offset
+        else:
+            raise ValueError("Invalid whence %r" % whence)
+
+        if pos < 0:
+            raise ValueError("Negative seek position %d" % pos)
+
+        self._pos = pos
+        return pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            self._f.close()
+
+        super(_ProgressiveReader, self).close()
+
+
+class _PartialDownload(object):
+
+    def __init__(self, url, local_path, etag, size):
+        self.local_path = local_path
+        self.part_path = local_path + ".part"
+        self.manifest_path = local_path + ".part.json"
+        self.etag = etag
+        self.size = size
+
+        parts = urlparse.urlparse(url)
+        self._validators = {
+            # Signed URLs are refreshed across resumes, so omit the query
+            "url": "%s://%s%s" % (parts.scheme, parts.netloc, parts.path),
+            "etag": etag,
+            "size": size,
+        }
+        self._ranges = []
+        self._lock = threading.Lock()
+
+    @property
+    def bytes_downloaded(self):
+        with self._lock:
+            return sum(end - start for start, end in self._ranges)
+
+    def load(self):
+        try:
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+        except (IOError, OSError, ValueError):
+            manifest = None
+
+        if (manifest is None or
+                not os.path.isfile(self.part_path) or
+                os.path.getsize(self.part_path) != self.size or
+                any(manifest.get(k) != v
+                    for k, v in self._validators.items())):
+            self.reset()
+            return False
+
+        with self._lock:
+            self._ranges = [tuple(r) for r in manifest.get("ranges", [])]
+
+        return True
+
+    def reset(self):
+        etau.ensure_basedir(self.part_path)
+        with open(self.part_path, "wb") as f:
+            f.truncate(self.size)
+
+        with self._lock:
+            self._ranges = []
+            self._save()
+
+    def matches(self, res):
+        # Whether the given full-file response is the version of the file
+        # being downloaded
+        size = res.headers.get("Content-Length")
+        return (
+            res.headers.get("ETag") == self.etag and
+            size is not None and int(size) == self.size and
+            res.headers.get("Content-Encoding", "identity") == "identity")
+
+    def get_missing_ranges(self):
+        with self._lock:
+            missing = []
+            pos = 0
+            for start, end in self._ranges:
+                if start > pos:
+                    missing.append((pos, start))
+                pos = max(pos, end)
+
+            if pos < self.size:
+                missing.append((pos, self.size))
+
+            return missing
+
+    def record(self, start, end):
+        if end <= start:
+            return
+
+        with self._lock:
+            ranges = []
+            for r in sorted(self._ranges + [(start, end)]):
+                if ranges and r[0] <= ranges[-1][1]:
+                    ranges[-1] = (ranges[-1][0], max(ranges[-1][1], r[1]))
+                else:
+                    ranges.append(r)
+
+            self._ranges = ranges
+            self._save()
+
+    def finish(self):
+        if self.get_missing_ranges():
+            raise IOError(
+                "Download of '%s' is incomplete" % self.local_path)
+
+        if os.name == "nt" and os.path.exists(self.local_path):
+            os.remove(self.local_path)
+
+        os.rename(self.part_path, self.local_path)
+        os.remove(self.manifest_path)
+
+    def _save(self):
+        manifest = dict(self._validators)
+        manifest["ranges"] = self._ranges
+
+        # Write to a temporary file and rename it so that the manifest is
+        # never partially written
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        if os.name == "nt" and os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+        os.rename(tmp_path, self.manifest_path)
+
+
+class _RangeIgnoredError(IOError):
+    pass
+
+
+class _FileLock(object):
+    '''An exclusive advisory lock on a file that is held by a ``with``
+    block, whose value is whether the lock was acquired.
+
+    Locks are acquired via ``flock``, so they exclude other threads as well as
+    other processes. Where ``fcntl`` is unavailable, locks are always
+    acquired.
+    '''
+
+    def __init__(self, path, blocking=True):
+        self.path = path
+        self.blocking = blocking
+        self._f = None
+
+    def __enter__(self):
+        if fcntl is None:
+            return True
+
+        self._f = open(self.path, "a")
+        flags = fcntl.LOCK_EX
+        if not self.blocking:
+            flags |= fcntl.LOCK_NB
+
+        try:
+            fcntl.flock(self._f, flags)
+        except (IOError, OSError) as e:
+            if e.errno not in (errno.EAGAIN, errno.EACCES):
+                raise
+
+            self._f.close()
+            self._f = None
+            return False
+
+        return True
+
+    def __exit__(self, *args):
+        if self._f is not None:
+            self._f.close()  # releases the lock
+            self._f = None
+
+
+class _FileSlice(object):
+    '''A read-only, file-like view of a byte range of a file on disk.'''
+
+    def __init__(self, path, start, end):
+        self._f = open(path, "rb")
+        self._f.seek(start)
+        self._remaining = end - start
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._f.close()
+
+    def __len__(self):
+        return self._remaining
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+
+        data = self._f.read(size)
+        self._remaining -= len(data)
+        return data
+
+
+def _upload_part(session, session_url, local_path, start, end, total_size):
+    if total_size == 0:
+        headers = {"Content-Range": "bytes */0"}
+        return session.put(session_url, data=b"", headers=headers)
+
+    headers = {
+        "Content-Range": "bytes %d-%d/%d" % (start, end - 1, total_size)
+    }
+    with _FileSlice(local_path, start, end) as data:
+        return session.put(session_url, data=data, headers=headers)
+
+
+def _query_committed_bytes(session, session_url, total_size):
+    headers = {"Content-Range": "bytes */%d" % total_size}
+    res = session.put(session_url, data=b"", headers=headers)
+    if res.status_code in (200, 201):
+        return total_size
+
+    if res.status_code != 308:
+        res.raise_for_status()
+
+    return _get_committed_bytes(res)
+
+
+def _get_committed_bytes(res):
+    # A 308 response has a `Range: bytes=0-N` header if any bytes have been
+    # committed
+    match = re.match(r"bytes=0-(\d+)", res.headers.get("Range", ""))
+    return int(match.group(1)) + 1 if match else 0
+
+
+def _is_retryable(res):
+    return res.status_code == 429 or res.status_code >= 500
+
+
+def _get_range(session, url, start, end):
+    headers = {"Range": "bytes=%d-%d" % (start, end)}
+    return session.get(url, headers=headers, stream=True)
+
+
+def _parse_content_range(res):
+    content_range = res.headers.get("Content-Range", "")
+    match = re.match(r"bytes (\d+)-(\d+)/(\d+)", content_range)
+    if match is None:
+        raise IOError(
+            "Unable to parse Content-Range '%s' from response to ranged "
+            "request" % content_range)
+
+    return tuple(int(m) for m in match.groups())
+
+
+def _download_range_to_file(session, url, local_path, start, end):
+    res = _get_range(session, url, start, end)
+    res.raise_for_status()
+    if res.status_code != 206:
+        res.close()
+        raise IOError(
+            "Expected a 206 response for bytes %d-%d; found %d" % (
+                start, end, res.status_code))
+
+    _write_range_response(res, local_path, start)
+
+
+def _write_range_response(res, local_path, start):
+    first, last, _ = _parse_content_range(res)
+    if first != start:
+        res.close()
+        raise IOError(
+            "Requested range starting at byte %d but received bytes %d-%d" % (
+                start, first, last))
+
+    with open(local_path, "r+b") as f:
+        f.seek(start)
+        _write_response(res, f)
+
+
+def _write_response(res, f):
+    with res:
+        for chunk in res.iter_content(chunk_size=_STREAM_CHUNK_SIZE):
+            f.write(chunk)
+
+
+def _make_http_session(
+        pool_connections=10, pool_maxsize=10, pool_block=False,
+        keep_alive=True, adapter=None):
+    if adapter is None:
+        adapter = PooledHTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+            pool_block=pool_block)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+
+    return session
+
+
+def _get_filename(url):
+    return _get_filename_from_head(url, get_http_session().head(url))
+
+
+def _get_filename_from_head(url, res):
+    # Use the filename from the `Content-Disposition` header, if available,
+    # or else the base name of the path portion of the URL
+    filename = None
+    try:
+        cd = res.headers["Content-Disposition"]
+        filename = re.findall("filename=([^;]+)", cd)[0].strip("\"'")
+    except (KeyError, IndexError):
+        pass
+
+    if not filename:
+        filename = os.path.basename(urlparse.urlparse(url).path)
+
+    return filename
+
+
+def _fetch_to_file(url, local_path, num_range_workers=None):
+    if num_range_workers:
+        download_ranged(url, local_path, num_workers=num_range_workers)
+    else:
+        _download_to_file(url, local_path)
+
+
+def _link_or_copy(src, dst):
+    etau.ensure_basedir(dst)
+    if os.path.lexists(dst):
+        os.remove(dst)
+
+    try:
+        os.link(src, dst)
+    except (AttributeError, OSError):
+        # Hard links are unsupported, e.g., across filesystems
+        shutil.copyfile(src, dst)
+
+
+def _download_to_file(url, local_path):
+    etau.ensure_basedir(local_path)
+    res = get_http_session().get(url, stream=True)
+    res.raise_for_status()
+    with open(local_path, "wb") as f:
+        _write_response(res, f)
+
+
+def _download_resumable(url, local_path, head_res, num_workers, range_size):
+    range_size = range_size or DEFAULT_RANGE_SIZE
+
+    partial = _make_partial_download(url, local_path, head_res)
+    if partial is None:
+        # A partial file could not be validated when resuming
+        _fetch_to_file(url, local_path, num_workers)
+        return
+
+    if partial.load():
+        logger.info(
+            "Resuming download of '%s' (%d of %d bytes downloaded)",
+            local_path, partial.bytes_downloaded, partial.size)
+
+    try:
+        _fill_partial_download(url, partial, num_workers, range_size)
+    except _RangeIgnoredError as e:
+        # The server ignored a Range request or sent a different file, e.g.,
+        # because the file changed since it was last validated, so start over
+        # with a single request for the current version of the file
+        logger.warning("%s; restarting download of '%s'", e, local_path)
+        partial = _make_partial_download(
+            url, local_path, get_http_session().head(url))
+        if partial is None:
+            _fetch_to_file(url, local_path, None)
+            return
+
+        partial.reset()
+        _fill_partial_download(url, partial, None, range_size)
+
+    partial.finish()
+
+
+def _make_partial_download(url, local_path, head_res):
+    etag = size = None
+    if head_res.ok:
+        etag = head_res.headers.get("ETag")
+        size = head_res.headers.get("Content-Length")
+
+    if not etag or size is None:
+        return None
+
+    return _PartialDownload(url, local_path, etag, int(size))
+
+
+def _fill_partial_download(url, partial, num_workers, range_size):
+    ranges = partial.get_missing_ranges()
+    if num_workers and num_workers > 1:
+        ranges = [
+            (s, min(s + range_size, end))
+            for start, end in ranges for s in range(start, end, range_size)]
+
+    session = get_http_session()
+
+    def _download_range(byte_range):
+        start, end = byte_range
+        _download_partial_range(
+            session, url, partial, start, end, range_size)
+
+    if not num_workers or num_workers <= 1 or len(ranges) <= 1:
+        for byte_range in ranges:
+            _download_range(byte_range)
+        return
+
+    pool = ThreadPool(min(num_workers, len(ranges)))
+    try:
+        pool.map(_download_range, ranges)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _download_partial_range(
+        session, url, partial, start, end, checkpoint_size):
+    # `If-Range` asks the server to send the whole file instead of the range
+    # if the file has changed
+    headers = {
+        "Range": "bytes=%d-%d" % (start, end - 1),
+        "If-Range": partial.etag,
+    }
+    res = session.get(url, headers=headers, stream=True)
+    res.raise_for_status()
+    if res.status_code != 206:
+        if start != 0 or end != partial.size:
+            res.close()
+            raise _RangeIgnoredError(
+                "Expected a 206 response for bytes %d-%d; found %d" % (
+                    start, end - 1, res.status_code))
+
+        # The server may have ignored `If-Range` and sent a newer version of
+        # the file, which must not be truncated into the old one
+        if not partial.matches(res):
+            res.close()
+            raise _RangeIgnoredError(
+                "Received a different version of the file (ETag %s, %s "
+                "bytes)" % (
+                    res.headers.get("ETag"),
+                    res.headers.get("Content-Length")))
+    else:
+        first, _, _ = _parse_content_range(res)
+        if first != start:
+            res.close()
+            raise IOError(
+                "Requested range starting at byte %d but received byte %d" % (
+                    start, first))
+
+    with res, open(partial.part_path, "r+b") as f:
+        f.seek(start)
+        pos = checkpoint = start
+        for chunk in res.iter_content(chunk_size=_STREAM_CHUNK_SIZE):
+            chunk = chunk[:end - pos]
+            f.write(chunk)
+            pos += len(chunk)
+            if pos - checkpoint >= checkpoint_size:
+                _checkpoint(f, partial, checkpoint, pos)
+                checkpoint = pos
+
+        _checkpoint(f, partial, checkpoint, pos)
+
+    if pos != end:
+        raise IOError(
+            "Received %d of the %d bytes requested from byte %d" % (
+                pos - start, end - start, start))
+
+
+def _checkpoint(f, partial, start, end):
+    # Persist the bytes before recording them in the manifest, so that the
+    # manifest never claims bytes that would be lost by a crash
+    f.flush()
+    os.fsync(f.fileno())
+    partial.record(start, end)
+
+
+def _build_video_metadata(video_path):
+    metadata = read_video_header(video_path)
+    if metadata is None:
+        metadata = etav.VideoMetadata.build_for(video_path)
+
+    return metadata
+
+
+def _build_image_metadata(image_path):
+    metadata = read_image_header(image_path)
+    if metadata is None:
+        metadata = etai.ImageMetadata.build_for(image_path)
+
+    return metadata
+
+
+def _parse_atom_header(data, offset, end):
+    size, atom_type = struct.unpack_from(">I4s", data, offset)
+    header_size = 8
+    if size == 1:
+        size = struct.unpack_from(">Q", data, offset + 8)[0]
+        header_size = 16
+    elif size == 0:
+        size = end - offset  # atom extends to the end of its parent
+
+    if size < header_size or offset + size > end:
+        raise ValueError("Invalid atom size %d" % size)
+
+    return atom_type, header_size, size
+
+
+def _get_child_atoms(data, start, end):
+    atoms = {}
+    offset = start
+    while offset + 8 <= end:
+        atom_type, header_size, size = _parse_atom_header(data, offset, end)
+        atoms.setdefault(atom_type, []).append(
+            (offset + header_size, offset + size))
+        offset += size
+
+    return atoms
+
+
+def _read_mp4_moov(f):
+    f.seek(0, os.SEEK_END)
+    file_size = f.tell()
+
+    # Walk the top-level atoms, seeking past the (large) media data
+    offset = 0
+    while offset + 8 <= file_size:
+        f.seek(offset)
+        atom_type, header_size, size = _parse_atom_header(
+            f.read(16), 0, file_size - offset)
+        if offset == 0 and atom_type not in _MP4_TOP_LEVEL_ATOMS:
+            return None  # not an MP4/MOV file
+
+        if atom_type == b"moov":
+            if size > _MAX_MOOV_SIZE:
+                return None
+
+            f.seek(offset + header_size)
+            return f.read(size - header_size)
+
+        offset += size
+
+    return None
+
+
+def _read_mp4_video_track(f):
+    moov = _read_mp4_moov(f)
+    if moov is None:
+        return None
+
+    atoms = _get_child_atoms(moov, 0, len(moov))
+    if b"mvex" in atoms:
+        return None  # fragmented, so samples are described by moof atoms
+
+    for trak in atoms.get(b"trak", []):
+        trak_atoms = _get_child_atoms(moov, *trak)
+        mdia_atoms = _get_child_atoms(moov, *trak_atoms[b"mdia"][0])
+        hdlr = mdia_atoms[b"hdlr"][0][0]
+        if moov[hdlr + 8:hdlr + 12] != b"vide":
+            continue
+
+        minf_atoms = _get_child_atoms(moov, *mdia_atoms[b"minf"][0])
+        stbl_atoms = _get_child_atoms(moov, *minf_atoms[b"stbl"][0])
+        return _parse_mp4_video_track(
+            moov, trak_atoms[b"tkhd"][0][0], mdia_atoms[b"mdhd"][0][0],
+            stbl_atoms)
+
+    return None
+
+
+def _parse_mp4_video_track(moov, tkhd, mdhd, stbl_atoms):
+    if _get_byte(moov, mdhd) == 1:
+        timescale, duration = struct.unpack_from(">IQ", moov, mdhd + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", moov, mdhd + 12)
+
+    stsz = stbl_atoms.get(b"stsz") or stbl_atoms.get(b"stz2")
+    if stsz is None:
+        return None
+
+    frame_count = struct.unpack_from(">I", moov, stsz[0][0] + 8)[0]
+    if not timescale or not duration or not frame_count:
+        return None
+
+    # The codec and coded frame size are in the first sample description
+    stsd = stbl_atoms[b"stsd"][0][0]
+    codec_tag = moov[stsd + 12:stsd + 16].decode("latin-1")
+    width, height = struct.unpack_from(">HH", moov, stsd + 40)
+
+    # Swap the dimensions of videos that are rotated by 90 or 270 degrees
+    matrix_offset = tkhd + (52 if _get_byte(moov, tkhd) == 1 else 40)
+    a, b, _, _, d = struct.unpack_from(">5i", moov, matrix_offset)
+    if a == 0 and d == 0 and b != 0:
+        width, height = height, width
+
+    return width, height, frame_count, duration / timescale, codec_tag
+
+
+def _read_image_header(f):
+    header = f.read(32)
+    if header.startswith(_PNG_SIGNATURE):
+        return _read_png_header(f)
+
+    if header.startswith(b"\xff\xd8"):
+        return _read_jpeg_header(f)
+
+    if header.startswith(b"BM"):
+        return _parse_bmp_header(header)
+
+    return None
+
+
+def _read_png_header(f):
+    f.seek(len(_PNG_SIGNATURE))
+    width = height = num_channels = None
+    while True:
+        length, chunk_type = struct.unpack(">I4s", f.read(8))
+        if chunk_type == b"IHDR":
+            width, height, _, color_type = struct.unpack(">IIBB", f.read(10))
+            num_channels = _PNG_CHANNELS.get(color_type)
+            if num_channels is None:
+                return None
+
+            f.seek(length - 10 + 4, os.SEEK_CUR)
+        elif chunk_type == b"tRNS":
+            return None  # transparency is decoded as an alpha channel
+        elif chunk_type in (b"IDAT", b"IEND"):
+            break
+        else:
+            f.seek(length + 4, os.SEEK_CUR)  # skip data and CRC
+
+    if width is None:
+        return None
+
+    return width, height, num_channels
+
+
+def _read_jpeg_header(f):
+    f.seek(2)
+    while True:
+        marker = _get_byte(f.read(1), 0)
+        if marker != 0xFF:
+            raise ValueError("Invalid JPEG marker")
+
+        while marker == 0xFF:
+            marker = _get_byte(f.read(1), 0)  # skip fill bytes
+
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            continue  # markers without a payload
+
+        if marker in (0xD9, 0xDA):
+            return None  # reached the image data before a frame header
+
+        length = struct.unpack(">H", f.read(2))[0]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            _, height, width, num_components = struct.unpack(
+                ">BHHB", f.read(6))
+            num_channels = _JPEG_CHANNELS.get(num_components)
+            if num_channels is None or not width or not height:
+                return None
+
+            return width, height, num_channels
+
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _parse_bmp_header(header):
+    dib_size = struct.unpack_from("<I", header, 14)[0]
+    if dib_size == 12:
+        width, height, _, bit_count = struct.unpack_from("<HHHH", header, 18)
+    else:
+        width, height, _, bit_count = struct.unpack_from("<iiHH", header, 18)
+
+    if bit_count != 24:
+        return None  # other depths may be decoded with or without alpha
+
+    return width, abs(height), 3
+
 
+def _get_byte(data, idx):
+    if idx >= len(data):
+        raise ValueError("Unexpected end of data")
 
-def _get_http_client():
-    global _HTTP_CLIENT
-    if _HTTP_CLIENT is None:
-        _HTTP_CLIENT = etas.HTTPStorageClient()
-    return _HTTP_CLIENT
+    return bytearray(data[idx:idx + 1])[0]